@@ -1,6 +1,10 @@
+import boottrace
+boottrace.mark("_boot")
+
 import gc
 import vfs
 from flashbdev import bdev
+boottrace.mark("flashbdev")
 
 
 try:
@@ -12,6 +16,7 @@ except OSError:
     inisetup.setup()
 
 gc.collect()
+boottrace.mark("vfs mounted")
 
 import time
 import os
@@ -47,3 +52,5 @@ for i in range(10):  # 10 x 10ms = 100 milliseconds
     #if i % 25 == 0:
     #    print(f"{i * 10}ms elapsed\n")
     time.sleep_ms(10)
+
+boottrace.mark("boot buttons checked")
@@ -0,0 +1,129 @@
+# Boot timeline.
+#
+# mark(name) records a named point in time, in microseconds since the
+# firmware started (time.ticks_us()). _boot.py, spotpear and the display
+# bring-up mark their steps, report() prints where the time went:
+#
+#   >>> import boottrace
+#   >>> boottrace.report()
+#     412.8 ms            _boot
+#     448.1 ms   +35.3 ms vfs mounted
+#   ...
+#
+# save() adds the marks of this boot to a ring of the last HISTORY_SIZE boot
+# records kept in RTC memory, which survives resets and deep sleep but not a
+# power cycle. The ring is stored behind MAGIC; RTC memory that holds
+# something else is left alone and the ring goes to a file on flash instead,
+# as it does where the port has no RTC memory. spotpear.board_setup() saves
+# once the first frame is up.
+
+import time
+
+# Marks beyond this are dropped, so a mark() in a loop cannot eat the heap
+MAX_MARKS = 48
+
+# Boot records kept by save()
+HISTORY_SIZE = 4
+
+HISTORY_FILE = "/boottrace.json"
+
+# Marks RTC memory as holding the boot history
+MAGIC = b"BTR1"
+
+_marks = []
+
+def mark( name ):
+    if len(_marks) < MAX_MARKS:
+        _marks.append((name, time.ticks_us()))
+
+# List of (name, ticks_us) in the order they were marked
+def marks():
+    return list(_marks)
+
+# Prints a timeline, by default the one of this boot
+def report( record_marks=None ):
+    prev = None
+    for name, t in (_marks if record_marks is None else record_marks):
+        if prev is None:
+            print("%8.1f ms            %s" % (t / 1000, name))
+        else:
+            print("%8.1f ms %+7.1f ms %s" % (t / 1000, time.ticks_diff(t, prev) / 1000, name))
+        prev = t
+
+
+##############################################################################
+#
+# Boot history
+#
+# Records are {"cause": machine.reset_cause(), "marks": [[name, us], ...]},
+# stored as JSON, oldest first.
+#
+
+# The RTC if its memory is free or holds the history, None to use the file
+def _rtc():
+    try:
+        import machine
+        rtc = machine.RTC()
+        data = rtc.memory()
+    except (ImportError, AttributeError):
+        return None
+    if data and not data.startswith(MAGIC):
+        return None
+    return rtc
+
+def _read():
+    rtc = _rtc()
+    try:
+        if rtc is not None:
+            data = rtc.memory()[len(MAGIC):]
+        else:
+            with open(HISTORY_FILE, "rb") as f:
+                data = f.read()
+    except OSError:
+        return []
+    if not data:
+        return []
+    import json
+    try:
+        records = json.loads(data)
+    except ValueError:
+        # Cut short
+        return []
+    if not isinstance(records, list):
+        return []
+    return [r for r in records if isinstance(r, dict) and isinstance(r.get("marks"), list)]
+
+def _write( records ):
+    import json
+    rtc = _rtc()
+    while True:
+        data = json.dumps(records)
+        # RTC memory is 2 kB on the ESP32 ports, drop the oldest until it fits
+        if rtc is None or len(MAGIC) + len(data) <= 2048 or len(records) <= 1:
+            break
+        records.pop(0)
+    if rtc is not None:
+        # An empty history gives the RTC memory back
+        rtc.memory(MAGIC + data.encode() if records else b"")
+    else:
+        with open(HISTORY_FILE, "w") as f:
+            f.write(data)
+
+# Stores the marks of this boot as the newest record of the history
+def save():
+    try:
+        import machine
+        cause = machine.reset_cause()
+    except (ImportError, AttributeError):
+        cause = 0
+    records = _read()
+    records.append({"cause": cause, "marks": [[name, t] for name, t in _marks]})
+    del records[:-HISTORY_SIZE]
+    _write(records)
+
+# The saved boot records, oldest first
+def history():
+    return _read()
+
+def clear_history():
+    _write([])
@@ -1,5 +1,8 @@
 name = "spotpear"
 
+import boottrace
+boottrace.mark("spotpear import")
+
 # Global imports for most spotpear blocks
 # System/General imports
 import os
@@ -13,9 +16,21 @@ import machine
 import random
 import math
 
-# Graphics imports
-import lvgl as lv
-import st77xx
+# Graphics imports are deferred: lvgl, st77xx and framebuf are only loaded
+# when a program first draws, so one that just drives the LED or a pin
+# starts without them
+class _LazyModule:
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        mod = __import__(self._name)
+        # Later lookups in this module go straight to the real module
+        globals()[self._alias] = mod
+        return getattr(mod, attr)
+
+lv = _LazyModule("lvgl", "lv")
 
 ##############################################################################
 ##############################################################################
@@ -23,14 +38,51 @@ import st77xx
 # System initialization
 #
 
-def board_setup():
+# display="fb" drives the panel from a plain framebuffer instead of LVGL, see
+# "Framebuffer display" below
+def board_setup( display="lvgl" ):
+    import asyncio
+    asyncio.run(board_setup_async(display))
+
+# board_setup() as a coroutine, for programs that run their own asyncio loop.
+# The panel is reset and initialized in the background while the buttons and
+# the LED are set up, the boot timeline is in boottrace.
+async def board_setup_async( display="lvgl" ):
+    import asyncio
+    boottrace.mark("board_setup")
     # Soft reset causes a crash, so force a hard reset
     if machine.reset_cause() == machine.SOFT_RESET:
+        boottrace.mark("soft reset, forcing hard reset")
+        _boottrace_save()
         machine.reset()     
-    init_display()
-    clear_screen(0x0000ff)
+    panel = asyncio.create_task(init_display_async(display))
+    # Let the panel task get its reset pulse out, it then waits for the panel
+    await asyncio.sleep(0)
     button_setup_event_handler()
     set_led(0)
+    boottrace.mark("buttons and led")
+    await panel
+    if _fb is None:
+        lv.refr_now(lv.display_get_default())
+    boottrace.mark("first frame")
+    _boottrace_save()
+
+# The boot history is a diagnostic, it must not keep the board from starting
+def _boottrace_save():
+    try:
+        boottrace.save()
+    except Exception as e:
+        print("Boot history not saved:", e)
+
+# Timelines of the last few boots, oldest first. Each is a dict with the
+# reset cause and "marks", a list of (name, microseconds since the firmware
+# started) from _boot.py up to the first frame of board_setup().
+def boot_history():
+    return boottrace.history()
+
+# Prints the timeline of this boot, or of a record from boot_history()
+def boot_report( record=None ):
+    boottrace.report(None if record is None else record["marks"])
 
 
 ##############################################################################
@@ -39,41 +91,452 @@ def board_setup():
 # Timer/sleep related functions
 #
 
-# Timers in use for various tasks
-timer1 = machine.Timer(-1)
-timer2 = machine.Timer(-1)
-timer3 = machine.Timer(-1)
-timer4 = machine.Timer(-1)
-timer5 = machine.Timer(-1)
-
-# Expects gloabal timers 1..5
-def set_timer( timer = 1, _period = 5000, callback_fn = None):
-    # Create a one-shot timer that triggers after 5000 milliseconds (5 seconds)
-    if timer == 1:
-        timer1.init(mode=machine.Timer.ONE_SHOT, period=_period, callback=callback_fn)
-    elif timer == 2:
-        timer2.init(mode=machine.Timer.ONE_SHOT, period=_period, callback=callback_fn)
-    elif timer == 3:
-        timer3.init(mode=machine.Timer.ONE_SHOT, period=_period, callback=callback_fn)
-    elif timer == 4:
-        timer4.init(mode=machine.Timer.ONE_SHOT, period=_period, callback=callback_fn)
-    elif timer == 5:
-        timer5.init(mode=machine.Timer.ONE_SHOT, period=_period, callback=callback_fn)
+# Any number of one-shot and periodic timers, multiplexed on one
+# machine.Timer. Pending timers sit in a min-heap of
+# [due_ms, seq, id, period_ms, callback]; the machine timer is armed as a
+# one-shot for the earliest one and its callback only schedules
+# _timer_dispatch(), so user callbacks run in the VM and may allocate.
+# Callbacks get the timer id. A cancelled timer keeps its heap entry, with the
+# callback set to None, until it comes up or the heap is compacted.
+# The board's own timers, for waveforms and buttons, have ids that are
+# tuples starting with a name beginning with "_", e.g. ("_wave", 8);
+# cancel_all_timers() leaves them running.
+
+import heapq
+
+# machine.Timer used for all timers; the fixed timer1..timer5 used this id,
+# timer 0 drives the LVGL event loop
+TIMER_ID = -1
+
+_timer_hw = None
+_timer_heap = []
+_timer_entries = {}     # id -> live heap entry
+_timer_seq = 0
+_timer_stale = 0        # cancelled entries still in the heap
+_timer_ms = 0           # see _timer_now()
+_timer_t0 = None
+_timer_armed_for = None # due time the machine timer is armed for
+_timer_dispatches = 0
+_timer_fired = 0
+_timer_counts = {}      # id -> times fired, for wait_timer()
+
+# Milliseconds that keep counting where ticks_ms() wraps around, so due times
+# in the heap stay ordered
+def _timer_now():
+    global _timer_ms, _timer_t0
+    t = time.ticks_ms()
+    if _timer_t0 is not None:
+        _timer_ms += time.ticks_diff(t, _timer_t0)
+    _timer_t0 = t
+    return _timer_ms
+
+# Starts timer (any number or name) calling callback_fn(timer) after _period
+# milliseconds, and every _period milliseconds after that when periodic.
+# Setting a timer again replaces it.
+def set_timer( timer = 1, _period = 5000, callback_fn = None, periodic = False ):
+    global _timer_seq
+    cancel_timer(timer)
+    if callback_fn is None:
+        return
+    period = max(int(_period), 1)
+    _timer_seq += 1
+    entry = [_timer_now() + period, _timer_seq, timer, period if periodic else 0, callback_fn]
+    _timer_entries[timer] = entry
+    heapq.heappush(_timer_heap, entry)
+    _timer_arm()
+
+# Stops a timer before it fires again, returns False if it was not running
+def cancel_timer( timer ):
+    global _timer_stale
+    entry = _timer_entries.pop(timer, None)
+    if entry is None:
+        return False
+    entry[4] = None
+    _timer_stale += 1
+    # Timers restarted over and over leave many entries behind, drop them
+    # (in place: _timer_dispatch() may be working on the heap right now)
+    if _timer_stale > 2 * len(_timer_entries) + 8:
+        _timer_heap[:] = [e for e in _timer_heap if e[4] is not None]
+        heapq.heapify(_timer_heap)
+        _timer_stale = 0
+    return True
+
+# Stops every timer a program has set
+def cancel_all_timers():
+    for timer in list(_timer_entries):
+        if not _timer_internal(timer):
+            cancel_timer(timer)
+    _timer_arm()
+
+def _timer_internal( timer ):
+    return type(timer) is tuple and type(timer[0]) is str and timer[0][:1] == "_"
 
+# Counters of the timer wheel
+def timer_stats():
+    return {
+        "active": len(_timer_entries),
+        "pending": len(_timer_heap),
+        "dispatches": _timer_dispatches,
+        "fired": _timer_fired,
+    }
+
+# Arms the machine timer for the earliest live entry, or stops it
+def _timer_arm():
+    global _timer_hw, _timer_armed_for, _timer_stale
+    heap = _timer_heap
+    while heap and heap[0][4] is None:
+        heapq.heappop(heap)
+        _timer_stale -= 1
+    if not heap:
+        if _timer_hw is not None:
+            _timer_hw.deinit()
+        _timer_armed_for = None
+        return
+    due = heap[0][0]
+    if due == _timer_armed_for:
+        return
+    if _timer_hw is None:
+        _timer_hw = machine.Timer(TIMER_ID)
+    _timer_armed_for = due
+    _timer_hw.init(mode=machine.Timer.ONE_SHOT, period=max(due - _timer_now(), 1), callback=_timer_irq)
+
+def _timer_irq( t ):
+    try:
+        micropython.schedule(_timer_dispatch, None)
+    except RuntimeError:
+        # Schedule queue full, come back in a millisecond
+        t.init(mode=machine.Timer.ONE_SHOT, period=1, callback=_timer_irq)
+
+# Runs the callbacks of all timers that are due, then re-arms
+def _timer_dispatch( _ ):
+    global _timer_armed_for, _timer_dispatches, _timer_fired, _timer_stale
+    _timer_armed_for = None
+    _timer_dispatches += 1
+    heap = _timer_heap
+    now = _timer_now()
+    while heap and heap[0][0] <= now:
+        entry = heapq.heappop(heap)
+        callback = entry[4]
+        if callback is None:
+            _timer_stale -= 1
+            continue
+        timer = entry[2]
+        if entry[3]:
+            # Periods missed while the VM was busy are skipped, not fired in a burst
+            due = entry[0] + entry[3]
+            entry[0] = due if due > now else now + entry[3]
+            heapq.heappush(heap, entry)
+        else:
+            del _timer_entries[timer]
+            # Fired, compaction must not keep it
+            entry[4] = None
+        _timer_fired += 1
+        _timer_counts[timer] = _timer_counts.get(timer, 0) + 1
+        try:
+            callback(timer)
+        except Exception as e:
+            print("Timer", timer, "callback failed:", e)
+    _timer_arm()
+
+# spotpear.timer1..timer5, kept for programs that drive them like a
+# machine.Timer; they run on the timer wheel as timers 1..5
+class _WheelTimer:
+    def __init__(self, n):
+        self.n = n
+
+    def init(self, mode=None, period=-1, callback=None, freq=None):
+        if freq is not None:
+            period = 1000 // freq
+        set_timer(self.n, period, callback, mode is None or mode == machine.Timer.PERIODIC)
+
+    def deinit(self):
+        cancel_timer(self.n)
+
+# Plain module attributes so "from spotpear import *" still picks them up;
+# nothing is allocated until one is started
+timer1 = _WheelTimer(1)
+timer2 = _WheelTimer(2)
+timer3 = _WheelTimer(3)
+timer4 = _WheelTimer(4)
+timer5 = _WheelTimer(5)
+
+# Blocks everything, including other scripts; scripts use sleep_async()
 def sleep( ms ):
     time.sleep_ms( ms )
 
 
+##############################################################################
+##############################################################################
+#
+# Scripts
+#
+# Scratch runs many scripts at once: hat blocks, forever loops, timers. Here
+# every script is an asyncio task, written as an async function:
+#
+#   async def blink():
+#       while True:
+#           spotpear.set_led(1)
+#           await spotpear.sleep_async(500)
+#           spotpear.set_led(0)
+#           await spotpear.sleep_async(500)
+#
+#   async def on_button():
+#       while True:
+#           await spotpear.wait_button(1)
+#           spotpear.display_text_at_position("pressed")
+#
+#   spotpear.run_scripts(blink, on_button)
+#
+# Scripts take turns at every await. A loop that has nothing to wait for
+# calls await checkpoint(), which gives the others a turn once it has run
+# for SCRIPT_SLICE_MS. While scripts run the LVGL event loop is a script as
+# well, instead of a machine.Timer callback that could cut into a script
+# half way through a drawing. Each script's step count and run time are
+# kept, see script_stats(). A script that needs the board set up awaits
+# board_setup_async(), board_setup() would start a second event loop.
+#
+
+# Longest a script runs before checkpoint() lets the others have a turn
+SCRIPT_SLICE_MS = 20
+
+# How often the LVGL event loop runs while scripts run
+LVGL_PERIOD_MS = 20
+
+# How often wait_button() looks for a new press
+BUTTON_POLL_MS = 10
+
+_scripts = []           # _Script records in start order, see script_stats()
+_script_service = None  # the LVGL event loop script
+_script_current = None
+_script_step_t0 = 0
+
+# Runs a script's coroutine for the asyncio task and accounts for the time
+# each step takes. It is a coroutine itself as far as asyncio is concerned.
+class _Script:
+    def __init__(self, name, coro):
+        self.name = name
+        self.coro = coro
+        self.task = None
+        self.steps = 0
+        self.run_us = 0
+        self.max_us = 0
+        self.error = None
+        self.done = False
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def send(self, value):
+        return self._step(self.coro.send, value)
+
+    def throw(self, exc, *args):
+        return self._step(self.coro.throw, exc)
+
+    def close(self):
+        self.coro.close()
+
+    def _step(self, fn, arg):
+        global _script_current, _script_step_t0
+        t0 = time.ticks_us()
+        _script_current = self
+        _script_step_t0 = t0
+        try:
+            return fn(arg)
+        except StopIteration:
+            self.done = True
+            raise
+        except Exception as e:
+            # A failing script stops on its own, like in Scratch
+            self.done = True
+            self.error = e
+            print("Script", self.name, "failed:", e)
+            raise StopIteration
+        except BaseException:
+            self.done = True
+            raise
+        finally:
+            dt = time.ticks_diff(time.ticks_us(), t0)
+            self.steps += 1
+            self.run_us += dt
+            if dt > self.max_us:
+                self.max_us = dt
+            _script_current = None
+
+def _script_start( coro, name ):
+    import asyncio
+    script = _Script(name, coro)
+    script.task = asyncio.create_task(script)
+    _scripts.append(script)
+    return script
+
+# Starts fn (an async function, or a coroutine) as another script, from
+# inside a running script
+def start_script( fn, name=None ):
+    if name is None:
+        name = getattr(fn, "__name__", None) or "script%d" % len(_scripts)
+    return _script_start(fn() if callable(fn) else fn, name)
+
+# Runs the scripts until all of them have ended, scripts they start included
+def run_scripts( *scripts ):
+    import asyncio
+    asyncio.run(run_scripts_async(*scripts))
+
+async def run_scripts_async( *scripts ):
+    global _script_service
+    import asyncio
+    del _scripts[:]
+    event_loop = None
+    if _display is not None and _fb is None:
+        import lv_utils
+        event_loop = lv_utils.event_loop.current_instance()
+        if event_loop is not None:
+            event_loop.deinit()
+        _script_service = _script_start(_lvgl_service(), "lvgl")
+    try:
+        for fn in scripts:
+            start_script(fn)
+        # Scripts started meanwhile are appended and waited for as well
+        for script in _scripts:
+            if script is _script_service:
+                continue
+            try:
+                await script.task
+            except asyncio.CancelledError:
+                pass
+    finally:
+        if _script_service is not None:
+            _script_service.task.cancel()
+            _script_service = None
+        if event_loop is not None:
+            lv_utils.event_loop()
+
+# Does what the lv_utils event loop did: advances the LVGL tick by the time
+# that passed, then runs the LVGL timers
+async def _lvgl_service():
+    import asyncio
+    last = time.ticks_ms()
+    while True:
+        now = time.ticks_ms()
+        lv.tick_inc(time.ticks_diff(now, last))
+        last = now
+        lv.task_handler()
+        await asyncio.sleep(LVGL_PERIOD_MS / 1000)
+
+# Cancels all scripts, like the Scratch stop block
+def stop_scripts():
+    for script in _scripts:
+        if script is not _script_service and not script.done:
+            script.task.cancel()
+
+# Per script: steps run, total and longest step in microseconds, and whether
+# it has ended. The LVGL event loop is listed as "lvgl".
+def script_stats():
+    return [{
+        "name": s.name,
+        "steps": s.steps,
+        "run_us": s.run_us,
+        "max_us": s.max_us,
+        "done": s.done,
+        "error": None if s.error is None else repr(s.error),
+    } for s in _scripts]
+
+async def sleep_async( ms ):
+    import asyncio
+    await asyncio.sleep(ms / 1000)
+
+# Gives the other scripts a turn if this one has run for SCRIPT_SLICE_MS
+async def checkpoint():
+    if _script_current is None or time.ticks_diff(time.ticks_us(), _script_step_t0) >= SCRIPT_SLICE_MS * 1000:
+        import asyncio
+        await asyncio.sleep(0)
+
+# Waits for the next press of button 1 or 2, or of both together (any other
+# number, as in set_button_callback()). Returns False if timeout_ms passed
+# first. Presses are counted by the button handler; callbacks set with
+# set_button_callback() still run.
+async def wait_button( button=1, timeout_ms=None ):
+    import asyncio
+    n = 0 if button not in (1, 2) else button
+    count = _button_presses[n]
+    start = time.ticks_ms()
+    while _button_presses[n] == count:
+        if timeout_ms is not None and time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+            return False
+        await asyncio.sleep(BUTTON_POLL_MS / 1000)
+    return True
+
+def _timer_noop( timer ):
+    pass
+
+# Waits until timer fires next. With _period the timer is first started as a
+# one-shot that fires after _period milliseconds, replacing any callback.
+# Returns False if the timer is cancelled or was not running.
+async def wait_timer( timer=1, _period=None ):
+    import asyncio
+    if _period is not None:
+        set_timer(timer, _period, _timer_noop)
+    count = _timer_counts.get(timer, 0)
+    while _timer_counts.get(timer, 0) == count:
+        entry = _timer_entries.get(timer)
+        if entry is None:
+            return _timer_counts.get(timer, 0) != count
+        # Sleep until it is due; it fires a little later, from the timer interrupt
+        await asyncio.sleep(max(entry[0] - _timer_now(), 1) / 1000)
+    return True
+
+
 ##############################################################################
 ##############################################################################
 #
 # Display related functions
 #
-def init_display():
+_display = None
+
+def init_display( display="lvgl" ):
+    _display_create(display, True)
+    _display_start(display)
+
+# init_display() with the panel reset and init sequence run as a coroutine, on
+# the shortest timings the datasheet allows
+async def init_display_async( display="lvgl" ):
+    _display_create(display, False)
+    boottrace.mark("panel reset")
+    if display == "lvgl":
+        # Nothing may be flushed while the init sequence is on the bus
+        timer = lv.display_get_default().get_refr_timer()
+        timer.pause()
+        try:
+            await _display.hard_reset_async()
+        finally:
+            timer.resume()
+    else:
+        await _display.hard_reset_async()
+    boottrace.mark("panel ready")
+    _display_start(display)
+
+def _display_create( display, reset ):
+    global _display
+    import st77xx
+    if display not in ("lvgl", "fb"):
+        raise ValueError("display must be 'lvgl' or 'fb'")
     spi = machine.SPI( 1, baudrate=40_000_000, polarity=0, phase=0, sck=machine.Pin(3, machine.Pin.OUT), mosi=machine.Pin(4, machine.Pin.OUT), )
-    disp = st77xx.St7735(rot=st77xx.ST77XX_MIRROR_PORTRAIT,res=(128,128), model='redtab', spi=spi, cs=2, dc=0, rst=5, rp2_dma=None, )
-    scr = lv.obj()
-    lv.screen_load(scr)
+    if display == "fb":
+        _display = st77xx.St7735_hw(rot=st77xx.ST77XX_MIRROR_PORTRAIT,res=(128,128), model='redtab', spi=spi, cs=2, dc=0, rst=5, rp2_dma=None, reset=reset, )
+    else:
+        _display = st77xx.St7735(rot=st77xx.ST77XX_MIRROR_PORTRAIT,res=(128,128), model='redtab', spi=spi, cs=2, dc=0, rst=5, rp2_dma=None, reset=reset, )
+
+def _display_start( display ):
+    if display == "fb":
+        _fb_setup()
+    else:
+        scr = lv.obj()
+        lv.screen_load(scr)
     clear_screen(0x0000ff)
 
 def rbg_to_rgb( hexcolor ):
@@ -84,79 +547,752 @@ def rbg_to_rgb( hexcolor ):
     return (r << 16) | (g << 8) | b
 
 
-def clear_screen( color=0x003a57 ):
+# With direct=True the panel is filled by the driver without going through
+# LVGL; objects LVGL draws later paint over it again
+def clear_screen( color=0x003a57, flush_styles=False, direct=False ):
+    global _pixel_canvas
+    if _fb is not None:
+        _fb_clear(color)
+        return
+    if direct:
+        _display.clear(_color565(color))
+        return
     screen = lv.screen_active()
     screen.clean()
+    # The canvas object went with clean(), its buffer is kept for reuse
+    _pixel_canvas = None
+    _retained.clear()
+    if flush_styles:
+        style_cache_flush()
+    # No object uses any style anymore
+    _style_users.clear()
+    _style_retired.clear()
     set_screen_background_color( color )
 
 def set_screen_background_color( color ) :
+    global _screen_bg
+    if _fb is not None:
+        _fb_background(color)
+        return
+    _screen_bg = color
     screen = lv.screen_active()
     screen.set_style_bg_color(lv.color_hex(rbg_to_rgb(color)), lv.PART.MAIN)
+    # The pixel layer is opaque, so it takes the background color as well
+    if _pixel_canvas is not None:
+        _pixel_fill(0, 0, _pixel_w, _pixel_h, _color565(color))
+
+
+##############################################################################
+#
+# Pixel layer
+#
+# With pixel mode enabled draw_pixel, draw_line and draw_rectangle rasterize
+# into a single RGB565 canvas that covers the screen instead of creating an
+# LVGL object per call. The buffer is allocated once and reused for the whole
+# program, only the touched bounding box is invalidated on each draw.
+#
+
+_pixel_mode = False
+_pixel_buf = None
+_pixel_canvas = None
+_pixel_screen = None
+_pixel_w = 0
+_pixel_h = 0
+_screen_bg = 0x003a57
+
+# Turns canvas backed plotting on or off, objects already drawn are kept
+def set_pixel_mode( enabled=True ):
+    global _pixel_mode
+    _pixel_mode = bool(enabled)
+
+def _color565( color ):
+    """Convert 0xRBG color to the RGB565 value used in the pixel layer."""
+    c = rbg_to_rgb(color)
+    return ((c >> 8) & 0xF800) | ((c >> 5) & 0x07E0) | ((c >> 3) & 0x001F)
+
+# Returns the canvas of the active screen, creating it on first use
+def _pixel_layer():
+    global _pixel_buf, _pixel_canvas, _pixel_screen, _pixel_w, _pixel_h
+    scr = lv.screen_active()
+    if _pixel_canvas is not None and _pixel_screen is scr:
+        return _pixel_canvas
+    w = scr.get_width()
+    h = scr.get_height()
+    if _pixel_buf is None or len(_pixel_buf) != w * h * 2:
+        _pixel_buf = None
+        _pixel_buf = bytearray(w * h * 2)
+    _pixel_w, _pixel_h = w, h
+    canvas = lv.canvas(scr)
+    canvas.set_buffer(_pixel_buf, w, h, lv.COLOR_FORMAT.RGB565)
+    canvas.set_pos(0, 0)
+    canvas.remove_flag(lv.obj.FLAG.SCROLLABLE)
+    canvas.remove_flag(lv.obj.FLAG.CLICKABLE)
+    # Keep the layer behind objects that were drawn before it existed
+    canvas.move_background()
+    _pixel_canvas = canvas
+    _pixel_screen = scr
+    _pixel_fill(0, 0, w, h, _color565(_screen_bg))
+    return canvas
+
+# Fills a clipped rectangle of the pixel layer and invalidates just that area
+def _pixel_fill( x, y, w, h, c565 ):
+    x1 = max(x, 0)
+    y1 = max(y, 0)
+    x2 = min(x + w, _pixel_w)
+    y2 = min(y + h, _pixel_h)
+    if x1 >= x2 or y1 >= y2:
+        return
+    row = bytes((c565 & 0xFF, c565 >> 8)) * (x2 - x1)
+    buf = _pixel_buf
+    stride = _pixel_w * 2
+    off = y1 * stride + x1 * 2
+    n = len(row)
+    for _ in range(y2 - y1):
+        buf[off:off + n] = row
+        off += stride
+    _pixel_invalidate(x1, y1, x2 - 1, y2 - 1)
+
+def _pixel_invalidate( x1, y1, x2, y2 ):
+    area = lv.area_t()
+    area.x1 = x1
+    area.y1 = y1
+    area.x2 = x2
+    area.y2 = y2
+    _pixel_canvas.invalidate_area(area)
+
+def _pixel_line( x1, y1, x2, y2, c565, width ):
+    # Bresenham, with a width x width block per step for thick lines
+    buf = _pixel_buf
+    pw, ph = _pixel_w, _pixel_h
+    lo, hi = c565 & 0xFF, c565 >> 8
+    half = width // 2
+    dx = abs(x2 - x1)
+    dy = -abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx + dy
+    x, y = x1, y1
+    while True:
+        for py in range(y - half, y - half + width):
+            if 0 <= py < ph:
+                for px in range(x - half, x - half + width):
+                    if 0 <= px < pw:
+                        i = (py * pw + px) * 2
+                        buf[i] = lo
+                        buf[i + 1] = hi
+        if x == x2 and y == y2:
+            break
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x += sx
+        if e2 <= dx:
+            err += dx
+            y += sy
+    bx1 = max(min(x1, x2) - half, 0)
+    by1 = max(min(y1, y2) - half, 0)
+    bx2 = min(max(x1, x2) - half + width - 1, pw - 1)
+    by2 = min(max(y1, y2) - half + width - 1, ph - 1)
+    if bx1 <= bx2 and by1 <= by2:
+        _pixel_invalidate(bx1, by1, bx2, by2)
+
+
+##############################################################################
+#
+# Shared styles
+#
+# Drawing helpers take their look from a bounded LRU cache of lv.style_t
+# keyed by (kind, size, color, radius, border) instead of allocating a style
+# or local style properties per object. The objects using each style are
+# counted; an evicted style that is still in use is parked until the last of
+# them is restyled or removed, or clear_screen() deletes them all.
+#
+
+from collections import OrderedDict
+
+STYLE_CACHE_SIZE = 24
+
+_style_cache = OrderedDict()
+_style_retired = {}     # id(style) -> evicted style objects still use
+_style_users = {}       # id(style) -> number of objects using it
+_style_hits = 0
+_style_misses = 0
+_style_evictions = 0
+
+def _font( size ):
+    if size == 16:
+        return lv.font_montserrat_16
+    elif size == 24:
+        return lv.font_montserrat_24
+    return lv.font_montserrat_14  # Default to 14 if size is unrecognized
+
+# Returns the shared style for the given look, creating it on a miss
+#   kind   : "text", "box" or "line"
+#   size   : font size for text, line width for lines
+#   radius : corner radius for boxes, None keeps the theme default
+#   border : (width, color) for boxes, None keeps the theme default
+def _shared_style( kind, size=0, color=0, radius=None, border=None ):
+    global _style_hits, _style_misses, _style_evictions
+    key = (kind, size, color, radius, border)
+    style = _style_cache.pop(key, None)
+    if style is not None:
+        _style_hits += 1
+        _style_cache[key] = style  # Re-insert as most recently used
+        return style
+    _style_misses += 1
+    style = lv.style_t()
+    style.init()
+    c = lv.color_hex(rbg_to_rgb(color))
+    if kind == "text":
+        style.set_text_font(_font(size))
+        style.set_text_color(c)
+    elif kind == "line":
+        style.set_line_color(c)
+        style.set_line_width(size)
+    else:
+        style.set_bg_color(c)
+        if radius is not None:
+            style.set_radius(radius)
+        if border is not None:
+            style.set_border_width(border[0])
+            style.set_border_color(lv.color_hex(rbg_to_rgb(border[1])))
+    if len(_style_cache) >= STYLE_CACHE_SIZE:
+        oldest = next(iter(_style_cache))
+        _style_retire(_style_cache.pop(oldest))
+        _style_evictions += 1
+    _style_cache[key] = style
+    return style
+
+# Returns hit/miss/eviction counters of the style cache
+def style_cache_stats():
+    return {
+        "size": len(_style_cache),
+        "capacity": STYLE_CACHE_SIZE,
+        "hits": _style_hits,
+        "misses": _style_misses,
+        "evictions": _style_evictions,
+        "retired": len(_style_retired),
+    }
+
+# Drops all cached styles; they are released once their objects are deleted
+def style_cache_flush():
+    while _style_cache:
+        _style_retire(_style_cache.pop(next(iter(_style_cache))))
+
+# Counts n more objects using style
+def _style_use( style, n=1 ):
+    k = id(style)
+    _style_users[k] = _style_users.get(k, 0) + n
+
+# An object stopped using style, an evicted style goes with its last user
+def _style_unuse( style ):
+    k = id(style)
+    n = _style_users.get(k, 0) - 1
+    if n > 0:
+        _style_users[k] = n
+        return
+    _style_users.pop(k, None)
+    _style_retired.pop(k, None)
+
+# Keeps an evicted style for as long as objects use it
+def _style_retire( style ):
+    k = id(style)
+    if k in _style_users:
+        _style_retired[k] = style
+
+
+##############################################################################
+#
+# Frame batching
+#
+# Between begin_frame() and end_frame() the LVGL refresh timer is paused, so
+# drawing calls only mark areas dirty. LVGL joins the dirty areas and the
+# whole frame is rendered and flushed once at end_frame(). Nesting is allowed,
+# only the outermost end_frame() commits.
+#
+#   with spotpear.batch():
+#       spotpear.draw_rectangle(...)
+#       spotpear.display_text_at_position(...)
+#
+
+_frame_depth = 0
+_frame_calls = 0
+_frame_est_flushes = 0
+_frame_est_bytes = 0
+_frame_start = (0, 0)
+_frame_stats = None
+
+def begin_frame():
+    global _frame_depth, _frame_calls, _frame_est_flushes, _frame_est_bytes, _frame_start
+    _frame_depth += 1
+    if _frame_depth > 1:
+        return
+    _frame_calls = 0
+    _frame_est_flushes = 0
+    _frame_est_bytes = 0
+    _frame_start = _flush_counters()
+    if _fb is None:
+        lv.display_get_default().get_refr_timer().pause()
+
+def end_frame():
+    global _frame_depth, _frame_stats
+    if _frame_depth == 0:
+        return _frame_stats
+    _frame_depth -= 1
+    if _frame_depth > 0:
+        return None
+    if _fb is not None:
+        _fb_flush()
+    else:
+        disp = lv.display_get_default()
+        disp.get_refr_timer().resume()
+        lv.refr_now(disp)
+    counters = _flush_counters()
+    flushes = counters[0] - _frame_start[0]
+    flushed = counters[1] - _frame_start[1]
+    _frame_stats = {
+        "calls": _frame_calls,
+        "flushes": flushes,
+        "bytes": flushed,
+        "flushes_saved": max(_frame_est_flushes - flushes, 0),
+        "bytes_saved": max(_frame_est_bytes - flushed, 0),
+    }
+    return _frame_stats
+
+# Flushes and bytes sent to the panel so far, by LVGL or the framebuffer
+def _flush_counters():
+    if _fb is not None:
+        return (_fb_flushes, _fb_flush_bytes)
+    if _display is not None:
+        return (_display.flush_count, _display.flush_bytes)
+    return (0, 0)
+
+# Statistics of the last committed frame, or None
+def frame_stats():
+    return _frame_stats
+
+class batch:
+    """Context manager wrapping begin_frame()/end_frame()."""
+    def __enter__(self):
+        begin_frame()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_frame()
+        return False
+
+# Records what a drawing call would have cost if it was flushed on its own
+def _frame_note( w, h ):
+    global _frame_calls, _frame_est_flushes, _frame_est_bytes
+    if not _frame_depth or w <= 0 or h <= 0:
+        return
+    _frame_calls += 1
+    # The framebuffer sends every call as one window
+    band = getattr(_display, "band_height", h)
+    _frame_est_flushes += (h + band - 1) // band
+    _frame_est_bytes += w * h * 2
+
+
+##############################################################################
+#
+# Framebuffer display
+#
+# board_setup(display="fb") drives the panel without LVGL. There is no
+# display driver, event loop or draw buffers: drawing goes straight into one
+# RGB565 framebuf.FrameBuffer, kept in the byte order of the panel, and the
+# bounding box of what changed is pushed with the driver after each call, or
+# once at end_frame() inside a batch. Text uses the built-in 8x8 font, scaled
+# up for bigger sizes.
+#
+# Drawing is immediate: an item drawn with id=... is painted over with the
+# background when it is drawn again or removed, together with anything that
+# overlapped it.
+#
+
+_fb = None
+_fb_buf = None
+_fb_w = 0
+_fb_h = 0
+_fb_dirty = None    # [x1, y1, x2, y2], ends exclusive
+_fb_items = {}      # id -> (x, y, w, h)
+_fb_epoch = 0       # bumped by clear_screen(), Matrix redraws from scratch then
+_fb_flushes = 0
+_fb_flush_bytes = 0
+_fb_glyph = None
+
+def _fb_setup():
+    global _fb, _fb_buf, _fb_w, _fb_h, _fb_glyph
+    import framebuf
+    _fb_w, _fb_h = _display.width, _display.height
+    _fb_buf = bytearray(_fb_w * _fb_h * 2)
+    _fb = framebuf.FrameBuffer(_fb_buf, _fb_w, _fb_h, framebuf.RGB565)
+    _fb_glyph = framebuf.FrameBuffer(bytearray(8), 8, 8, framebuf.MONO_HLSB)
+
+# framebuf stores RGB565 little endian, the panel wants it big endian
+def _fb_color( color ):
+    c = _color565(color)
+    return ((c & 0xFF) << 8) | (c >> 8)
+
+# Adds a rectangle to the area that has to go to the panel
+def _fb_touch( x, y, w, h ):
+    global _fb_dirty
+    x1 = max(x, 0)
+    y1 = max(y, 0)
+    x2 = min(x + w, _fb_w)
+    y2 = min(y + h, _fb_h)
+    if x1 >= x2 or y1 >= y2:
+        return
+    d = _fb_dirty
+    if d is None:
+        _fb_dirty = [x1, y1, x2, y2]
+    else:
+        d[0] = min(d[0], x1)
+        d[1] = min(d[1], y1)
+        d[2] = max(d[2], x2)
+        d[3] = max(d[3], y2)
+
+# Sends the changed area to the panel
+def _fb_flush():
+    global _fb_dirty, _fb_flushes, _fb_flush_bytes
+    d = _fb_dirty
+    if d is None:
+        return
+    _fb_dirty = None
+    x1, y1, x2, y2 = d
+    stride = _fb_w * 2
+    if x1 == 0 and x2 == _fb_w:
+        # whole rows are contiguous in the buffer
+        _display.blit(0, y1, _fb_w, y2 - y1, memoryview(_fb_buf)[y1 * stride:y2 * stride])
+    else:
+        _display.blit_rows(x1, y1, x2 - x1, y2 - y1, _fb_buf, stride)
+    _fb_flushes += 1
+    _fb_flush_bytes += (x2 - x1) * (y2 - y1) * 2
+
+# Paints over the item drawn with id, if any
+def _fb_erase( id ):
+    if id is None:
+        return
+    box = _fb_items.pop(id, None)
+    if box is not None:
+        _fb.fill_rect(box[0], box[1], box[2], box[3], _fb_color(_screen_bg))
+        _fb_touch(box[0], box[1], box[2], box[3])
+
+# Ends a drawing call: remembers the item and flushes unless in a batch
+def _fb_done( id, x, y, w, h ):
+    if id is not None:
+        _fb_items[id] = (x, y, w, h)
+    _fb_touch(x, y, w, h)
+    _frame_note(w, h)
+    if not _frame_depth:
+        _fb_flush()
+
+def _fb_clear( color ):
+    global _fb_epoch, _screen_bg
+    _screen_bg = color
+    _fb.fill(_fb_color(color))
+    _fb_items.clear()
+    _fb_epoch += 1
+    _fb_touch(0, 0, _fb_w, _fb_h)
+    if not _frame_depth:
+        _fb_flush()
+
+# Rows _fb_background() goes through at a time
+_FB_BG_ROWS = 8
+
+# Changes the background and keeps what was drawn on it, as LVGL does: the
+# pixels still in the old background color take the new one. Each band of
+# rows is copied to a scratch buffer filled with the new color, leaving out
+# the old one, and back.
+def _fb_background( color ):
+    global _screen_bg
+    import framebuf
+    old = _fb_color(_screen_bg)
+    _screen_bg = color
+    new = _fb_color(color)
+    if new == old:
+        return
+    rows = _FB_BG_ROWS
+    band = framebuf.FrameBuffer(bytearray(_fb_w * rows * 2), _fb_w, rows, framebuf.RGB565)
+    for y in range(0, _fb_h, rows):
+        band.fill(new)
+        band.blit(_fb, 0, -y, old)
+        _fb.blit(band, 0, y)
+    _fb_touch(0, 0, _fb_w, _fb_h)
+    if not _frame_depth:
+        _fb_flush()
+
+def _fb_line( x1, y1, x2, y2, c, width ):
+    # Thick lines are drawn as parallel 1 pixel lines across the main direction
+    half = width // 2
+    steep = abs(y2 - y1) > abs(x2 - x1)
+    for d in range(-half, width - half):
+        if steep:
+            _fb.line(x1 + d, y1, x2 + d, y2, c)
+        else:
+            _fb.line(x1, y1 + d, x2, y2 + d, c)
+
+# Text in the 8x8 font, each font pixel drawn as a scale x scale block
+def _fb_text( text, x, y, c, scale ):
+    if scale == 1:
+        _fb.text(text, x, y, c)
+        return
+    glyph = _fb_glyph
+    for ch in text:
+        glyph.fill(0)
+        glyph.text(ch, 0, 0, 1)
+        for gy in range(8):
+            for gx in range(8):
+                if glyph.pixel(gx, gy):
+                    _fb.fill_rect(x + gx * scale, y + gy * scale, scale, scale, c)
+        x += 8 * scale
+
+# Font sizes 14/16 map to the plain 8x8 font, 24 to double size
+def _fb_text_scale( size ):
+    return max(size // 12, 1)
+
+# A square cell with the 1 pixel black border the LVGL grid cells have
+def _fb_cell( x, y, w, h, color ):
+    _fb.rect(x, y, w, h, 0)
+    _fb.fill_rect(x + 1, y + 1, w - 2, h - 2, _fb_color(color))
+
+
+##############################################################################
+#
+# Retained drawing
+#
+# Passing id="..." to a drawing helper keeps the object under that id. Drawing
+# again with the same id updates the existing object in place (position,
+# size, text, color) instead of creating a new one, so LVGL only redraws and
+# flushes the area of the widget that changed. Records are
+# [kind, obj, style, pos, extra] and go away with clear_screen().
+#
+
+_retained = {}
+
+# Returns the record for id if it holds the same kind of object
+def _retained_get( id, kind ):
+    if id is None:
+        return None
+    rec = _retained.get(id)
+    if rec is None:
+        return None
+    if rec[0] != kind:
+        remove_item(id)
+        return None
+    return rec
+
+def _retain( id, kind, obj, style, pos, extra ):
+    if id is not None:
+        _retained[id] = [kind, obj, style, pos, extra]
+    return obj
+
+# Moves and restyles a retained object, returns True when anything changed
+def _retained_update( rec, pos, style, selector=0 ):
+    obj = rec[1]
+    changed = False
+    if rec[3] != pos:
+        obj.set_pos(pos[0], pos[1])
+        rec[3] = pos
+        changed = True
+    if rec[2] is not style:
+        obj.remove_style(rec[2], selector)
+        obj.add_style(style, selector)
+        _style_use(style)
+        _style_unuse(rec[2])
+        rec[2] = style
+        changed = True
+    return changed
+
+# Returns the object drawn with the given id, or None. With the framebuffer
+# display it is the (x, y, width, height) the item covers.
+def get_item( id ):
+    if _fb is not None:
+        return _fb_items.get(id)
+    rec = _retained.get(id)
+    return rec[1] if rec is not None else None
+
+# Deletes the object drawn with the given id
+def remove_item( id ):
+    if _fb is not None:
+        _fb_erase(id)
+        if not _frame_depth:
+            _fb_flush()
+        return
+    rec = _retained.pop(id, None)
+    if rec is not None:
+        rec[1].delete()
+        _style_unuse(rec[2])
+
 
 # Drawing a pixel at a given position with a given color
-def draw_pixel( x=0, y=0, _color=0xff0000 ):
+def draw_pixel( x=0, y=0, _color=0xff0000, id=None ):
+    if _fb is not None:
+        _fb_erase(id)
+        _fb.pixel(x, y, _fb_color(_color))
+        _fb_done(id, x, y, 1, 1)
+        return None
+    if _pixel_mode and id is None:
+        _pixel_layer()
+        _pixel_fill(x, y, 1, 1, _color565(_color))
+        _frame_note(1, 1)
+        return None
+    style = _shared_style("box", color=_color)
+    rec = _retained_get(id, "pixel")
+    if rec is not None:
+        if _retained_update(rec, (x, y), style):
+            _frame_note(1, 1)
+        return rec[1]
+    _frame_note(1, 1)
     scr = lv.screen_active()
     pixel = lv.obj(scr)
     pixel.set_size(1, 1)
     pixel.remove_flag(lv.obj.FLAG.SCROLLABLE)
     pixel.set_pos(x, y)
-    pixel.set_style_bg_color(lv.color_hex(rbg_to_rgb(_color)), 0)
-    return pixel
+    pixel.add_style(style, 0)
+    _style_use(style)
+    return _retain(id, "pixel", pixel, style, (x, y), None)
 
 # Drawing a rectangle at a given position with a given width, height and color
-def draw_rectangle(x=10, y=10, width=20, height=20, _color=0x00ff00):
+# direct=True fills it on the panel with the driver, bypassing LVGL
+def draw_rectangle(x=10, y=10, width=20, height=20, _color=0x00ff00, id=None, direct=False):
+    if _fb is not None:
+        _fb_erase(id)
+        _fb.fill_rect(x, y, width, height, _fb_color(_color))
+        _fb_done(id, x, y, width, height)
+        return None
+    if direct:
+        _display.fill_rect(x, y, width, height, _color565(_color))
+        return None
+    if _pixel_mode and id is None:
+        _pixel_layer()
+        _pixel_fill(x, y, width, height, _color565(_color))
+        _frame_note(width, height)
+        return None
+    style = _shared_style("box", color=_color, radius=0)
+    rec = _retained_get(id, "rect")
+    if rec is not None:
+        rect = rec[1]
+        changed = _retained_update(rec, (x, y), style, lv.PART.MAIN)
+        if rec[4] != (width, height):
+            rect.set_size(width, height)
+            rec[4] = (width, height)
+            changed = True
+        if changed:
+            _frame_note(width, height)
+        return rect
+    _frame_note(width, height)
     scr = lv.screen_active()
-    color = lv.color_hex(rbg_to_rgb(_color))
     rect = lv.obj(scr)
     rect.set_size(width, height)
     rect.set_pos(x, y)
-    rect.set_style_bg_color(color, 0)
+    rect.add_style(style, lv.PART.MAIN)
+    _style_use(style)
     rect.remove_flag(lv.obj.FLAG.SCROLLABLE)
-    rect.set_style_radius(0,lv.PART.MAIN)
-    return rect
+    return _retain(id, "rect", rect, style, (x, y), (width, height))
 
 # Drwing a line between two points with a given color and width
-def draw_line(x1=10, y1=10, x2=50, y2=50, _color=0x0000ff, width=2):
+def draw_line(x1=10, y1=10, x2=50, y2=50, _color=0x0000ff, width=2, id=None):
+    if _fb is not None:
+        _fb_erase(id)
+        width = max(width, 1)
+        _fb_line(x1, y1, x2, y2, _fb_color(_color), width)
+        half = width // 2
+        _fb_done(id, min(x1, x2) - half, min(y1, y2) - half, abs(x2 - x1) + width, abs(y2 - y1) + width)
+        return None
+    if _pixel_mode and id is None:
+        _pixel_layer()
+        _pixel_line(x1, y1, x2, y2, _color565(_color), max(width, 1))
+        _frame_note(abs(x2 - x1) + width, abs(y2 - y1) + width)
+        return None
+    style = _shared_style("line", width, _color)
+    rec = _retained_get(id, "line")
+    if rec is not None:
+        line = rec[1]
+        # Points are absolute, so the position slot holds both end points
+        changed = rec[3] != (x1, y1, x2, y2)
+        if changed:
+            points = [lv.point_precise_t({"x": x1, "y": y1}), lv.point_precise_t({"x": x2, "y": y2})]
+            line.set_points(points, 2)
+            rec[3] = (x1, y1, x2, y2)
+            rec[4] = points
+        if rec[2] is not style:
+            line.remove_style(rec[2], 0)
+            line.add_style(style, 0)
+            _style_use(style)
+            _style_unuse(rec[2])
+            rec[2] = style
+            changed = True
+        if changed:
+            _frame_note(abs(x2 - x1) + width, abs(y2 - y1) + width)
+        return line
+    _frame_note(abs(x2 - x1) + width, abs(y2 - y1) + width)
     scr = lv.screen_active()
-    color = lv.color_hex(rbg_to_rgb(_color))
     line = lv.line(scr)
-    line.set_points([lv.point_precise_t({"x": x1, "y": y1}), lv.point_precise_t({"x": x2, "y": y2})],2)
-    line.set_style_line_color(color, 0)
-    line.set_style_line_width(width, 0)
-    return line
+    points = [lv.point_precise_t({"x": x1, "y": y1}), lv.point_precise_t({"x": x2, "y": y2})]
+    line.set_points(points,2)
+    line.add_style(style, 0)
+    _style_use(style)
+    return _retain(id, "line", line, style, (x1, y1, x2, y2), points)
 
 # Draws a circle at a given position with a given radius and color
-def draw_circle(x=10, y=10, radius=10, _color=0xff0000):
+def draw_circle(x=10, y=10, radius=10, _color=0xff0000, id=None):
+    if _fb is not None:
+        _fb_erase(id)
+        _fb.ellipse(x, y, radius, radius, _fb_color(_color), True)
+        _fb_done(id, x - radius, y - radius, radius * 2 + 1, radius * 2 + 1)
+        return None
+    style = _shared_style("box", color=_color, radius=lv.RADIUS_CIRCLE)
+    rec = _retained_get(id, "circle")
+    if rec is not None:
+        circle = rec[1]
+        changed = _retained_update(rec, (x - radius, y - radius), style)
+        if rec[4] != radius:
+            circle.set_size(radius * 2, radius * 2)
+            rec[4] = radius
+            changed = True
+        if changed:
+            _frame_note(radius * 2, radius * 2)
+        return circle
+    _frame_note(radius * 2, radius * 2)
     scr = lv.screen_active()
-    color = lv.color_hex(rbg_to_rgb(_color))
     circle = lv.obj(scr)
     circle.set_size(radius * 2, radius * 2)
     circle.set_pos(x - radius, y - radius)
-    circle.set_style_bg_color(color, 0)
-    circle.set_style_radius(lv.RADIUS_CIRCLE, 0)
-    return circle
+    circle.add_style(style, 0)
+    _style_use(style)
+    return _retain(id, "circle", circle, style, (x - radius, y - radius), radius)
 
 
 # Draws text at a given position with a given color and size
-def display_text_at_position(label_text="Hello World!", x=10, y=10, color=0xffffff, size=14):
+def display_text_at_position(label_text="Hello World!", x=10, y=10, color=0xffffff, size=14, id=None):
+    if _fb is not None:
+        _fb_erase(id)
+        text = str(label_text)
+        scale = _fb_text_scale(size)
+        _fb_text(text, x, y, _fb_color(color), scale)
+        _fb_done(id, x, y, len(text) * 8 * scale, 8 * scale)
+        return None
+    style = _shared_style("text", size, color)
+    rec = _retained_get(id, "text")
+    if rec is not None:
+        label = rec[1]
+        changed = _retained_update(rec, (x, y), style)
+        if rec[4] != label_text:
+            lv.label.set_text(label, label_text)
+            rec[4] = label_text
+            changed = True
+        if changed:
+            _frame_note(len(str(label_text)) * size * 6 // 10, size + size // 4)
+        return label
     screen = lv.screen_active()
     label = lv.label(screen)
     lv.label.set_text(label, label_text)
     label.set_pos(x, y)
-    label_style = lv.style_t()
-    label_style.init()
-    if size == 14:
-        font = lv.font_montserrat_14
-    elif size == 16:
-        font = lv.font_montserrat_16
-    elif size == 24:
-        font = lv.font_montserrat_24
-    else:
-        font = lv.font_montserrat_14  # Default to 14 if size is unrecognized
-    label_style.set_text_font(font)
-    label_style.set_text_color(lv.color_hex(rbg_to_rgb(color)))
-    label.add_style(label_style, 0)
-    return label
+    # Glyphs average about 0.6 of the font height in width
+    _frame_note(len(str(label_text)) * size * 6 // 10, size + size // 4)
+    label.add_style(style, 0)
+    _style_use(style)
+    return _retain(id, "text", label, style, (x, y), label_text)
 
 # For matrix displaying we need to parse the string into a 2D array 
 def parse_matrix(input_str):
@@ -191,8 +1327,17 @@ def draw_grid(grid, border, square_color, screen_width, screen_height):
     total_border_y = border * (N + 1)
     square_width = (screen_width - total_border_x) // N
     square_height = (screen_height - total_border_y) // N
+    if _fb is not None:
+        for row in range(N):
+            for col in range(N):
+                if grid[row][col] == 1:
+                    _fb_cell(border + col * (square_width + border), border + row * (square_height + border),
+                             square_width, square_height, square_color)
+        _fb_done(None, 0, 0, screen_width, screen_height)
+        return
     # Get the current screen
     screen = lv.screen_active()
+    style = _shared_style("box", color=square_color, radius=0, border=(1, 0x000000))
     # Draw each square
     for row in range(N):
         for col in range(N):
@@ -200,19 +1345,168 @@ def draw_grid(grid, border, square_color, screen_width, screen_height):
                 x = border + col * (square_width + border)
                 y = border + row * (square_height + border)
                 #
+                _frame_note(square_width, square_height)
                 square = lv.obj(screen)
                 square.set_size(square_width, square_height)
                 square.set_pos(x, y)
                 square.remove_flag(lv.obj.FLAG.SCROLLABLE)
-                square.set_style_radius(0,lv.PART.MAIN)
-                #
-                square.set_style_bg_color(lv.color_hex(rbg_to_rgb(square_color)), lv.PART.MAIN)
+                square.add_style(style, lv.PART.MAIN)
+                _style_use(style)
                 # We just dont draw anything if its missing
-                #else:
-                #    square.set_style_bg_color(lv.color_hex(0xFFFFFF), lv.PART.MAIN)
-                #
-                square.set_style_border_width(1, lv.PART.MAIN)
-                square.set_style_border_color(lv.color_hex(0x000000), lv.PART.MAIN)
+
+
+# Persistent LED-matrix widget for animations. The N x N cell pool is created
+# once, each update() only touches the cells whose value changed. Values are
+# brightness levels 0..levels (0 is off), strings are parsed with parse_matrix.
+#
+#   m = spotpear.Matrix(5, border=2, color=0xff0000)
+#   m.update('09090:90909:90009:09090:00900')
+#
+class Matrix:
+    def __init__(self, n=5, border=2, color=0xff0000, screen_width=128, screen_height=128, levels=9):
+        self.n = n
+        self.border = border
+        self.color = color
+        self.levels = levels
+        self.square_width = (screen_width - border * (n + 1)) // n
+        self.square_height = (screen_height - border * (n + 1)) // n
+        self.frames = 0
+        self.changed = 0
+        self._box = None
+        self._cells = []
+        self._styles = [None] * (levels + 1)
+        self._values = bytearray(n * n)
+        self._epoch = -1
+        self._build()
+
+    def _build(self):
+        n = self.n
+        if _fb is not None:
+            # Nothing to create, cells are painted on update()
+            self._epoch = _fb_epoch
+            for i in range(n * n):
+                self._values[i] = 0
+            return
+        box = lv.obj(lv.screen_active())
+        box.remove_style_all()
+        box.set_size(lv.pct(100), lv.pct(100))
+        box.set_pos(0, 0)
+        box.remove_flag(lv.obj.FLAG.SCROLLABLE)
+        box.remove_flag(lv.obj.FLAG.CLICKABLE)
+        cells = []
+        for row in range(n):
+            for col in range(n):
+                square = lv.obj(box)
+                square.set_size(self.square_width, self.square_height)
+                square.set_pos(self.border + col * (self.square_width + self.border),
+                               self.border + row * (self.square_height + self.border))
+                square.remove_flag(lv.obj.FLAG.SCROLLABLE)
+                square.add_flag(lv.obj.FLAG.HIDDEN)
+                cells.append(square)
+        self._box = box
+        self._cells = cells
+        self._styles = [None] * (self.levels + 1)
+        for i in range(n * n):
+            self._values[i] = 0
+
+    # Color of a brightness level, scaled per channel from the full color
+    def _color(self, level):
+        c = self.color
+        k = self.levels
+        return ((((c >> 16) & 0xFF) * level // k) << 16) | ((((c >> 8) & 0xFF) * level // k) << 8) | ((c & 0xFF) * level // k)
+
+    def _style(self, level):
+        style = self._styles[level]
+        if style is None:
+            style = _shared_style("box", color=self._color(level), radius=0, border=(1, 0x000000))
+            self._styles[level] = style
+        return style
+
+    # Shows a new frame, returns the number of cells that changed
+    def update(self, grid):
+        if isinstance(grid, str):
+            grid = parse_matrix(grid)
+        n = self.n
+        if len(grid) != n or any(len(row) != n for row in grid):
+            raise ValueError("Grid must be %dx%d" % (n, n))
+        if _fb is not None:
+            return self._fb_update(grid)
+        # clear_screen() deletes the cells, rebuild the pool when that happened
+        if self._box is None or not self._box.is_valid():
+            self._build()
+        values = self._values
+        cells = self._cells
+        levels = self.levels
+        changed = 0
+        i = 0
+        for row in grid:
+            for v in row:
+                v = min(max(int(v), 0), levels)
+                old = values[i]
+                if v != old:
+                    cell = cells[i]
+                    if old:
+                        cell.remove_style(self._styles[old], lv.PART.MAIN)
+                        _style_unuse(self._styles[old])
+                    if v:
+                        style = self._style(v)
+                        cell.add_style(style, lv.PART.MAIN)
+                        _style_use(style)
+                        if not old:
+                            cell.remove_flag(lv.obj.FLAG.HIDDEN)
+                    else:
+                        cell.add_flag(lv.obj.FLAG.HIDDEN)
+                    _frame_note(self.square_width, self.square_height)
+                    values[i] = v
+                    changed += 1
+                i += 1
+        self.frames += 1
+        self.changed += changed
+        return changed
+
+    def _fb_update(self, grid):
+        # clear_screen() wiped the cells, start again from all off
+        if self._epoch != _fb_epoch:
+            self._build()
+        values = self._values
+        sw, sh, b = self.square_width, self.square_height, self.border
+        changed = 0
+        i = 0
+        for r, row in enumerate(grid):
+            for c, v in enumerate(row):
+                v = min(max(int(v), 0), self.levels)
+                if v != values[i]:
+                    x = b + c * (sw + b)
+                    y = b + r * (sh + b)
+                    if v:
+                        _fb_cell(x, y, sw, sh, self._color(v))
+                    else:
+                        _fb.fill_rect(x, y, sw, sh, _fb_color(_screen_bg))
+                    _fb_touch(x, y, sw, sh)
+                    _frame_note(sw, sh)
+                    values[i] = v
+                    changed += 1
+                i += 1
+        if changed and not _frame_depth:
+            _fb_flush()
+        self.frames += 1
+        self.changed += changed
+        return changed
+
+    def clear(self):
+        return self.update([[0] * self.n for _ in range(self.n)])
+
+    def delete(self):
+        if _fb is not None:
+            self.clear()
+            return
+        if self._box is not None and self._box.is_valid():
+            self._box.delete()
+            for v in self._values:
+                if v:
+                    _style_unuse(self._styles[v])
+        self._box = None
+        self._cells = []
 
 
 ##############################################################################
@@ -221,32 +1515,229 @@ def draw_grid(grid, border, square_color, screen_width, screen_height):
 # LED/PIN Handlers
 #
 
+LED_GPIO = 11
+
+# Outputs by the name set_pins() takes: (GPIO, inverted). set_pin() has
+# always driven a pin low for 1 and high for anything else.
+_PIN_TABLE = {
+    1: (1, True),
+    2: (6, True),
+    3: (21, True),
+    4: (20, True),
+    "led": (LED_GPIO, False),
+}
+
+# GPIO output set/clear registers of the ESP32-C3, see _gpio_regs()
+_GPIO_OUT_W1TS = 0x60004008
+_GPIO_OUT_W1TC = 0x6000400C
+
+_pin_outs = {}      # GPIO -> Pin, each output is set up once
+_gpio_direct = None
+
+# The Pin for an output, created on first use; stops a waveform on it
+def _pin_out( gpio ):
+    if gpio in _waves:
+        _wave_stop(gpio)
+    pin = _pin_outs.get(gpio)
+    if pin is None:
+        pin = machine.Pin(gpio, machine.Pin.OUT)
+        _pin_outs[gpio] = pin
+    return pin
+
+def _pin_entry( name ):
+    try:
+        return _PIN_TABLE[name]
+    except KeyError:
+        raise ValueError("unknown pin %r" % (name,))
+
+def _pin_level( invert, value ):
+    if invert:
+        return 0 if value == 1 else 1
+    return 0 if value == 0 else 1
+
+# Whether outputs can be written through the GPIO registers: only on the
+# ESP32-C3 the addresses above are for, and where machine.mem32 exists
+def _gpio_regs():
+    global _gpio_direct
+    if _gpio_direct is None:
+        try:
+            _gpio_direct = "ESP32C3" in os.uname().machine and hasattr(machine, "mem32")
+        except AttributeError:
+            _gpio_direct = False
+    return _gpio_direct
+
 # Sets the LED to on of off
 def set_led( boolean ):
-    from machine import Pin
-    led = Pin(11, Pin.OUT)
-    if boolean == 0:
-        led.off()
-    else:
-        led.on()
+    _pin_out(LED_GPIO).value(0 if boolean == 0 else 1)
 
 # Sets a pin high or low
 def set_pin( pin_number, boolean ):
-    from machine import Pin
-    if pin_number == 1:
-        pin = Pin(1, Pin.OUT)
-    elif pin_number == 2:
-        pin = Pin(6, Pin.OUT)
-    elif pin_number == 3:
-        pin = Pin(21, Pin.OUT)
-    elif pin_number == 4:
-        pin = Pin(20, Pin.OUT)
-
-    if boolean == 1:
-        pin.off()
+    gpio, invert = _pin_entry(pin_number)
+    _pin_out(gpio).value(_pin_level(invert, boolean))
+
+# Sets several outputs in one go, e.g. set_pins({1: 1, 3: 0, "led": 1}); the
+# values mean what they mean for set_pin() and set_led(). On the ESP32-C3
+# all of them change with two register writes, at the same time.
+def set_pins( values ):
+    direct = _gpio_regs()
+    high = 0
+    low = 0
+    for name in values:
+        gpio, invert = _pin_entry(name)
+        level = _pin_level(invert, values[name])
+        # Sets the pin up as an output, also where it is written directly
+        pin = _pin_out(gpio)
+        if direct:
+            if level:
+                high |= 1 << gpio
+            else:
+                low |= 1 << gpio
+        else:
+            pin.value(level)
+    if high:
+        machine.mem32[_GPIO_OUT_W1TS] = high
+    if low:
+        machine.mem32[_GPIO_OUT_W1TC] = low
+
+
+##############################################################################
+#
+# Waveforms
+#
+# Duty cycles, tone sequences and blink patterns that run in the background
+# on the outputs set_pins() knows. A waveform is a list of steps
+# (freq, duty, ms): the output runs at freq Hz, on for duty/65535 of each
+# period, for ms milliseconds, then the timer wheel moves on to the next
+# step. freq None is a steady level, ms None holds the step. "On" is what
+# set_pin(pin, 1) or set_led(1) does.
+#
+# An output gets a machine.PWM (LEDC on the ESP32-C3) while there is a
+# channel and timer left for it. Otherwise the timer wheel toggles the pin
+# itself, with millisecond resolution: good for blinking and dimming, not
+# for tones above a few hundred Hz. set_pin(), set_led() and set_pins()
+# stop the waveform of the output they set.
+#
+
+# Frequency of set_pwm() when none is given
+PWM_FREQ = 1000
+
+_waves = {}         # GPIO -> _Wave
+
+class _Wave:
+    def __init__(self, gpio, invert, steps, repeat):
+        self.gpio = gpio
+        self.invert = invert
+        self.steps = steps
+        self.repeat = repeat
+        self.pos = 0
+        self.pwm = None     # machine.PWM, or None when the timer wheel toggles pin
+        self.pin = None
+        self.on_ms = 0
+        self.off_ms = 0
+        self.phase = 0
+
+# Runs the output at duty percent (0-100) of each period, until set otherwise
+def set_pwm( pin, duty, freq=None ):
+    play_wave(pin, [(freq or PWM_FREQ, duty, None)])
+
+# Plays notes, a list of (freq Hz, ms), e.g. on a buzzer; freq 0 is a rest
+def play_tones( pin, notes, repeat=False ):
+    _wave_start(pin, [(f, 32768 if f else 0, ms) for f, ms in notes], repeat)
+
+# Blinks the output count times, or until set otherwise
+def blink( pin, on_ms=500, off_ms=None, count=None ):
+    steps = [(None, 65535, on_ms), (None, 0, on_ms if off_ms is None else off_ms)]
+    if count is None:
+        _wave_start(pin, steps, True)
+    elif count > 0:
+        _wave_start(pin, steps * count, False)
     else:
-        pin.on( )
+        stop_wave(pin)
+
+# Plays steps of (freq Hz or None, duty percent, ms or None), see above
+def play_wave( pin, steps, repeat=False ):
+    _wave_start(pin, [(f, min(max(int(d * 65535 // 100), 0), 65535), ms) for f, d, ms in steps], repeat)
+
+# Stops the waveform of an output and turns it off, returns False if there
+# was none
+def stop_wave( pin ):
+    return _wave_stop(_pin_entry(pin)[0])
 
+def stop_waves():
+    for gpio in list(_waves):
+        _wave_stop(gpio)
+
+def _wave_start( name, steps, repeat ):
+    gpio, invert = _pin_entry(name)
+    if not steps:
+        raise ValueError("no steps")
+    _wave_stop(gpio)
+    wave = _Wave(gpio, invert, steps, repeat)
+    _waves[gpio] = wave
+    # The pin is no longer a plain output, _pin_out() sets it up again later
+    _pin_outs.pop(gpio, None)
+    try:
+        wave.pwm = machine.PWM(machine.Pin(gpio), freq=PWM_FREQ, duty_u16=_wave_duty(wave, 0))
+    except (AttributeError, ValueError, OSError):
+        # No PWM on this port, or all channels or timers are taken
+        wave.pin = machine.Pin(gpio, machine.Pin.OUT)
+    _wave_next(wave)
+
+def _wave_stop( gpio ):
+    wave = _waves.pop(gpio, None)
+    if wave is None:
+        return False
+    cancel_timer(("_wave", gpio))
+    cancel_timer(("_pwm", gpio))
+    if wave.pwm is not None:
+        wave.pwm.deinit()
+    _pin_out(gpio).value(_pin_level(wave.invert, 0))
+    return True
+
+def _wave_duty( wave, duty ):
+    return 65535 - duty if wave.invert else duty
+
+def _wave_step( timer ):
+    wave = _waves.get(timer[1])
+    if wave is not None:
+        _wave_next(wave)
+
+def _wave_next( wave ):
+    if wave.pos == len(wave.steps):
+        if not wave.repeat:
+            _wave_stop(wave.gpio)
+            return
+        wave.pos = 0
+    freq, duty, ms = wave.steps[wave.pos]
+    wave.pos += 1
+    _wave_apply(wave, freq, duty)
+    if ms is not None:
+        set_timer(("_wave", wave.gpio), ms, _wave_step)
+
+def _wave_apply( wave, freq, duty ):
+    if wave.pwm is not None:
+        if freq:
+            wave.pwm.freq(freq)
+        wave.pwm.duty_u16(_wave_duty(wave, duty))
+        return
+    cancel_timer(("_pwm", wave.gpio))
+    if not freq or duty <= 0 or duty >= 65535:
+        wave.pin.value((duty >= 32768) ^ wave.invert)
+        return
+    period = max(1000 // freq, 2)
+    wave.on_ms = min(max(period * duty // 65535, 1), period - 1)
+    wave.off_ms = period - wave.on_ms
+    wave.phase = 0
+    _wave_toggle(("_pwm", wave.gpio))
+
+# Software PWM, one timer per edge
+def _wave_toggle( timer ):
+    wave = _waves.get(timer[1])
+    if wave is None:
+        return
+    wave.phase ^= 1
+    wave.pin.value(wave.phase ^ wave.invert)
+    set_timer(timer, wave.on_ms if wave.phase else wave.off_ms, _wave_toggle)
 
 
 ##############################################################################
@@ -254,124 +1745,278 @@ def set_pin( pin_number, boolean ):
 #
 # Button related functions
 #
+# The pin interrupts only note the button, its level and the time of each
+# edge in a ring buffer allocated up front, and schedule _button_process().
+# That runs in the VM, debounces the edges of each button and turns them
+# into events:
+#
+#   BUTTON_PRESS, BUTTON_RELEASE  the debounced edges
+#   BUTTON_LONG     still held BUTTON_LONG_MS after the press
+#   BUTTON_DOUBLE   pressed again within BUTTON_DOUBLE_MS of the last press
+#   BUTTON_BOTH     pressed while the other button is held, which was
+#                   pressed within BUTTON_BOTH_MS; reported as button 0
+#
+# Events are read with get_button_event(), or passed to the callback set
+# with set_button_event_callback(); wait_button() waits for BUTTON_PRESS.
+# get_button() and set_button_callback() work as they always did, on the
+# rising edge, which is when a button is let go. The windows may be changed
+# at any time, e.g. spotpear.BUTTON_LONG_MS = 1000.
+#
 
-_button1_user_callback = None
-_button2_user_callback = None
-_button_both_user_callback = None
-
-last_button_ms = -1
-_spbutton1_pressed = False
-_spbutton2_pressed = False
-
-
-# No longer direct read
-def get_button( button_number ): 
-    global _spbutton1_pressed, _spbutton2_pressed
-    tval = None
-    if button_number == 1:
-        tval = _spbutton1_pressed
-        _spbutton1_pressed = False
-    elif button_number == 2:
-        tval = _spbutton2_pressed
-        _spbutton2_pressed = False
-    return tval
-
-
-# Allow setting of callbacks from main user program
-# NOTE: Any number other than 1 or 2 means 
-#       both buttons 1 and 2 are pressed within a period of time
-#
-def set_button_callback(button_number, _callback):
-    global _button1_user_callback, _button2_user_callback, _button_both_user_callback
-    if button_number == 1:
-        _button1_user_callback = _callback
-    elif button_number == 2:
-        _button2_user_callback = _callback
-    else:  # Both buttons
-        _button_both_user_callback = _callback
-
-# This is called from the IRQ via schedule
-def safe_button_handler(pin):
-    global last_button_ms, _spbutton1_pressed, _spbutton2_pressed, _button1_user_callback, _button2_user_callback, _button_both_user_callback, _spbutton1, _spbutton2
-    # Determine which button
-    otherbutton_pressed = False
-    button = 0
-    if pin == _spbutton1:
-        print("Button1 : Interrupt triggered!")
-        otherbutton_pressed = _spbutton2_pressed
-        button = 1
-    elif pin == _spbutton2:
-        print("Button2 : Interrupt triggered!")
-        otherbutton_pressed = _spbutton1_pressed
-        button = 2
-    #
-    # Get current time
-    current_ms = utime.ticks_ms()
-    # Handle first time button press
-    if last_button_ms == -1:
-        last_button_ms = current_ms + 9999  # Just a large number to avoid immediate trigger
-    #
-    # Check if both buttons pressed within 200ms
-    delta_ms = utime.ticks_diff(current_ms, last_button_ms)
-    if delta_ms < 200 and otherbutton_pressed:
-        last_button_ms = current_ms
-        #
-        # If callback is defined, then do it
-        if _button_both_user_callback is not None:
-            _spbutton1_pressed = False
-            _spbutton2_pressed = False
-            _button_both_user_callback()
-            return
-    # Update last button time
-    last_button_ms = current_ms
-    #
-    #
-    if button == 1:
-        print("Button1 : Pressed!")
-        # Event block callback for button 1
-        if _button1_user_callback is not None:
-            print("Button1 : Pressed - trying a callback!")
-            _spbutton1_pressed = False
-            _button1_user_callback()
-            return
-        #
-        # For manual button reads
-        _spbutton1_pressed = True
+from array import array
+
+BUTTON_PRESS = 1
+BUTTON_RELEASE = 2
+BUTTON_LONG = 3
+BUTTON_DOUBLE = 4
+BUTTON_BOTH = 5
+
+# Edges closer than this to the last one taken are contact bounce
+BUTTON_DEBOUNCE_MS = 20
+BUTTON_LONG_MS = 600
+BUTTON_DOUBLE_MS = 350
+BUTTON_BOTH_MS = 200
+
+# Pin level of a pressed button: the buttons are pulled up and pull the pin
+# to ground, see _boot.py
+BUTTON_PRESSED_LEVEL = 0
+
+# Ring sizes, powers of two
+_BUTTON_EDGES = 32
+_BUTTON_EVENTS = 16
+
+# Edges, written by the interrupt handlers: time and button << 1 | level
+_edge_us = array("q", bytes(8 * _BUTTON_EDGES))
+_edge_code = bytearray(_BUTTON_EDGES)
+_edge_head = 0
+_edge_tail = 0
+_edge_dropped = 0
+_edge_scheduled = False
+
+# Events not read yet: time and kind << 2 | button
+_event_us = array("q", bytes(8 * _BUTTON_EVENTS))
+_event_code = bytearray(_BUTTON_EVENTS)
+_event_head = 0
+_event_tail = 0
+_event_dropped = 0
+
+# Per button, index 1 and 2. Index 0 stands for both buttons together
+# where a list is indexed by what get_button() and friends take.
+_buttons = [None, None, None]           # the Pins
+_button_down = [False, False, False]    # debounced state
+_button_edge_at = [None, None, None]    # time of the last edge taken
+_button_press_at = [None, None, None]   # time of the last press
+_button_release_at = [None, None, None] # time of the last release
+_button_click_at = [None, None, None]   # last press that may start a double
+_button_latched = [False, False, False] # released since get_button()
+_button_callbacks = [None, None, None]
+_button_event_callback = None
+
+# Presses of both buttons together, button 1 and button 2, for wait_button()
+_button_presses = [0, 0, 0]
+
+_button_edges = 0
+_button_bounces = 0
+_button_events = 0
+_button_latency_n = 0
+_button_latency_sum = 0
+_button_latency_max = 0
+
+# True if the button was clicked since the last call. Clicks that went to a
+# callback set with set_button_callback() are not reported here.
+def get_button( button_number ):
+    if button_number not in (1, 2):
+        return None
+    pressed = _button_latched[button_number]
+    _button_latched[button_number] = False
+    return pressed
+
+# Allow setting of callbacks from main user program, they run when the
+# button is let go
+# NOTE: Any number other than 1 or 2 means
+#       both buttons 1 and 2 are let go within BUTTON_BOTH_MS; that
+#       callback then runs instead of the one of the button let go second
+#
+def set_button_callback( button_number, _callback ):
+    _button_callbacks[button_number if button_number in (1, 2) else 0] = _callback
+
+# Calls callback(kind, button, ticks_us of the edge) for every event instead
+# of queueing it for get_button_event(); None goes back to the queue
+def set_button_event_callback( callback ):
+    global _button_event_callback
+    _button_event_callback = callback
+
+# The oldest event not read yet as (kind, button, ticks_us of the edge), or None
+def get_button_event():
+    global _event_tail
+    i = _event_tail
+    if i == _event_head:
+        return None
+    code = _event_code[i]
+    t = _event_us[i]
+    _event_tail = (i + 1) & (_BUTTON_EVENTS - 1)
+    _button_latency(t)
+    return (code >> 2, code & 3, t)
+
+# Counters of the button handling. latency_* is the time from the edge to
+# the callback, or to get_button_event(), in microseconds. Edges are
+# dropped when the VM does not get to them before the ring fills up,
+# events when nobody reads them.
+def button_stats():
+    return {
+        "edges": _button_edges,
+        "bounces": _button_bounces,
+        "events": _button_events,
+        "edges_dropped": _edge_dropped,
+        "events_dropped": _event_dropped,
+        "latency_n": _button_latency_n,
+        "latency_mean_us": _button_latency_sum // max(_button_latency_n, 1),
+        "latency_max_us": _button_latency_max,
+    }
+
+# Interrupt handlers: nothing here may allocate
+def _button_irq( button, pin ):
+    global _edge_head, _edge_dropped, _edge_scheduled
+    i = _edge_head
+    nxt = (i + 1) & (_BUTTON_EDGES - 1)
+    if nxt == _edge_tail:
+        _edge_dropped += 1
         return
-    #
-    if button == 2:
-        # Event block callback for button 2
-        if _button2_user_callback is not None:
-            _spbutton2_pressed = False
-            _button2_user_callback()
-            return
-        #
-        # For manual button reads
-        _spbutton2_pressed = True
+    _edge_us[i] = time.ticks_us()
+    _edge_code[i] = button << 1 | pin.value()
+    _edge_head = nxt
+    if not _edge_scheduled:
+        _edge_scheduled = True
+        try:
+            micropython.schedule(_button_process, None)
+        except RuntimeError:
+            # Schedule queue full, the next edge tries again
+            _edge_scheduled = False
+
+def button1_handler( pin ):
+    _button_irq(1, pin)
+
+def button2_handler( pin ):
+    _button_irq(2, pin)
+
+# Debounces the edges noted since the last run
+def _button_process( _ ):
+    global _edge_tail, _edge_scheduled, _button_edges, _button_bounces
+    _edge_scheduled = False
+    debounce = BUTTON_DEBOUNCE_MS * 1000
+    while _edge_tail != _edge_head:
+        i = _edge_tail
+        t = _edge_us[i]
+        code = _edge_code[i]
+        _edge_tail = (i + 1) & (_BUTTON_EDGES - 1)
+        _button_edges += 1
+        button = code >> 1
+        last = _button_edge_at[button]
+        if last is not None and time.ticks_diff(t, last) < debounce:
+            # The level the bouncing ends on counts, look again once it settled
+            _button_bounces += 1
+            set_timer(("_button", button), BUTTON_DEBOUNCE_MS, _button_settle)
+            continue
+        _button_edge(button, (code & 1) == BUTTON_PRESSED_LEVEL, t)
+
+def _button_settle( timer ):
+    button = timer[1]
+    _button_edge(button, _buttons[button].value() == BUTTON_PRESSED_LEVEL, time.ticks_us())
+
+def _button_long( timer ):
+    button = timer[1]
+    if _button_down[button]:
+        # A long press does not start a double click
+        _button_click_at[button] = None
+        _button_emit(BUTTON_LONG, button, time.ticks_us())
+
+# Takes a debounced edge of a button
+def _button_edge( button, pressed, t ):
+    if pressed == _button_down[button]:
+        return
+    _button_down[button] = pressed
+    _button_edge_at[button] = t
+    if not pressed:
+        cancel_timer(("_long", button))
+        _button_emit(BUTTON_RELEASE, button, t)
+        _button_click(button, t)
         return
+    _button_press_at[button] = t
+    set_timer(("_long", button), BUTTON_LONG_MS, _button_long)
+    _button_emit(BUTTON_PRESS, button, t)
+    other = 3 - button
+    if _button_down[other] and time.ticks_diff(t, _button_press_at[other]) < BUTTON_BOTH_MS * 1000:
+        _button_emit(BUTTON_BOTH, 0, t)
+    click = _button_click_at[button]
+    if click is not None and time.ticks_diff(t, click) < BUTTON_DOUBLE_MS * 1000:
+        _button_emit(BUTTON_DOUBLE, button, t)
+        # A third press starts over
+        _button_click_at[button] = None
+    else:
+        _button_click_at[button] = t
 
+# get_button() and set_button_callback() on the rising edge, the release,
+# as the buttons have always been read
+def _button_click( button, t ):
+    other = _button_release_at[3 - button]
+    _button_release_at[button] = t
+    if (_button_callbacks[0] is not None and other is not None
+            and time.ticks_diff(t, other) < BUTTON_BOTH_MS * 1000):
+        _button_latched[1] = _button_latched[2] = False
+        _button_call(_button_callbacks[0], t)
+    elif _button_callbacks[button] is not None:
+        _button_call(_button_callbacks[button], t)
+    else:
+        # For manual button reads
+        _button_latched[button] = True
 
+def _button_emit( kind, button, t ):
+    global _event_head, _event_dropped, _button_events
+    _button_events += 1
+    if kind == BUTTON_PRESS or kind == BUTTON_BOTH:
+        _button_presses[button] += 1
+    if _button_event_callback is not None:
+        _button_call(_button_event_callback, t, kind, button, t)
+        return
+    i = _event_head
+    nxt = (i + 1) & (_BUTTON_EVENTS - 1)
+    if nxt == _event_tail:
+        _event_dropped += 1
+        return
+    _event_us[i] = t
+    _event_code[i] = kind << 2 | button
+    _event_head = nxt
 
-# ISR cant allocate memory so we use schedule to call a function later
-def button1_handler(pin):
-    micropython.schedule(safe_button_handler, pin)
+def _button_call( fn, t, *args ):
+    _button_latency(t)
+    try:
+        fn(*args)
+    except Exception as e:
+        print("Button callback failed:", e)
 
-def button2_handler(pin):
-    micropython.schedule(safe_button_handler, pin)
+def _button_latency( t ):
+    global _button_latency_n, _button_latency_sum, _button_latency_max
+    dt = time.ticks_diff(time.ticks_us(), t)
+    _button_latency_n += 1
+    _button_latency_sum += dt
+    if dt > _button_latency_max:
+        _button_latency_max = dt
 
 def button_setup_event_handler():
     from machine import Pin
-    global _spbutton1_pressed, _spbutton2_pressed, _spbutton1, _spbutton2
-    #
-    # Setup buttons with IRQs
-    _spbutton1_pressed = False
-    _spbutton1 = Pin(8, Pin.IN)
-    _spbutton1.irq(trigger=Pin.IRQ_RISING, handler=button1_handler)
     #
-    _spbutton2_pressed = False
-    _spbutton2 = Pin(10, Pin.IN)
-    _spbutton2.irq(trigger=Pin.IRQ_RISING, handler=button2_handler)
-
+    # Setup buttons with IRQs on both edges
+    for button, pin_number, handler in ((1, 8, button1_handler), (2, 10, button2_handler)):
+        pin = Pin(pin_number, Pin.IN, Pin.PULL_UP)
+        _buttons[button] = pin
+        _button_down[button] = pin.value() == BUTTON_PRESSED_LEVEL
+        _button_latched[button] = False
+        try:
+            pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=handler, hard=True)
+        except TypeError:
+            # Ports without hard pin IRQs, the esp32 one among them, schedule
+            # the handler; edges are then timed when it runs
+            pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=handler)
 
 
 ##############################################################################
@@ -402,30 +2047,182 @@ def fs_write( filename="main.py" ):
     except Exception as e:
         print(f"An error occurred: {e}")
 
-# List files in the current directory with sizes and modification dates
-def fs_ls():
+# Bytes fs_upload() receives and writes at a time, one littlefs block; the
+# buffer is allocated once and shared by the fs_ helpers
+FS_CHUNK = 4096
+
+# How long fs_upload() waits for the next chunk before it gives up
+FS_UPLOAD_TIMEOUT_MS = 5000
+
+# fs_upload() waits for input once per block of this many bytes. A stdin
+# read blocks until it is filled, 64 bytes is one USB packet of the C3's
+# serial/JTAG port, so a block that has started to arrive is all there.
+FS_UPLOAD_BLOCK = 64
+
+_fs_buffer = None
+
+def _fs_buf():
+    global _fs_buffer
+    if _fs_buffer is None:
+        _fs_buffer = bytearray(FS_CHUNK)
+    return _fs_buffer
+
+# Receives a file of size bytes in binary from the host, see
+# tools/fs_upload.py. For every chunk fs_upload() sends an ACK (0x06), the
+# host then sends the next FS_CHUNK bytes, fewer for the last one. The data
+# goes to filename + ".part", which replaces filename once all of it has
+# arrived and its CRC32 is crc. Ctrl-C is off meanwhile, 0x03 may be data.
+def fs_upload( filename, size, crc ):
+    import sys
+    import select
+    import binascii
+    buf = memoryview(_fs_buf())
+    blocks = [buf[i:i + FS_UPLOAD_BLOCK] for i in range(0, FS_CHUNK, FS_UPLOAD_BLOCK)]
+    part = filename + ".part"
+    stdin = sys.stdin.buffer
+    poll = select.poll()
+    poll.register(sys.stdin, select.POLLIN)
+    got = 0
+    check = 0
+    micropython.kbd_intr(-1)
     try:
-        files = os.listdir()
-        for file in files:
-            if os.stat(file)[0] & 0x8000:  # Check if it's a regular file
-                stat = os.stat(file)
-                size = stat[6]
-                # Some MicroPython ports support mtime in stat[8]
-                try:
-                    mtime = stat[8]
-                    print(f"{file} — {size} bytes — Last modified: {mtime}")
-                except IndexError:
-                    print(f"{file} — {size} bytes")
+        with open(part, "wb") as f:
+            while got < size:
+                n = min(FS_CHUNK, size - got)
+                sys.stdout.write("\x06")
+                for r in range(0, n, FS_UPLOAD_BLOCK):
+                    block = blocks[r // FS_UPLOAD_BLOCK]
+                    if n - r < FS_UPLOAD_BLOCK:
+                        block = block[:n - r]
+                    for _ in poll.ipoll(FS_UPLOAD_TIMEOUT_MS):
+                        break
+                    else:
+                        raise OSError("upload timed out after %d of %d bytes" % (got + r, size))
+                    if stdin.readinto(block) != len(block):
+                        raise OSError("upload ended after %d of %d bytes" % (got + r, size))
+                check = binascii.crc32(buf[:n], check)
+                f.write(buf[:n])
+                got += n
+        if check != crc:
+            raise ValueError("CRC mismatch: got %08x, expected %08x" % (check, crc))
+    except BaseException:
+        fs_rm(part)
+        raise
+    finally:
+        micropython.kbd_intr(3)
+    try:
+        os.rename(part, filename)
+    except OSError:
+        # FAT does not rename over an existing file
+        fs_rm(filename)
+        os.rename(part, filename)
+    print("OK", size, "%08x" % check)
+
+# Walks path depth first and yields (path, is_dir, size, mtime) for its
+# entries. A directory comes after what is in it, with the total size of
+# all files below it as size, and path itself comes last; with
+# recursive=False subdirectories are not entered and their size is None.
+# match keeps only the files whose name ends in it, or for which it returns
+# True when it is a function; the totals still count every file.
+# sort="name", "size" or "mtime" orders the entries of each directory, which
+# are then read into a list one directory at a time, otherwise nothing is
+# buffered. mtime is None unless asked for or sorted by, it takes one
+# os.stat() per entry; sizes come from os.ilistdir() where it has them.
+def fs_walk( path="", match=None, sort=None, reverse=False, recursive=True, mtime=False ):
+    if sort == "mtime":
+        mtime = True
+    if isinstance(match, str):
+        suffix = match
+        match = lambda name: name.endswith(suffix)
+    total = yield from _fs_walk(path, match, sort, reverse, recursive, mtime)
+    yield (path, True, total, os.stat(path or ".")[8] if mtime else None)
+
+_FS_SORT_KEYS = {"name": 1, "size": 3, "mtime": 4}
+
+def _fs_walk( path, match, sort, reverse, recursive, mtime ):
+    total = 0
+    entries = (_fs_entry(path, e, mtime) for e in (os.ilistdir(path) if path else os.ilistdir()))
+    if sort is not None:
+        i = _FS_SORT_KEYS[sort]
+        entries = sorted(entries, key=lambda e: e[i], reverse=reverse)
+    for child, name, is_dir, size, mt in entries:
+        if not is_dir:
+            total += size
+            if match is None or match(name):
+                yield (child, False, size, mt)
+        elif recursive:
+            size = yield from _fs_walk(child, match, sort, reverse, recursive, mtime)
+            total += size
+            yield (child, True, size, mt)
+        else:
+            yield (child, True, None, mt)
+    return total
+
+# (path, name, is_dir, size, mtime) of an os.ilistdir() entry, directories
+# have size 0 until walked
+def _fs_entry( path, entry, mtime ):
+    name = entry[0]
+    child = name if not path else path + name if path[-1] == "/" else path + "/" + name
+    is_dir = entry[1] == 0x4000
+    if mtime or (len(entry) < 4 and not is_dir):
+        stat = os.stat(child)
+        return (child, name, is_dir, 0 if is_dir else stat[6], stat[8] if mtime else None)
+    return (child, name, is_dir, 0 if is_dir else entry[3], None)
+
+# List files in a directory with sizes and modification dates, and the total
+# size; recursive=True goes into subdirectories and gives their totals too.
+# sort="size" or "mtime" puts the largest or newest first.
+def fs_ls( path="", recursive=False, sort=None, match=None ):
+    try:
+        for entry, is_dir, size, mtime in fs_walk(path, match, sort, sort in ("size", "mtime"), recursive, True):
+            if not is_dir:
+                print(f"{entry} — {size} bytes — Last modified: {mtime}")
+            elif size is not None:
+                print(f"{(entry or '.').rstrip('/')}/ — {size} bytes in total")
         print("End of file list.")
     except Exception as e:
         print("Error:", e)
 
-# Dump a text file to stdout
-def fs_cat(filename):
+# Yields the bytes of filename from start on, length of them or up to the
+# end, in chunks of up to FS_CHUNK. The chunks are memoryviews of the one
+# shared buffer, each only valid until the next one is read.
+def fs_read( filename, start=0, length=None ):
+    buf = memoryview(_fs_buf())
+    with open(filename, "rb") as f:
+        if start:
+            f.seek(start)
+        left = -1 if length is None else length
+        while left:
+            n = f.readinto(buf if left < 0 or left >= FS_CHUNK else buf[:left])
+            if not n:
+                break
+            if left > 0:
+                left -= n
+            yield buf[:n]
+
+# Dump a file to stdout as it is, binary included, or as a hex dump with
+# offsets; start and length pick a range, tail=n the last n bytes
+def fs_cat( filename, start=0, length=None, tail=None, hexdump=False ):
+    import sys
+    out = getattr(sys.stdout, "buffer", sys.stdout)
     try:
-        with open(filename, 'r') as f:
-            for line in f:
-                print(line, end='')  # Avoid double newlines
+        if tail is not None:
+            start = max(os.stat(filename)[6] - tail, 0)
+            length = None
+        offset = start
+        for chunk in fs_read(filename, start, length):
+            if hexdump:
+                _fs_hexdump(out, chunk, offset)
+            else:
+                out.write(chunk)
+            offset += len(chunk)
     except Exception as e:
         print("Error reading file:", e)
 
+# 16 bytes a line: offset, hex, printable characters
+def _fs_hexdump( out, chunk, offset ):
+    import binascii
+    for i in range(0, len(chunk), 16):
+        line = chunk[i:i + 16]
+        text = "".join(chr(c) if 32 <= c < 127 else "." for c in line)
+        out.write(("%08x  %-47s  |%s|\n" % (offset + i, binascii.hexlify(line, " ").decode(), text)).encode())
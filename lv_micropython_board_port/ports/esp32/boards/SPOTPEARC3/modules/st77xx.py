@@ -2,6 +2,7 @@
 # MIT-licensed
 
 import time
+import gc
 import machine
 import struct
 import uctypes
@@ -173,8 +174,116 @@ ST77XX_INV_PORTRAIT = const(2)
 ST77XX_INV_LANDSCAPE = const(3)
 ST77XX_MIRROR_PORTRAIT = const(4)
 
+
+class St77xx_tx(object):
+    '''
+    Transmit backend for the pixel data of a blit: plain blocking spi.write. This is also the
+    interface of the asynchronous backends below.
+
+    The driver opens the transaction and sends the window and RAMWR commands itself (CS low, DC
+    high), then hands the data to :obj:`start`. The backend raises CS once the data is out and
+    calls *done*. Before touching the bus again the driver calls :obj:`wait`.
+    '''
+    def start(self, hw, buf, done=None):
+        hw.spi.write(buf)
+        hw.cs.value(1)
+        if done: done()
+    def wait(self):
+        'Block until the transfer started last has finished and its *done* was called.'
+        pass
+    def busy(self): return False
+
+
+class St77xx_rp2_dma_tx(St77xx_tx):
+    '''DMA transfer on the rp2 port, selected by the *rp2_dma* driver parameter.'''
+    def __init__(self, dma):
+        self.dma=dma
+        self._hw=None
+        self._done=None
+    def start(self, hw, buf, done=None):
+        SPI1_BASE = 0x40040000 # FIXME: will be different for another SPI bus?
+        SSPDR     = 0x008
+        self.dma.config(
+            src_addr = uctypes.addressof(buf),
+            dst_addr = SPI1_BASE + SSPDR,
+            count    = len(buf),
+            src_inc  = True,
+            dst_inc  = False,
+            trig_dreq= self.dma.DREQ_SPI1_TX
+        )
+        self._hw,self._done=hw,done
+        self.dma.enable()
+    def wait(self):
+        hw=self._hw
+        if hw is None: return
+        while self.dma.is_busy(): pass
+        self.dma.disable()
+        # wait to send last byte. It should take < 1uS @ 10MHz
+        time.sleep_us(1)
+        hw.cs.value(1)
+        done,self._hw,self._done=self._done,None,None
+        if done: done()
+    def busy(self): return self._hw is not None and self.dma.is_busy()
+
+
+class St77xx_thread_tx(St77xx_tx):
+    '''
+    Experimental: transfer on a worker thread (_thread), so that the caller could carry on while
+    the data is on the wire, e.g. LVGL rendering the next band into its second draw buffer. One
+    transfer is in flight at a time; *done* is called from the worker thread.
+
+    Whether anything overlaps depends on the port releasing the GIL during the SPI write, and on
+    a second core. The ESP32-C3 has one core and its SPI write keeps the GIL, so this is no
+    speedup there, and the spotpear board uses the blocking backend. On the simulated bus of
+    tools/st77xx_sim.py it is the stand-in for host testing.
+
+    CS is raised and *done* called also when the write fails; the error is raised to the caller
+    by the next :obj:`wait` or :obj:`start`.
+    '''
+    def __init__(self):
+        import _thread
+        self._job=None
+        self._error=None
+        self._go=_thread.allocate_lock()
+        self._go.acquire()
+        self._idle=_thread.allocate_lock()
+        _thread.start_new_thread(self._worker,())
+    def _worker(self):
+        while True:
+            self._go.acquire()
+            hw,buf,done=self._job
+            try:
+                hw.spi.write(buf)
+            except Exception as e:
+                self._error=e
+            finally:
+                # LVGL waits for done, it must come whatever happened
+                try:
+                    hw.cs.value(1)
+                    if done: done()
+                except Exception as e:
+                    if self._error is None: self._error=e
+                self._job=None
+                self._idle.release()
+    def _raise_error(self):
+        e,self._error=self._error,None
+        if e is not None: raise e
+    def start(self, hw, buf, done=None):
+        self._idle.acquire()
+        if self._error is not None:
+            self._idle.release()
+            self._raise_error()
+        self._job=(hw,buf,done)
+        self._go.release()
+    def wait(self):
+        self._idle.acquire()
+        self._idle.release()
+        self._raise_error()
+    def busy(self): return self._idle.locked()
+
+
 class St77xx_hw(object):
-    def __init__(self, *, cs, dc, spi, res, suppRes, bl=None, model=None, suppModel=[], rst=None, rot=ST77XX_LANDSCAPE, bgr=False, rp2_dma=None):
+    def __init__(self, *, cs, dc, spi, res, suppRes, bl=None, model=None, suppModel=[], rst=None, rot=ST77XX_LANDSCAPE, bgr=False, rp2_dma=None, coalesce=True, tx=None, reset=True):
         '''
         This is an abstract low-level driver the ST77xx controllers, not to be instantiated directly.
         Derived classes implement chip-specific bits. THe following parameters are recognized:
@@ -188,6 +297,9 @@ class St77xx_hw(object):
         * *rot*: display orientation (0: portrait, 1: landscape, 2: inverted portrait, 3: inverted landscape); the constants ST77XX_PORTRAIT, ST77XX_LANDSCAPE, ST77XX_INV_POTRAIT, ST77XX_INV_LANDSCAPE may be used.
         * *bgr*: color order if BGR (not RGB)
         * *rp2_dma*: optional DMA object for the rp2 port
+        * *tx*: transmit backend for pixel data (:obj:`St77xx_tx` instance); defaults to DMA if *rp2_dma* is given, blocking otherwise
+        * *coalesce*: send window and pixel data of a blit in a single CS transaction and skip CASET/RASET when the window did not change (default); False gives the plain one-transaction-per-command behavior
+        * *reset*: reset and initialize the panel from the constructor (default); with False the caller does that later, with :obj:`hard_reset` or ``await hard_reset_async()``
 
 
         Subclass constructors (implementing concrete chip) set in addition the following, not to be used directly:
@@ -199,6 +311,17 @@ class St77xx_hw(object):
         self.buf2 = bytearray(2)
         self.buf4 = bytearray(4)
 
+        self.coalesce=coalesce
+        self._window=None # last window sent by set_window, None if unknown
+        self._c0,self._r0=0,0 # address offsets of the current rotation, set in apply_rotation
+        # bus overhead counters, see overhead_stats
+        self.blits=0
+        self.window_skips=0
+        self.overhead_bytes=0
+        self.transactions=0
+        self._fillbuf=None # scan-line buffer of fill_rect, see fill_buffer
+        self._fillcolor=None
+
         self.cs,self.dc,self.rst=[(machine.Pin(p,machine.Pin.OUT) if isinstance(p,int) else p) for p in (cs,dc,rst)]
         self.bl=bl
         if hasattr(machine, "PWM"):
@@ -209,7 +332,7 @@ class St77xx_hw(object):
 
         self.rot=rot
         self.bgr=bgr
-        self.width,self.height=(0,0) # this is set later in hard_reset->config->apply_rotation
+        self.width,self.height=(0,0) # this is set later in apply_rotation
 
         if res not in suppRes: raise ValueError('Unsupported resolution %s; the driver supports: %s.'%(str(res),', '.join(str(r) for r in suppRes)))
         if suppModel and model not in suppModel: raise ValueError('Unsupported model %s; the driver supports: %s.'%(str(model),', '.join(str(r) for r in suppModel)))
@@ -218,8 +341,12 @@ class St77xx_hw(object):
         self.model=model
 
         self.rp2_dma=rp2_dma
+        if tx is None: tx=St77xx_rp2_dma_tx(rp2_dma) if rp2_dma else St77xx_tx()
+        self.tx=tx
         self.spi=spi
-        self.hard_reset()
+        if reset: self.hard_reset()
+        # size and offsets are known before the panel is up, LVGL needs them
+        else: self._set_geometry(rot)
 
 
     def off(self): self.set_backlight(0)
@@ -231,87 +358,213 @@ class St77xx_hw(object):
                 time.sleep(.2)
             time.sleep(.2)
         self.config()
+
+    # Shortest waits after a command that the ST7735S/ST7789V datasheets allow, used by
+    # hard_reset_async after a hardware reset: 5 ms after SWRESET and SLPOUT in sleep-in mode (the
+    # state after reset), nothing after NORON and DISPON.
+    MIN_DELAYS_MS={ST77XX_SWRESET:5, ST77XX_SLPOUT:5, ST77XX_NORON:0, ST77XX_DISPON:0}
+
+    async def hard_reset_async(self):
+        '''
+        Like :obj:`hard_reset`, as a coroutine with the datasheet minimum timings: the reset pulse
+        (10 us minimum), 120 ms for the reset to complete (the worst case, a panel that was left in
+        sleep-out mode) and :obj:`MIN_DELAYS_MS` in the init sequence. Other tasks run during the
+        waits; about 130 ms in total instead of over a second.
+        '''
+        import asyncio
+        if self.rst:
+            self.rst.value(1)
+            self.rst.value(0)
+            await asyncio.sleep(0.001)
+            self.rst.value(1)
+            await asyncio.sleep(0.120)
+            delays=self.MIN_DELAYS_MS
+        else:
+            # without the reset pin the panel may come from sleep-out, keep the sequence timings
+            delays={}
+        await self._run_seq_async(self.init_seq(),delays)
+        self.apply_rotation(self.rot)
+
+    def config_hw(self):
+        self._run_seq(self.init_seq()) # init_seq defined in child classes
+
     def config(self):
-        self.config_hw() # defined in child classes
+        self.config_hw()
         self.apply_rotation(self.rot)
     def set_backlight(self,percent):
         if self.bl is None: return
         self.bl.duty_u16(percent*655)
     def set_window(self, x, y, w, h):
-        c0,r0=ST77XX_COL_ROW_MODEL_START_ROTMAP[self.res[0],self.res[1],self.model][self.rot%4]
-        struct.pack_into('>hh', self.buf4, 0, c0+x, c0+x+w-1)
+        win=(x,y,w,h)
+        if self.coalesce and win==self._window:
+            self.window_skips+=1
+            return
+        struct.pack_into('>HH', self.buf4, 0, self._c0+x, self._c0+x+w-1)
         self.write_register(ST77XX_CASET, self.buf4)
-        struct.pack_into('>hh', self.buf4, 0, r0+y, r0+y+h-1)
+        struct.pack_into('>HH', self.buf4, 0, self._r0+y, self._r0+y+h-1)
         self.write_register(ST77XX_RASET, self.buf4)
+        self._window=win
 
     def apply_rotation(self,rot):
+        self._set_geometry(rot)
+        self.write_register(ST77XX_MADCTL,bytes([(ST77XX_MADCTL_BGR if self.bgr else 0)|ST77XX_MADCTL_ROTS[self.rot%4]]))
+
+    def _set_geometry(self,rot):
         self.rot=rot
         if (self.rot%2)==0: self.width,self.height=self.res
         else: self.height,self.width=self.res
-        self.write_register(ST77XX_MADCTL,bytes([(ST77XX_MADCTL_BGR if self.bgr else 0)|ST77XX_MADCTL_ROTS[self.rot%4]]))
+        # look the offsets up once here rather than on every set_window
+        self._c0,self._r0=ST77XX_COL_ROW_MODEL_START_ROTMAP[self.res[0],self.res[1],self.model][self.rot%4]
+        self._window=None
 
-    def blit(self, x, y, w, h, buf, is_blocking=True):
-        self.set_window(x, y, w, h)
-        if self.rp2_dma: self._rp2_write_register_dma(ST77XX_RAMWR, buf, is_blocking)
-        else: self.write_register(ST77XX_RAMWR, buf)
+    def blit(self, x, y, w, h, buf, is_blocking=True, done=None):
+        '''
+        Send *buf* to the window. The data goes through the transmit backend, with *is_blocking*
+        False this may return before the transfer is done; *done* is called when it is.
+        '''
+        self._begin_ramwr(x, y, w, h)
+        self.tx.start(self, buf, done)
+        if is_blocking: self.tx.wait()
 
-    def clear(self, color):
-        bs=128 # write pixels in chunks; makes the fill much faster
-        struct.pack_into('>h',self.buf2,0,color)
-        buf=bs*bytes(self.buf2)
-        npx=self.width*self.height
-        self.set_window(0, 0, self.width, self.height)
-        self.write_register(ST77XX_RAMWR, None)
-        self.cs.value(0)
-        self.dc.value(1)
-        for _ in range(npx//bs): self.spi.write(buf)
-        for _ in range(npx%bs): self.spi.write(self.buf2)
+    def blit_rows(self, x, y, w, h, buf, stride, swap=None):
+        '''
+        Send the *w* x *h* window at (x,y) of a larger RGB565 framebuffer *buf* with rows *stride*
+        bytes apart, row by row in one transaction. Blocking. *swap(row, pixels)* is applied to
+        every row before it is sent and again afterwards, restoring the framebuffer.
+        '''
+        self._begin_ramwr(x, y, w, h)
+        view=memoryview(buf)
+        n=w*2
+        off=y*stride+x*2
+        for _ in range(h):
+            row=view[off:off+n]
+            if swap: swap(row, w)
+            self.spi.write(row)
+            if swap: swap(row, w)
+            off+=stride
         self.cs.value(1)
 
-    def write_register(self, reg, buf=None):
-        struct.pack_into('B', self.buf1, 0, reg)
-        self.cs.value(0)
+    def _begin_ramwr(self, x, y, w, h):
+        'Waits for the bus, opens a transaction and leaves it at the pixel data of RAMWR.'
+        self.tx.wait()
+        self.blits+=1
+        if self.coalesce:
+            # one transaction: [CASET,RASET,] RAMWR and the pixel data
+            self.cs.value(0)
+            self.transactions+=1
+            self._window_cmds(x, y, w, h)
+        else:
+            self.set_window(x, y, w, h)
+            self.cs.value(0)
+            self.transactions+=1
+        self._send(ST77XX_RAMWR)
+        self.dc.value(1)
+
+    def _send(self, reg, buf=None):
+        'Command and optional data within a transaction the caller opened (CS already low).'
+        self.buf1[0]=reg
         self.dc.value(0)
         self.spi.write(self.buf1)
+        self.overhead_bytes+=1
         if buf is not None:
             self.dc.value(1)
             self.spi.write(buf)
+            if reg!=ST77XX_RAMWR: self.overhead_bytes+=len(buf)
+
+    def _window_cmds(self, x, y, w, h):
+        'CASET/RASET within an open transaction, skipped if the window is the last one sent.'
+        win=(x,y,w,h)
+        if win==self._window:
+            self.window_skips+=1
+            return
+        struct.pack_into('>HH', self.buf4, 0, self._c0+x, self._c0+x+w-1)
+        self._send(ST77XX_CASET, self.buf4)
+        struct.pack_into('>HH', self.buf4, 0, self._r0+y, self._r0+y+h-1)
+        self._send(ST77XX_RASET, self.buf4)
+        self._window=win
+
+    def overhead_stats(self):
+        '''
+        Bus overhead counters since construction (or since they were zeroed): blits, window commands
+        skipped, non-pixel bytes sent and CS transactions, plus the per-blit averages.
+        '''
+        n=max(self.blits,1)
+        return {
+            'blits':self.blits,
+            'window_skips':self.window_skips,
+            'overhead_bytes':self.overhead_bytes,
+            'transactions':self.transactions,
+            'bytes_per_blit':self.overhead_bytes/n,
+            'transactions_per_blit':self.transactions/n,
+        }
+
+    def clear(self, color):
+        self.fill_rect(0, 0, self.width, self.height, color)
+
+    def fill_rect(self, x, y, w, h, color):
+        '''
+        Fill the rectangle with RGB565 *color*, clipped to the screen. Pixels are sent from a scan-line
+        buffer allocated on first use (see *fill_buffer*), in as few SPI writes as its size allows; the
+        window commands go as *coalesce* says, like for blit.
+        '''
+        if x<0: w,x=w+x,0
+        if y<0: h,y=h+y,0
+        w=min(w,self.width-x)
+        h=min(h,self.height-y)
+        if w<=0 or h<=0: return
+        self._begin_ramwr(x, y, w, h)
+        buf=self.fill_buffer(color)
+        n=w*h*2
+        bs=len(buf)
+        for _ in range(n//bs): self.spi.write(buf)
+        if n%bs: self.spi.write(memoryview(buf)[:n%bs])
         self.cs.value(1)
 
-    def _rp2_write_register_dma(self, reg, buf, is_blocking=True):
-        'If *is_blocking* is False, used should call wait_dma explicitly.'
-        SPI1_BASE = 0x40040000 # FIXME: will be different for another SPI bus?
-        SSPDR     = 0x008
-        self.rp2_dma.config(
-            src_addr = uctypes.addressof(buf),
-            dst_addr = SPI1_BASE + SSPDR,
-            count    = len(buf),
-            src_inc  = True,
-            dst_inc  = False,
-            trig_dreq= self.rp2_dma.DREQ_SPI1_TX
-        )
-        struct.pack_into('B',self.buf1,0,reg)
-        self.cs.value(0)
+    FILL_BUF_MAX=8192
 
+    def fill_buffer(self, color):
+        '''
+        Return the scan-line buffer used by fill_rect, filled with *color*. It is allocated once, as
+        whole screen lines taking at most 1/16 of the free heap, FILL_BUF_MAX bytes or the full screen,
+        and only rewritten when the color changes.
+        '''
+        buf=self._fillbuf
+        if buf is None:
+            line=self.width*2
+            size=min(self.FILL_BUF_MAX,gc.mem_free()//16,line*self.height)
+            buf=self._fillbuf=bytearray(max(size//line,1)*line)
+            self._fillcolor=None
+        if color!=self._fillcolor:
+            struct.pack_into('>H',buf,0,color)
+            # double the filled part until the buffer is full
+            mv,n,size=memoryview(buf),2,len(buf)
+            while n<size:
+                k=min(n,size-n)
+                mv[n:n+k]=mv[0:k]
+                n+=k
+            self._fillcolor=color
+        return buf
+
+    def write_register(self, reg, buf=None):
+        self.tx.wait()
+        struct.pack_into('B', self.buf1, 0, reg)
+        if reg==ST77XX_CASET or reg==ST77XX_RASET: self._window=None
+        self.transactions+=1
+        self.overhead_bytes+=1 if (buf is None or reg==ST77XX_RAMWR) else 1+len(buf)
+        self.cs.value(0)
         self.dc.value(0)
         self.spi.write(self.buf1)
-
-        self.dc.value(1)
-        self.rp2_dma.enable()
-
-        if is_blocking: self.rp2_wait_dma()
+        if buf is not None:
+            self.dc.value(1)
+            self.spi.write(buf)
+        self.cs.value(1)
 
     def rp2_wait_dma(self):
         '''
-        Wait for rp2-port DMA transfer to finish; no-op unless self.rp2_dma is defined.
+        Wait for a pending transfer of the transmit backend (rp2-port DMA, or any other asynchronous backend) to finish.
         Can be used as callback before accessing shared SPI bus e.g. with the xpt2046 driver.
         '''
-        if self.rp2_dma is None: return
-        while self.rp2_dma.is_busy(): pass
-        self.rp2_dma.disable()
-        # wait to send last byte. It should take < 1uS @ 10MHz
-        time.sleep_us(1)
-        self.cs.value(1)
+        self.tx.wait()
 
     def _run_seq(self,seq):
         '''
@@ -325,12 +578,21 @@ class St77xx_hw(object):
             self.write_register(reg,data)
             if delay>0: time.sleep_ms(delay)
 
+    async def _run_seq_async(self,seq,delays):
+        'Like :obj:`_run_seq`, awaiting the delays; *delays* maps commands to shorter ones.'
+        import asyncio
+        for cmd in seq:
+            reg,data=cmd[0],cmd[1]
+            delay=delays.get(reg,cmd[2] if len(cmd)==3 else 0)
+            self.write_register(reg,data)
+            if delay>0: await asyncio.sleep(delay/1000)
+
 
 class St7735_hw(St77xx_hw):
     '''There are several ST7735-based LCD models, we only tested the blacktab model really.'''
     def __init__(self,res,model='greentab',**kw):
         super().__init__(res=res,suppRes=[(128,160),(128,128)],model=model,suppModel=['greentab','redtab','blacktab'],**kw)
-    def config_hw(self):
+    def init_seq(self):
         # mostly from here
         # https://github.com/stechiez/raspberrypi-pico/blob/main/pico_st7735/st7735/ST7735.py
 
@@ -387,17 +649,16 @@ class St7735_hw(St77xx_hw):
             # display on
             (ST77XX_DISPON, None,100)
         ]
-        if self.model in ('redtab','blacktab'): self._run_seq(init7735r)
-        else:
-            print('Warning: the greentab model was never properly tested')
-            self._run_seq(init7735)
         # ST77XX_MADCTL applied in apply_rotation
+        if self.model in ('redtab','blacktab'): return init7735r
+        print('Warning: the greentab model was never properly tested')
+        return init7735
 
 
 class St7789_hw(St77xx_hw):
     def __init__(self,res,**kw):
         super().__init__(res=res,suppRes=[(240,320),],model=None,suppModel=None,**kw)
-    def config_hw(self):
+    def init_seq(self):
         init7789=[
             # out of sleep mode
             (ST77XX_SLPOUT, None, 100),
@@ -430,63 +691,333 @@ class St7789_hw(St77xx_hw):
             ## FIXME: needs out of sleep mode AGAIN, otherwise will stay bleck the first time on?
             (ST77XX_SLPOUT, None, 100),
         ]
-        self._run_seq(init7789)
         # ST77XX_MADCTL applied in apply_rotation
+        return init7789
+
+def _covered_pixels(areas):
+    '''Number of distinct pixels in a list of inclusive (x1,y1,x2,y2) areas.'''
+    ys=sorted(set([a[1] for a in areas]+[a[3]+1 for a in areas]))
+    n=0
+    for i in range(len(ys)-1):
+        y=ys[i]
+        # areas are constant between two consecutive edges, merge their spans on one row
+        spans=sorted([(a[0],a[2]) for a in areas if a[1]<=y<=a[3]])
+        end=-1
+        row=0
+        for x1,x2 in spans:
+            if x2<=end: continue
+            row+=x2-max(x1,end+1)+1
+            end=x2
+        n+=row*(ys[i+1]-y)
+    return n
+
 
 class St77xx_lvgl(object):
     '''LVGL wrapper for St77xx, not to be instantiated directly.
 
     * creates and registers LVGL display driver;
-    * allocates buffers (double-buffered by default);
-    * sets the driver callback to the disp_drv_flush_cb method.
+    * allocates buffers (double-buffered by default) sized from the free heap, see
+      :obj:`set_render_mode`;
+    * sets the driver callback to the disp_drv_flush_cb method;
+    * with an asynchronous transmit backend, signals flush_ready when the transfer completes and
+      lets LVGL wait for it through disp_drv_flush_wait_cb;
+    * with *native_order*, renders in the big-endian RGB565 the controller expects
+      (lv.COLOR_FORMAT.RGB565_SWAPPED), so flushed areas go out without a byte-swap pass; LVGL
+      builds without that format fall back to swapping in disp_drv_flush_cb. Off by default:
+      that the format exists does not mean the software renderer draws into it correctly, which
+      has yet to be checked on the board;
+    * records every flush and the areas of each frame, see :obj:`flush_stats`, and merges small
+      invalidated areas that are cheaper to send as one window in disp_drv_invalidate_cb.
 
     '''
+    # Without an explicit budget the draw buffers may take this fraction of the free heap
+    BUF_BUDGET_DIV=4
+    # Bands lower than this are not worth double buffering, a single buffer gets twice the lines
+    MIN_BAND_LINES=8
+    # What one more flush costs in pixels sent: window commands, CS and the Python callback. Two
+    # invalidated areas are merged into their bounding box if that is not more than their pixels
+    # plus this; 0 turns merging off.
+    MERGE_PX=256
+    # Number of flushes kept in flush_log
+    FLUSH_LOG_SIZE=32
+
     def disp_drv_flush_cb(self,disp_drv,area,color_p):
-        self.rp2_wait_dma() # wait if not yet done and DMA is being used
+        t0 = time.ticks_us()
+        self.tx.wait() # previous transfer still on the wire with an asynchronous backend
         
         w = area.x2 - area.x1 + 1
         h = area.y2 - area.y1 + 1
         size = w * h
-        data_view = color_p.__dereference__(size * self.pixel_size)
-        if self.rgb565_swap_func:
-            self.rgb565_swap_func(data_view, size)
+        self.flush_count += 1
+        self.flush_bytes += size * self.pixel_size
+        self._frame_areas.append((area.x1, area.y1, area.x2, area.y2))
+        self._flush(area, w, h, size, color_p)
+        self._flush_done(area.x1, area.y1, w, h, size * self.pixel_size, time.ticks_diff(time.ticks_us(), t0))
+
+    def _flush(self,area,w,h,size,color_p):
+        if self.render_mode == 'direct':
+            # color_p is the whole screen-sized buffer, the area is somewhere in it
+            stride = self.width * self.pixel_size
+            fb = color_p.__dereference__(self.height * stride)
+            if w == self.width and not self.rgb565_swap_func:
+                data_view = fb[area.y1 * stride:(area.y2 + 1) * stride]
+            else:
+                # LVGL keeps drawing on this buffer, so the swap is undone row by row after sending
+                self.blit_rows(area.x1, area.y1, w, h, fb, stride, self.rgb565_swap_func)
+                self._flush_ready()
+                return
+        else:
+            data_view = color_p.__dereference__(size * self.pixel_size)
+            if self.rgb565_swap_func:
+                self.rgb565_swap_func(data_view, size)
         
-        # blit in background
-        self.blit(area.x1, area.y1, w, h, data_view, is_blocking=False)
-        self.disp_drv.flush_ready()
+        # blit in background, LVGL renders into the other buffer meanwhile
+        self.blit(area.x1, area.y1, w, h, data_view, is_blocking=False, done=self._flush_ready)
+        # without a wait callback LVGL would spin in C, holding up the transfer
+        if not self._flush_wait: self.tx.wait()
+
+    def disp_drv_flush_wait_cb(self,disp_drv):
+        self.tx.wait()
+
+    def disp_drv_invalidate_cb(self,event):
+        '''
+        LVGL invalidates an area: grows it to the bounding box with areas invalidated earlier in
+        this frame where one window is cheaper than two (see MERGE_PX). LVGL then drops the areas
+        inside the grown one.
+        '''
+        if not self.merge_px or self.render_mode == 'full': return
+        a = self._area_cast(event.get_param())
+        x1, y1, x2, y2 = a.x1, a.y1, a.x2, a.y2
+        pending = self._pending_areas
+        i = 0
+        while i < len(pending):
+            p = pending[i]
+            bx1, by1, bx2, by2 = min(x1, p[0]), min(y1, p[1]), max(x2, p[2]), max(y2, p[3])
+            if (bx2-bx1+1)*(by2-by1+1) <= (x2-x1+1)*(y2-y1+1) + (p[2]-p[0]+1)*(p[3]-p[1]+1) + self.merge_px:
+                x1, y1, x2, y2 = bx1, by1, bx2, by2
+                pending.pop(i)
+                self.areas_merged += 1
+                # the grown area may now reach earlier ones
+                i = 0
+            else:
+                i += 1
+        pending.append((x1, y1, x2, y2))
+        a.x1, a.y1, a.x2, a.y2 = x1, y1, x2, y2
+
+    def _flush_done(self,x,y,w,h,nbytes,us):
+        self.flush_us += us
+        log = self.flush_log
+        if len(log) < self.FLUSH_LOG_SIZE: log.append((x, y, w, h, us, nbytes))
+        else:
+            log[self._log_pos] = (x, y, w, h, us, nbytes)
+            self._log_pos = (self._log_pos + 1) % self.FLUSH_LOG_SIZE
+        f = self._frame
+        f[0] += 1; f[1] += w * h; f[2] += nbytes; f[3] += us
+        if self.disp_drv.flush_is_last():
+            self.frames += 1
+            self._last_frame = f
+            self._last_areas = self._frame_areas
+            self._frame = [0, 0, 0, 0]
+            self._frame_areas = []
+            self._pending_areas = []
+
+    def flush_stats(self):
+        '''
+        Flushes of the last complete frame: count, pixels, bytes and microseconds spent in the flush
+        callback (with an asynchronous backend the transfer itself is not included), the distinct
+        pixels they covered and the overdraw ratio pixels/distinct; then running totals since
+        construction. The last FLUSH_LOG_SIZE flushes are kept in the ring flush_log as
+        (x,y,w,h,us,bytes).
+        '''
+        f = self._last_frame
+        distinct = _covered_pixels(self._last_areas)
+        return {
+            'flushes':f[0],
+            'pixels':f[1],
+            'bytes':f[2],
+            'us':f[3],
+            'distinct_pixels':distinct,
+            'overdraw':f[1]/distinct if distinct else 0,
+            'frames':self.frames,
+            'total_flushes':self.flush_count,
+            'total_bytes':self.flush_bytes,
+            'total_us':self.flush_us,
+            'areas_merged':self.areas_merged,
+        }
     
-    def __init__(self,doublebuffer=True,factor=4):
+    def __init__(self,doublebuffer=True,factor=None,native_order=False,render_mode=None,buf_budget=None):
         import lvgl as lv
         import lv_utils
 
-        color_format = lv.COLOR_FORMAT.RGB565
-        self.pixel_size = lv.color_format_get_size(color_format)
-        self.rgb565_swap_func = None if self.bgr else lv.draw_sw_rgb565_swap
+        # running totals of flushed areas, read by spotpear frame statistics
+        self.flush_count = 0
+        self.flush_bytes = 0
+        self.flush_us = 0
+        self.frames = 0
+        self.areas_merged = 0
+        self.merge_px = self.MERGE_PX
+        self.flush_log = []
+        self._log_pos = 0
+        # flushes, pixels, bytes, us of the frame being flushed and of the last complete one
+        self._frame = [0, 0, 0, 0]
+        self._last_frame = [0, 0, 0, 0]
+        self._frame_areas = []
+        self._last_areas = []
+        self._pending_areas = []
+        self.doublebuffer = doublebuffer
+        self.draw_buf1 = self.draw_buf2 = None
+        self.buf_bytes = 0
 
         if not lv.is_initialized(): lv.init()
 
         # create event loop if not yet present
         if not lv_utils.event_loop.is_running(): self.event_loop=lv_utils.event_loop()
 
-        # create display buffer(s)
-        draw_buf1 = lv.draw_buf_create(self.width, self.height // factor, color_format, 0)
-        draw_buf2 = lv.draw_buf_create(self.width, self.height // factor, color_format, 0) if doublebuffer else None
-        
         # attach all to self to avoid objects' refcount dropping to zero when the scope is exited
         self.disp_drv = lv.display_create(self.width, self.height)
-        self.disp_drv.set_color_format(color_format)
-        self.disp_drv.set_draw_buffers(draw_buf1, draw_buf2)
-        self.disp_drv.set_render_mode(lv.DISPLAY_RENDER_MODE.PARTIAL)
+        self._set_color_format(native_order)
+        self.set_render_mode(render_mode, factor, buf_budget, redraw=False)
         self.disp_drv.set_flush_cb(self.disp_drv_flush_cb)
+        self._flush_ready = self.disp_drv.flush_ready
+        self._flush_wait = hasattr(self.disp_drv, 'set_flush_wait_cb')
+        if self._flush_wait: self.disp_drv.set_flush_wait_cb(self.disp_drv_flush_wait_cb)
+        self._area_cast = lv.area_t.__cast__
+        self.disp_drv.add_event_cb(self.disp_drv_invalidate_cb, lv.EVENT.INVALIDATE_AREA, None)
+
+    def _set_color_format(self,native_order):
+        import lvgl as lv
+        swapped = getattr(lv.COLOR_FORMAT, 'RGB565_SWAPPED', None)
+        if self.bgr or not native_order or swapped is None:
+            color_format = lv.COLOR_FORMAT.RGB565
+            self.rgb565_swap_func = None if self.bgr else lv.draw_sw_rgb565_swap
+        else:
+            color_format = swapped
+            self.rgb565_swap_func = None
+        self.native_order = self.rgb565_swap_func is None
+        self.color_format = color_format
+        self.pixel_size = lv.color_format_get_size(color_format)
+
+    def set_native_order(self,native_order=True):
+        '''
+        Selects the color format LVGL renders in and recreates the draw buffers for it. Returns
+        whether the panel byte order is rendered natively; False when swapping per flush, either
+        because *native_order* is False or because this LVGL build lacks RGB565_SWAPPED.
+        '''
+        refresh=self._pause_refresh()
+        try:
+            self._free_buffers()
+            self._set_color_format(native_order)
+            self._make_buffers()
+        finally:
+            self._restore_refresh(refresh)
+        return self.native_order
+
+    def set_render_mode(self,mode=None,factor=None,buf_budget=None,redraw=True):
+        '''
+        Chooses the LVGL render mode and the draw buffers for it, replacing the current ones.
+
+        * *mode* 'partial' renders the screen in horizontal bands of height // *factor* lines, or
+          as many lines as fit *buf_budget* bytes (default: free heap // BUF_BUDGET_DIV) when
+          *factor* is None; double buffering is dropped when it leaves less than MIN_BAND_LINES.
+          With room for the whole screen a full redraw goes out in a single flush.
+        * 'full' renders every refresh into a screen-sized buffer and flushes all of it.
+        * 'direct' keeps a screen-sized buffer and flushes only the areas that changed.
+        * None (default) is 'partial' sized from the budget.
+
+        'full' and 'direct' get a second screen buffer only if both fit the budget; ValueError is
+        raised, and the current buffers are kept, when not even one does. Returns
+        :obj:`render_config`.
+        '''
+        import lvgl as lv
+        if mode is None: mode='partial'
+        if mode not in ('partial','full','direct'): raise ValueError('Unsupported render mode %s'%mode)
+        # sized as if the current buffers were given back already
+        if buf_budget is None: buf_budget=(gc.mem_free()+self.buf_bytes)//self.BUF_BUDGET_DIV
+        line=self.width*self.pixel_size
+        nbuf=2 if self.doublebuffer else 1
+        if mode!='partial':
+            lines=self.height
+            if nbuf*lines*line>buf_budget: nbuf=1
+            if lines*line>buf_budget:
+                raise ValueError('%s mode needs a %d byte screen buffer, the budget is %d bytes'%(mode,lines*line,buf_budget))
+        elif factor: lines=self.height//factor
+        else:
+            lines=buf_budget//(nbuf*line)
+            if lines<self.MIN_BAND_LINES and nbuf==2:
+                nbuf=1
+                lines=buf_budget//line
+            lines=max(min(lines,self.height),1)
+            # equal bands: the fewest that cover the screen with at most *lines* each
+            n=(self.height+lines-1)//lines
+            lines=(self.height+n-1)//n
+        # nothing may render while the display has no buffers
+        refresh=self._pause_refresh()
+        try:
+            self._free_buffers()
+            self.render_mode=mode
+            self.band_height=lines
+            self.buf_count=nbuf
+            self.buf_budget=buf_budget
+            self._make_buffers()
+            self.disp_drv.set_render_mode({
+                'partial':lv.DISPLAY_RENDER_MODE.PARTIAL,
+                'full':lv.DISPLAY_RENDER_MODE.FULL,
+                'direct':lv.DISPLAY_RENDER_MODE.DIRECT,
+            }[mode])
+        finally:
+            self._restore_refresh(refresh)
+        if redraw: self.disp_drv.get_screen_active().invalidate()
+        return self.render_config()
+
+    def render_config(self):
+        'The render mode, band height, number and total size of the draw buffers and the budget they were sized for.'
+        return {
+            'mode':self.render_mode,
+            'band_height':self.band_height,
+            'buffers':self.buf_count,
+            'buf_bytes':self.buf_bytes,
+            'buf_budget':self.buf_budget,
+            'native_order':self.native_order,
+        }
+
+    def _pause_refresh(self):
+        'Pauses the refresh timer of the display, so LVGL renders nothing, and returns what _restore_refresh needs.'
+        timer=self.disp_drv.get_refr_timer()
+        paused=timer.get_paused()
+        timer.pause()
+        return timer,paused
+
+    def _restore_refresh(self,refresh):
+        'Resumes the refresh timer unless it was paused already, e.g. by a batched frame that is still being drawn.'
+        timer,paused=refresh
+        if not paused: timer.resume()
+
+    def _free_buffers(self):
+        import lvgl as lv
+        # a transfer may still be reading from them
+        self.tx.wait()
+        for b in (self.draw_buf1, self.draw_buf2):
+            if b is not None: lv.draw_buf_destroy(b)
+        self.draw_buf1 = self.draw_buf2 = None
+        self.buf_bytes = 0
+        gc.collect()
+
+    def _make_buffers(self):
+        import lvgl as lv
+        self.draw_buf1 = lv.draw_buf_create(self.width, self.band_height, self.color_format, 0)
+        self.draw_buf2 = lv.draw_buf_create(self.width, self.band_height, self.color_format, 0) if self.buf_count==2 else None
+        self.buf_bytes = self.buf_count * self.width * self.band_height * self.pixel_size
+        self.disp_drv.set_color_format(self.color_format)
+        self.disp_drv.set_draw_buffers(self.draw_buf1, self.draw_buf2)
 
 class St7735(St7735_hw,St77xx_lvgl):
-    def __init__(self,res,doublebuffer=True,factor=4,**kw):
-        '''See :obj:`St77xx_hw` for the meaning of the parameters.'''
+    def __init__(self,res,doublebuffer=True,factor=None,native_order=False,render_mode=None,buf_budget=None,**kw):
+        '''See :obj:`St77xx_hw` and :obj:`St77xx_lvgl` for the meaning of the parameters.'''
         St7735_hw.__init__(self,res=res,**kw)
-        St77xx_lvgl.__init__(self,doublebuffer,factor)
+        St77xx_lvgl.__init__(self,doublebuffer,factor,native_order,render_mode,buf_budget)
 
 class St7789(St7789_hw,St77xx_lvgl):
-    def __init__(self,res,doublebuffer=True,factor=4,**kw):
-        '''See :obj:`St77xx_hw` for the meaning of the parameters.'''
+    def __init__(self,res,doublebuffer=True,factor=None,native_order=False,render_mode=None,buf_budget=None,**kw):
+        '''See :obj:`St77xx_hw` and :obj:`St77xx_lvgl` for the meaning of the parameters.'''
         St7789_hw.__init__(self,res=res,**kw)
-        St77xx_lvgl.__init__(self,doublebuffer,factor)
+        St77xx_lvgl.__init__(self,doublebuffer,factor,native_order,render_mode,buf_budget)
@@ -0,0 +1,10 @@
+# The board modules run on the host against the stand-ins in tools/hoststubs,
+# see tools/hostenv.py
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tools"))
+
+import hostenv
+
+hostenv.install()
@@ -0,0 +1,38 @@
+import machine
+
+import pytest
+
+import boottrace
+
+
+@pytest.fixture
+def rtc(tmp_path, monkeypatch):
+    monkeypatch.setattr(boottrace, "HISTORY_FILE", str(tmp_path / "boottrace.json"))
+    monkeypatch.setattr(machine, "_rtc_memory", b"")
+    return machine.RTC()
+
+
+def test_history_round_trip(rtc):
+    boottrace.save()
+    boottrace.save()
+    assert len(boottrace.history()) == 2
+    assert rtc.memory().startswith(boottrace.MAGIC)
+    boottrace.clear_history()
+    assert boottrace.history() == []
+    assert rtc.memory() == b""
+
+
+def test_other_rtc_data_is_left_alone(rtc):
+    rtc.memory(b'{"level": 3}')
+    assert boottrace.history() == []
+    boottrace.save()
+    assert rtc.memory() == b'{"level": 3}'
+    assert len(boottrace.history()) == 1
+
+
+def test_records_of_the_wrong_shape_are_dropped(rtc):
+    rtc.memory(boottrace.MAGIC + b'[{"level": 3}, 7, {"cause": 1, "marks": []}]')
+    assert boottrace.history() == [{"cause": 1, "marks": []}]
+    rtc.memory(boottrace.MAGIC + b'{"level": 3}')
+    boottrace.save()
+    assert len(boottrace.history()) == 1
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+import spotpear
+
+
+def _events():
+    out = []
+    while True:
+        e = spotpear.get_button_event()
+        if e is None:
+            return out
+        out.append(e[:2])
+
+
+@pytest.fixture
+def buttons():
+    spotpear.button_setup_event_handler()
+    _events()
+    # Well apart from whatever the previous test pressed
+    for i in range(3):
+        spotpear._button_press_at[i] = spotpear._button_release_at[i] = None
+        spotpear._button_click_at[i] = spotpear._button_edge_at[i] = None
+    yield spotpear._buttons
+    spotpear.set_button_callback(1, None)
+    spotpear.set_button_callback(0, None)
+    for i in (1, 2):
+        spotpear.cancel_timer(("_button", i))
+        spotpear.cancel_timer(("_long", i))
+
+
+def _set(pin, pressed):
+    pin.value(spotpear.BUTTON_PRESSED_LEVEL if pressed else 1 - spotpear.BUTTON_PRESSED_LEVEL)
+    time.sleep(spotpear.BUTTON_DEBOUNCE_MS / 1000 + 0.005)
+
+
+def test_idle_buttons_are_up(buttons):
+    assert spotpear._button_down[1:] == [False, False]
+
+
+def test_click_is_press_then_release(buttons):
+    _set(buttons[1], True)
+    _set(buttons[1], False)
+    assert _events() == [(spotpear.BUTTON_PRESS, 1), (spotpear.BUTTON_RELEASE, 1)]
+
+
+def test_alternating_presses_are_not_both(buttons):
+    _set(buttons[1], True)
+    _set(buttons[1], False)
+    _set(buttons[2], True)
+    _set(buttons[2], False)
+    assert (spotpear.BUTTON_BOTH, 0) not in _events()
+
+
+def test_held_together_is_both(buttons):
+    _set(buttons[1], True)
+    _set(buttons[2], True)
+    _set(buttons[1], False)
+    _set(buttons[2], False)
+    assert (spotpear.BUTTON_BOTH, 0) in _events()
+
+
+def test_legacy_callback_runs_on_release(buttons):
+    calls = []
+    spotpear.set_button_callback(1, lambda: calls.append(1))
+    _set(buttons[1], True)
+    assert calls == []
+    _set(buttons[1], False)
+    assert calls == [1]
+
+
+def test_cancel_all_timers_keeps_long_press(buttons):
+    _set(buttons[1], True)
+    spotpear.cancel_all_timers()
+    time.sleep(spotpear.BUTTON_LONG_MS / 1000 + 0.05)
+    _set(buttons[1], False)
+    assert (spotpear.BUTTON_LONG, 1) in _events()
+
+
+def test_cancel_all_timers_keeps_debounce(buttons):
+    # A tap shorter than the debounce window: the release is a bounce, the
+    # level is looked at again once it settled
+    buttons[1].value(spotpear.BUTTON_PRESSED_LEVEL)
+    buttons[1].value(1 - spotpear.BUTTON_PRESSED_LEVEL)
+    assert spotpear._button_down[1]
+    spotpear.cancel_all_timers()
+    time.sleep(spotpear.BUTTON_DEBOUNCE_MS / 1000 + 0.02)
+    assert not spotpear._button_down[1]
@@ -0,0 +1,84 @@
+import pytest
+
+import spotpear
+import st77xx_sim
+
+
+@pytest.fixture
+def bus():
+    display, bus = st77xx_sim.make_display()
+    spotpear._display = display
+    spotpear._fb_setup()
+    spotpear.clear_screen(0x000000)
+    yield bus
+    spotpear._fb = None
+    spotpear._fb_buf = None
+    spotpear._fb_items.clear()
+    spotpear._display = None
+
+
+def _c(color):
+    return spotpear._color565(color)
+
+
+def test_background_change_keeps_the_drawing(bus):
+    spotpear.draw_rectangle(10, 10, 20, 20, 0xff0000, id="r")
+    spotpear.set_screen_background_color(0x0000ff)
+    assert bus.pixel(15, 15) == _c(0xff0000)
+    assert bus.pixel(100, 100) == _c(0x0000ff)
+    assert spotpear.get_item("r") == (10, 10, 20, 20)
+    # What the item leaves behind is the new background
+    spotpear.draw_rectangle(50, 50, 20, 20, 0xff0000, id="r")
+    assert bus.pixel(15, 15) == _c(0x0000ff)
+
+
+def test_clear_screen_fills_the_panel(bus):
+    spotpear.clear_screen(0x00ff00)
+    assert bus.pixel(0, 0) == bus.pixel(127, 127) == _c(0x00ff00)
+
+
+def test_drawing_reaches_the_panel(bus):
+    spotpear.draw_pixel(3, 4, 0xffffff)
+    spotpear.draw_line(0, 127, 127, 127, 0xff0000, 1)
+    spotpear.draw_circle(64, 64, 5, 0x0000ff)
+    assert bus.pixel(3, 4) == _c(0xffffff)
+    assert bus.pixel(60, 127) == _c(0xff0000)
+    assert bus.pixel(64, 64) == _c(0x0000ff)
+    assert bus.pixel(64, 50) == _c(0)
+
+
+def test_redrawing_an_id_moves_the_item(bus):
+    spotpear.display_text_at_position("Hi", 0, 0, 0xffffff, 24, id="t")
+    # 8x8 font cells scaled by 2 for size 24
+    assert spotpear.get_item("t") == (0, 0, 32, 16)
+    assert bus.pixel(3, 1) == _c(0xffffff)
+    spotpear.display_text_at_position("Hi", 0, 100, 0xffffff, 24, id="t")
+    assert bus.pixel(3, 1) == _c(0)
+    assert bus.pixel(3, 101) == _c(0xffffff)
+    spotpear.remove_item("t")
+    assert spotpear.get_item("t") is None
+    assert bus.pixel(3, 101) == _c(0)
+
+
+def test_batch_sends_one_window(bus):
+    before = spotpear._fb_flushes
+    with spotpear.batch():
+        spotpear.draw_rectangle(0, 0, 4, 4, 0xff0000)
+        spotpear.draw_rectangle(100, 100, 4, 4, 0xff0000)
+        assert bus.pixel(1, 1) == _c(0)
+    assert spotpear._fb_flushes == before + 1
+    assert bus.pixel(1, 1) == bus.pixel(101, 101) == _c(0xff0000)
+    stats = spotpear.frame_stats()
+    assert (stats["calls"], stats["flushes"]) == (2, 1)
+
+
+def test_matrix_repaints_changed_cells(bus):
+    m = spotpear.Matrix(5)
+    assert m.update("90000:00000:00000:00000:00000") == 1
+    assert m.update("90000:00000:00000:00000:00009") == 1
+    assert bus.pixel(10, 10) == _c(0xff0000)
+    assert m.update("00000:00000:00000:00000:00009") == 1
+    assert bus.pixel(10, 10) == _c(0)
+    # clear_screen() wipes the cells, the next frame paints them all again
+    spotpear.clear_screen(0)
+    assert m.update("00000:00000:00000:00000:00009") == 1
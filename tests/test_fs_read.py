@@ -0,0 +1,55 @@
+import pytest
+
+import spotpear
+
+DATA = bytes(range(256)) * 40  # 10240 bytes, more than two chunks
+
+
+@pytest.fixture
+def path(tmp_path):
+    p = tmp_path / "data.bin"
+    p.write_bytes(DATA)
+    return str(p)
+
+
+def _read(*args):
+    chunks = [bytes(c) for c in spotpear.fs_read(*args)]
+    assert all(len(c) <= spotpear.FS_CHUNK for c in chunks)
+    return b"".join(chunks)
+
+
+def test_fs_read_ranges(path):
+    assert _read(path) == DATA
+    assert _read(path, 5000) == DATA[5000:]
+    assert _read(path, 100, 5000) == DATA[100:5100]
+    assert _read(path, 10000, 1000) == DATA[10000:]
+    assert _read(path, 20000) == b""
+    assert _read(path, 0, 0) == b""
+
+
+def test_fs_read_shares_one_buffer(path):
+    chunks = list(spotpear.fs_read(path))
+    assert len(chunks) == 3
+    assert all(c.obj is chunks[0].obj for c in chunks)
+
+
+def test_fs_cat_binary_range_and_tail(path, capsysbinary):
+    spotpear.fs_cat(path, 250, 10)
+    assert capsysbinary.readouterr().out == DATA[250:260]
+    spotpear.fs_cat(path, tail=5)
+    assert capsysbinary.readouterr().out == DATA[-5:]
+    spotpear.fs_cat(path, tail=20000)
+    assert capsysbinary.readouterr().out == DATA
+
+
+def test_fs_cat_hexdump(path, capsysbinary):
+    spotpear.fs_cat(path, 0x40, 20, hexdump=True)
+    assert capsysbinary.readouterr().out.decode().splitlines() == [
+        "00000040  40 41 42 43 44 45 46 47 48 49 4a 4b 4c 4d 4e 4f  |@ABCDEFGHIJKLMNO|",
+        "00000050  50 51 52 53                                      |PQRS|",
+    ]
+
+
+def test_fs_cat_missing_file(tmp_path, capsys):
+    spotpear.fs_cat(str(tmp_path / "nope"))
+    assert capsys.readouterr().out.startswith("Error reading file:")
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import zlib
+
+# fs_upload() reads sys.stdin, so each upload runs in its own interpreter
+CHILD = """
+import sys
+sys.path.insert(0, %r)
+import hostenv
+hostenv.install()
+import os
+os.chdir(sys.argv[1])
+import spotpear
+spotpear.FS_UPLOAD_TIMEOUT_MS = 300
+spotpear.fs_upload(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+""" % os.path.join(os.path.dirname(__file__), "..", "tools")
+
+
+def _upload(tmp_path, data, size, crc):
+    p = subprocess.Popen([sys.executable, "-u", "-c", CHILD, str(tmp_path), "x.bin", str(size), str(crc)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    for pos in range(0, size, 4096):
+        if p.stdout.read(1) != b"\x06":
+            break
+        p.stdin.write(data[pos:pos + 4096])
+        p.stdin.flush()
+    # stdin stays open until the board side has finished, as a stalled
+    # host would leave it
+    try:
+        p.wait(timeout=10)
+    finally:
+        p.kill()
+        p.stdin.close()
+    return p.stdout.read(), p.stderr.read().decode()
+
+
+def test_upload_writes_the_file(tmp_path):
+    data = os.urandom(10_000)
+    out, err = _upload(tmp_path, data, len(data), zlib.crc32(data))
+    assert out.startswith(b"OK 10000"), err
+    assert (tmp_path / "x.bin").read_bytes() == data
+
+
+def test_stalled_host_times_out_mid_chunk(tmp_path):
+    # The host sends the first blocks of a chunk and then nothing more
+    data = os.urandom(1024)
+    out, err = _upload(tmp_path, data, 4000, zlib.crc32(data))
+    assert "upload timed out after 1024 of 4000 bytes" in err
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+import spotpear
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    # a/ b.py (3 bytes), a/c.txt (10), a/d/e.py (100), f.py (1000), g/ empty
+    (tmp_path / "a" / "d").mkdir(parents=True)
+    (tmp_path / "g").mkdir()
+    for name, size, age in (("a/b.py", 3, 30), ("a/c.txt", 10, 20), ("a/d/e.py", 100, 40), ("f.py", 1000, 10)):
+        p = tmp_path / name
+        p.write_bytes(b"x" * size)
+        os.utime(p, (1_000_000 - age, 1_000_000 - age))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _walk(*args, **kw):
+    return [e[:3] for e in spotpear.fs_walk(*args, **kw)]
+
+
+def test_directories_follow_their_contents_with_totals(tree):
+    entries = _walk("", sort="name")
+    assert entries == [
+        ("a/b.py", False, 3),
+        ("a/c.txt", False, 10),
+        ("a/d/e.py", False, 100),
+        ("a/d", True, 100),
+        ("a", True, 113),
+        ("f.py", False, 1000),
+        ("g", True, 0),
+        ("", True, 1113),
+    ]
+
+
+def test_not_recursive(tree):
+    assert _walk("a", sort="name", recursive=False) == [
+        ("a/b.py", False, 3),
+        ("a/c.txt", False, 10),
+        ("a/d", True, None),
+        ("a", True, 13),
+    ]
+
+
+def test_match_filters_files_but_not_totals(tree):
+    files = _walk("", match=".py", sort="name")
+    assert [e[0] for e in files if not e[1]] == ["a/b.py", "a/d/e.py", "f.py"]
+    assert files[-1] == ("", True, 1113)
+    big = _walk("a", match=lambda name: name.startswith("c"))
+    assert [e[0] for e in big if not e[1]] == ["a/c.txt"]
+
+
+def test_sort_by_size_and_mtime(tree):
+    by_size = [e[0] for e in spotpear.fs_walk("a", sort="size", reverse=True, recursive=False) if not e[1]]
+    assert by_size == ["a/c.txt", "a/b.py"]
+    # Each directory is sorted on its own; d was made just now
+    newest = [e for e in spotpear.fs_walk("a", sort="mtime", reverse=True) if not e[1]]
+    assert [(e[0], e[3]) for e in newest] == [
+        ("a/d/e.py", 1_000_000 - 40),
+        ("a/c.txt", 1_000_000 - 20),
+        ("a/b.py", 1_000_000 - 30),
+    ]
+    # Without sorting or asking, no stat() for mtimes
+    assert all(e[3] is None for e in spotpear.fs_walk(""))
+
+
+def test_trailing_slash(tree):
+    assert _walk("a/", recursive=False, sort="name")[0] == ("a/b.py", False, 3)
+
+
+def test_fs_ls_prints_files_and_totals(tree, capsys):
+    spotpear.fs_ls("a", recursive=True, sort="size")
+    lines = capsys.readouterr().out.splitlines()
+    # Subdirectories sort as size 0, their total is only known once walked
+    assert lines[0].startswith("a/c.txt — 10 bytes — Last modified: 999980")
+    assert lines[1].startswith("a/b.py — 3 bytes")
+    assert "a/d/ — 100 bytes in total" in lines
+    assert lines[-2] == "a/ — 113 bytes in total"
+    assert lines[-1] == "End of file list."
+
+
+def test_fs_ls_reports_a_missing_directory(tree, capsys):
+    spotpear.fs_ls("nope")
+    assert capsys.readouterr().out.startswith("Error:")
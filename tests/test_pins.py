@@ -0,0 +1,57 @@
+import pytest
+
+import spotpear
+
+
+class _Registers(dict):
+    # machine.mem32 as the register writes it saw
+    def __setitem__(self, addr, value):
+        self.setdefault(addr, []).append(value)
+
+
+def _level(name):
+    return spotpear._pin_outs[spotpear._pin_entry(name)[0]].value()
+
+
+def test_set_pin_keeps_the_inverted_levels():
+    spotpear.set_pin(1, 1)
+    assert _level(1) == 0
+    spotpear.set_pin(1, 0)
+    assert _level(1) == 1
+    spotpear.set_led(1)
+    assert _level("led") == 1
+    # One Pin per output, made on first use
+    pin = spotpear._pin_outs[spotpear.LED_GPIO]
+    spotpear.set_led(0)
+    assert spotpear._pin_outs[spotpear.LED_GPIO] is pin
+
+
+def test_set_pins_through_pin_objects(monkeypatch):
+    monkeypatch.setattr(spotpear, "_gpio_direct", False)
+    spotpear.set_pins({1: 1, 2: 0, 3: 7, "led": 1})
+    assert [_level(n) for n in (1, 2, 3, "led")] == [0, 1, 1, 1]
+
+
+def test_set_pins_writes_both_registers_once(monkeypatch):
+    regs = _Registers()
+    monkeypatch.setattr(spotpear, "_gpio_direct", True)
+    monkeypatch.setattr(spotpear.machine, "mem32", regs, raising=False)
+    spotpear.set_pins({1: 1, 2: 0, 4: 1, "led": 1})
+    # Outputs 1..4 are inverted: 1 drives low, anything else high
+    assert regs == {
+        spotpear._GPIO_OUT_W1TS: [1 << 6 | 1 << spotpear.LED_GPIO],
+        spotpear._GPIO_OUT_W1TC: [1 << 1 | 1 << 20],
+    }
+
+
+def test_set_pins_skips_an_unused_register(monkeypatch):
+    regs = _Registers()
+    monkeypatch.setattr(spotpear, "_gpio_direct", True)
+    monkeypatch.setattr(spotpear.machine, "mem32", regs, raising=False)
+    spotpear.set_pins({"led": 0})
+    assert regs == {spotpear._GPIO_OUT_W1TC: [1 << spotpear.LED_GPIO]}
+
+
+def test_set_pins_unknown_output():
+    with pytest.raises(ValueError):
+        spotpear.set_pins({5: 1})
@@ -0,0 +1,49 @@
+import sys
+import types
+
+import spotpear
+
+
+class _FakeLv:
+    def __init__(self):
+        self.ticks = 0
+        self.handled = 0
+
+    def tick_inc(self, ms):
+        self.ticks += ms
+
+    def task_handler(self):
+        self.handled += 1
+
+
+class _FakeEventLoop:
+    running = None
+
+    def __init__(self):
+        _FakeEventLoop.running = self
+
+    @staticmethod
+    def current_instance():
+        return _FakeEventLoop.running
+
+    def deinit(self):
+        _FakeEventLoop.running = None
+
+
+def test_lvgl_tick_keeps_running_during_scripts(monkeypatch):
+    fake = _FakeLv()
+    monkeypatch.setattr(spotpear, "lv", fake)
+    monkeypatch.setattr(spotpear, "_display", object())
+    monkeypatch.setattr(spotpear, "_fb", None)
+    monkeypatch.setitem(sys.modules, "lv_utils", types.SimpleNamespace(event_loop=_FakeEventLoop))
+    _FakeEventLoop()
+
+    async def script():
+        await spotpear.sleep_async(200)
+
+    spotpear.run_scripts(script)
+    assert fake.handled >= 5
+    # The tick advanced by about the time the scripts ran
+    assert 150 <= fake.ticks <= 400
+    # and the timer driven event loop is back
+    assert _FakeEventLoop.running is not None
@@ -0,0 +1,112 @@
+import sys
+import types
+
+import pytest
+
+
+class _Timer:
+    def __init__(self, log):
+        self.log = log
+        self.paused = False
+
+    def get_paused(self):
+        return self.paused
+
+    def pause(self):
+        self.paused = True
+        self.log.append("pause")
+
+    def resume(self):
+        self.paused = False
+        self.log.append("resume")
+
+
+class _Display:
+    def __init__(self, log):
+        self.log = log
+        self.timer = _Timer(log)
+
+    def get_refr_timer(self):
+        return self.timer
+
+    def set_color_format(self, cf):
+        pass
+
+    def set_draw_buffers(self, b1, b2):
+        self.log.append("install")
+
+    def set_render_mode(self, mode):
+        pass
+
+
+def _fake_lvgl(log):
+    lv = types.ModuleType("lvgl")
+    lv.COLOR_FORMAT = types.SimpleNamespace(RGB565=1, RGB565_SWAPPED=2)
+    lv.DISPLAY_RENDER_MODE = types.SimpleNamespace(PARTIAL=0, FULL=1, DIRECT=2)
+    lv.draw_sw_rgb565_swap = object()
+    lv.color_format_get_size = lambda cf: 2
+    lv.draw_buf_create = lambda w, h, cf, stride: log.append(("create", w * h * 2)) or object()
+    lv.draw_buf_destroy = lambda b: log.append("destroy")
+    return lv
+
+
+@pytest.fixture
+def display(monkeypatch):
+    import st77xx
+    log = []
+    monkeypatch.setitem(sys.modules, "lvgl", _fake_lvgl(log))
+    d = object.__new__(st77xx.St77xx_lvgl)
+    d.width = d.height = 240
+    d.bgr = False
+    d.doublebuffer = True
+    d.draw_buf1 = d.draw_buf2 = None
+    d.buf_bytes = 0
+    d.tx = types.SimpleNamespace(wait=lambda: None)
+    d.disp_drv = _Display(log)
+    d._set_color_format(False)
+    d.log = log
+    return d
+
+
+@pytest.mark.parametrize("mode", ["full", "direct"])
+def test_screen_buffers_stay_within_budget(display, mode):
+    budget = 140_000
+    cfg = display.set_render_mode(mode, buf_budget=budget, redraw=False)
+    assert cfg["buffers"] == 1
+    assert cfg["buf_bytes"] <= budget
+    assert sum(e[1] for e in display.log if isinstance(e, tuple)) <= budget
+
+
+def test_screen_buffer_over_budget_is_refused(display):
+    display.set_render_mode("partial", buf_budget=20_000, redraw=False)
+    before = display.render_config()
+    del display.log[:]
+    with pytest.raises(ValueError):
+        display.set_render_mode("full", buf_budget=100_000, redraw=False)
+    assert display.log == []
+    assert display.render_config() == before
+
+
+def test_partial_bands_stay_within_budget(display):
+    cfg = display.set_render_mode("partial", buf_budget=30_000, redraw=False)
+    assert cfg["buf_bytes"] <= 30_000
+
+
+def test_buffers_are_swapped_with_refresh_paused(display):
+    display.set_render_mode("partial", buf_budget=30_000, redraw=False)
+    del display.log[:]
+    display.set_native_order(True)
+    assert display.log[0] == "pause" and display.log[-1] == "resume"
+    assert display.log.index("destroy") > 0
+
+
+def test_paused_refresh_stays_paused(display):
+    # as inside spotpear.begin_frame()/end_frame()
+    display.disp_drv.timer.paused = True
+    display.set_render_mode("partial", buf_budget=30_000, redraw=False)
+    display.set_native_order(True)
+    assert display.disp_drv.timer.paused
+    assert "resume" not in display.log
+    display.disp_drv.timer.paused = False
+    display.set_render_mode("partial", buf_budget=30_000, redraw=False)
+    assert not display.disp_drv.timer.paused
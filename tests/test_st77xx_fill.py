@@ -0,0 +1,17 @@
+import pytest
+
+import st77xx_sim
+
+
+@pytest.mark.parametrize("coalesce, per_fill", [(True, 1), (False, 3)])
+def test_fill_rect_follows_coalesce(coalesce, per_fill):
+    display, bus = st77xx_sim.make_display(coalesce=coalesce)
+    t0 = bus.stats()["transactions"]
+    display.fill_rect(10, 10, 20, 20, 0xf800)
+    display.fill_rect(40, 40, 20, 20, 0x07e0)
+    # separate CASET and RASET transactions unless coalescing
+    assert bus.stats()["transactions"] - t0 == 2 * per_fill
+    assert display.overhead_stats()["blits"] == 2
+    assert bus.pixel(15, 15) == 0xf800
+    assert bus.pixel(45, 45) == 0x07e0
+    assert bus.pixel(35, 35) != 0xf800
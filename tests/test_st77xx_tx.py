@@ -0,0 +1,40 @@
+import types
+
+import pytest
+
+import st77xx
+
+
+class _Spi:
+    def __init__(self):
+        self.fail = False
+        self.sent = []
+
+    def write(self, buf):
+        if self.fail:
+            raise OSError("spi write failed")
+        self.sent.append(bytes(buf))
+
+
+def _hw():
+    cs = types.SimpleNamespace(level=0)
+    cs.value = lambda v: setattr(cs, "level", v)
+    return types.SimpleNamespace(spi=_Spi(), cs=cs)
+
+
+def test_failed_write_releases_cs_and_completes():
+    tx = st77xx.St77xx_thread_tx()
+    hw = _hw()
+    done = []
+    hw.spi.fail = True
+    tx.start(hw, b"\x00\x01", lambda: done.append(1))
+    with pytest.raises(OSError):
+        tx.wait()
+    assert hw.cs.level == 1
+    assert done == [1]
+    # the worker survives and the next transfer goes out
+    hw.spi.fail = False
+    hw.cs.level = 0
+    tx.start(hw, b"\x02", lambda: done.append(2))
+    tx.wait()
+    assert hw.spi.sent == [b"\x02"] and done == [1, 2] and hw.cs.level == 1
@@ -0,0 +1,50 @@
+import pytest
+
+import spotpear
+
+
+@pytest.fixture
+def screen():
+    spotpear.clear_screen(0, flush_styles=True)
+    yield
+    spotpear.clear_screen(0, flush_styles=True)
+
+
+def _in_use():
+    return len(spotpear._style_users)
+
+
+def test_restyled_scoreboard_stays_bounded(screen):
+    # More colours than the cache holds, over and over, without clear_screen()
+    n = spotpear.STYLE_CACHE_SIZE * 3
+    for _ in range(4):
+        for c in range(n):
+            spotpear.display_text_at_position(str(c), 10, 10, color=c, id="score")
+            spotpear.draw_rectangle(0, 0, 5, 5, c, id="bar")
+    stats = spotpear.style_cache_stats()
+    assert stats["evictions"] > n
+    assert stats["size"] <= spotpear.STYLE_CACHE_SIZE
+    assert stats["retired"] == 0
+    assert _in_use() == 2
+
+
+def test_evicted_style_is_kept_while_used(screen):
+    spotpear.display_text_at_position("fixed", color=0xabcdef)
+    spotpear.display_text_at_position("held", color=0x123456, id="held")
+    for c in range(spotpear.STYLE_CACHE_SIZE * 2):
+        spotpear.display_text_at_position(str(c), color=c, id="score")
+    assert spotpear.style_cache_stats()["retired"] == 2
+    spotpear.remove_item("held")
+    assert spotpear.style_cache_stats()["retired"] == 1
+    spotpear.clear_screen(0)
+    assert spotpear.style_cache_stats()["retired"] == 0
+    assert _in_use() == 0
+
+
+def test_matrix_counts_its_cells(screen):
+    m = spotpear.Matrix(3, levels=3)
+    m.update("300:030:003")
+    m.update("100:020:001")
+    assert sum(spotpear._style_users.values()) == 3
+    m.delete()
+    assert _in_use() == 0
@@ -0,0 +1,50 @@
+import time
+
+import machine
+
+import spotpear
+
+
+def _run_due():
+    # Fires what is due from this thread, as the scheduled dispatch would
+    time.sleep(0.002)
+    spotpear._timer_dispatch(None)
+
+
+def test_restart_from_callback_keeps_the_wheel_running():
+    fired = []
+
+    def restarter(timer):
+        fired.append(timer)
+        # Restarting live timers over and over triggers heap compaction
+        # while the dispatch is still walking the heap
+        for i in range(20):
+            spotpear.set_timer(("live", i % 2), 10_000, restarter)
+
+    try:
+        # a comes up first, b_oneshot then fires from the same dispatch
+        spotpear.set_timer("a", 1, restarter)
+        spotpear.set_timer("b_oneshot", 1, fired.append)
+        _run_due()
+        assert sorted(map(str, fired)) == ["a", "b_oneshot"]
+        assert "b_oneshot" not in spotpear._timer_entries
+        assert all(e[2] != "b_oneshot" or e[4] is None for e in spotpear._timer_heap)
+
+        spotpear.set_timer("c", 1, fired.append)
+        _run_due()
+        assert fired[-1] == "c"
+        assert spotpear.timer_stats()["active"] == 2
+    finally:
+        spotpear.cancel_all_timers()
+
+
+def test_star_import_exports_the_fixed_timers():
+    names = {}
+    exec("from spotpear import *", names)
+    fired = []
+    try:
+        names["timer2"].init(mode=machine.Timer.ONE_SHOT, period=1, callback=fired.append)
+        _run_due()
+        assert fired == [2]
+    finally:
+        names["timer2"].deinit()
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+import spotpear
+
+
+@pytest.fixture
+def waves():
+    yield
+    spotpear.stop_waves()
+    spotpear.cancel_all_timers()
+
+
+def _wait(ms):
+    # The stand-in machine.Timer fires from its own thread
+    time.sleep(ms / 1000)
+
+
+def _off(name):
+    gpio, invert = spotpear._pin_entry(name)
+    return spotpear._pin_level(invert, 0)
+
+
+def test_set_pwm_runs_until_stopped(waves):
+    spotpear.set_pwm(1, 25)
+    gpio = spotpear._pin_entry(1)[0]
+    pwm = spotpear._waves[gpio].pwm
+    assert pwm.freq() == spotpear.PWM_FREQ
+    # Output 1 is inverted
+    assert pwm.duty_u16() == 65535 - 25 * 65535 // 100
+    assert spotpear.stop_wave(1)
+    assert gpio not in spotpear._waves
+    assert spotpear._pin_outs[gpio].value() == _off(1)
+    assert not spotpear.stop_wave(1)
+
+
+def test_blink_count_ends_off(waves):
+    spotpear.blink("led", 30, count=2)
+    pwm = spotpear._waves[spotpear.LED_GPIO].pwm
+    assert pwm.duty_u16() == 65535
+    _wait(45)
+    assert pwm.duty_u16() == 0
+    _wait(150)
+    assert spotpear.LED_GPIO not in spotpear._waves
+    assert ("_wave", spotpear.LED_GPIO) not in spotpear._timer_entries
+    assert spotpear._pin_outs[spotpear.LED_GPIO].value() == 0
+
+
+def test_play_tones_steps_through_the_notes(waves):
+    spotpear.play_tones("led", [(440, 50), (0, 50)], repeat=True)
+    pwm = spotpear._waves[spotpear.LED_GPIO].pwm
+    assert (pwm.freq(), pwm.duty_u16()) == (440, 32768)
+    _wait(75)
+    assert pwm.duty_u16() == 0
+    _wait(50)
+    assert (pwm.freq(), pwm.duty_u16()) == (440, 32768)
+
+
+def test_setting_the_output_stops_the_wave(waves):
+    spotpear.blink("led", 30)
+    spotpear.set_led(1)
+    assert spotpear.LED_GPIO not in spotpear._waves
+    assert ("_wave", spotpear.LED_GPIO) not in spotpear._timer_entries
+    _wait(45)
+    assert spotpear._pin_outs[spotpear.LED_GPIO].value() == 1
+
+
+def test_software_pwm_without_a_channel(waves, monkeypatch):
+    def no_channel(*args, **kw):
+        raise ValueError("out of PWM channels")
+    monkeypatch.setattr(spotpear.machine, "PWM", no_channel)
+    spotpear.set_pwm("led", 50, freq=10)
+    wave = spotpear._waves[spotpear.LED_GPIO]
+    assert wave.pwm is None
+    assert wave.on_ms + wave.off_ms == 100
+    assert 45 <= wave.on_ms <= 55
+    levels = set()
+    for _ in range(8):
+        levels.add(wave.pin.value())
+        _wait(30)
+    assert levels == {0, 1}
+    spotpear.stop_wave("led")
+    assert ("_pwm", spotpear.LED_GPIO) not in spotpear._timer_entries
+    assert spotpear._pin_outs[spotpear.LED_GPIO].value() == 0
+
+
+def test_cancel_all_timers_keeps_blinking(waves):
+    spotpear.blink("led", 40)
+    pwm = spotpear._waves[spotpear.LED_GPIO].pwm
+    spotpear.cancel_all_timers()
+    assert ("_wave", spotpear.LED_GPIO) in spotpear._timer_entries
+    _wait(60)
+    assert pwm.duty_u16() == 0
+    _wait(40)
+    assert pwm.duty_u16() == 65535
+
+
+def test_unknown_output(waves):
+    with pytest.raises(ValueError):
+        spotpear.blink(9)
+    with pytest.raises(ValueError):
+        spotpear.play_wave("led", [])
@@ -0,0 +1,73 @@
+# Edge-to-callback latency and dropped events of the spotpear button
+# handling. On the board, press the buttons for RUN_MS after starting:
+#
+#   mpremote run tools/bench_buttons.py
+#
+# On a Linux host the presses are simulated on the stand-in pins, each with
+# a burst of contact bounce on both edges:
+#
+#   python3 tools/bench_buttons.py
+#
+# Events go to a callback that only counts them by kind. Prints one JSON
+# line with the counts and button_stats().
+
+import sys
+import json
+
+ON_BOARD = sys.platform == "esp32"
+
+if not ON_BOARD:
+    import hostenv
+    hostenv.install()
+
+import time
+
+import spotpear
+
+RUN_MS = 10000
+PRESSES = 200
+BOUNCES = 4
+
+
+def _edge(pin, level):
+    for i in range(BOUNCES * 2 + 1):
+        pin.value(level if i % 2 == 0 else 1 - level)
+        time.sleep_us(200)
+
+
+def simulate():
+    for i in range(PRESSES):
+        pin = spotpear._buttons[1 + i % 2]
+        _edge(pin, spotpear.BUTTON_PRESSED_LEVEL)
+        time.sleep_ms(40)
+        _edge(pin, 1 - spotpear.BUTTON_PRESSED_LEVEL)
+        time.sleep_ms(40)
+
+
+def main():
+    kinds = {}
+
+    def callback(kind, button, t):
+        kinds[kind] = kinds.get(kind, 0) + 1
+
+    spotpear.button_setup_event_handler()
+    spotpear.set_button_event_callback(callback)
+    if ON_BOARD:
+        time.sleep_ms(RUN_MS)
+    else:
+        simulate()
+        time.sleep_ms(spotpear.BUTTON_LONG_MS)
+    spotpear.set_button_event_callback(None)
+    result = {
+        "presses": kinds.get(spotpear.BUTTON_PRESS, 0),
+        "releases": kinds.get(spotpear.BUTTON_RELEASE, 0),
+        "doubles": kinds.get(spotpear.BUTTON_DOUBLE, 0),
+        "boths": kinds.get(spotpear.BUTTON_BOTH, 0),
+        "longs": kinds.get(spotpear.BUTTON_LONG, 0),
+        "target": "board" if ON_BOARD else "host",
+    }
+    result.update(spotpear.button_stats())
+    print(json.dumps(result))
+
+
+main()
@@ -0,0 +1,55 @@
+# Compares two display_bench.py result files:
+#
+#   python3 tools/bench_compare.py old.jsonl new.jsonl [threshold_percent]
+#
+# Prints every metric that changed and exits with status 1 when any metric
+# got worse by more than the threshold (10% by default).
+
+import sys
+import json
+
+METRICS = ("us_per_iter", "bytes", "transactions", "cs_toggles", "dc_toggles", "alloc_bytes")
+
+
+def load(path):
+    res = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("{"):
+                r = json.loads(line)
+                if "skipped" not in r:
+                    res[r["scenario"]] = r
+    return res
+
+
+def compare(old, new, threshold):
+    worse = 0
+    for name in sorted(set(old) | set(new)):
+        if name not in old or name not in new:
+            print("%-18s only in %s" % (name, "new" if name in new else "old"))
+            continue
+        for m in METRICS:
+            a = old[name].get(m)
+            b = new[name].get(m)
+            if a is None or b is None or a == b:
+                continue
+            pct = (b - a) * 100.0 / a if a else 100.0
+            flag = ""
+            if pct > threshold:
+                flag = "  REGRESSION"
+                worse += 1
+            print("%-18s %-13s %10d -> %10d  %+7.1f%%%s" % (name, m, a, b, pct, flag))
+    return worse
+
+
+def main(argv):
+    if len(argv) < 3:
+        print("usage: bench_compare.py old.jsonl new.jsonl [threshold_percent]")
+        return 2
+    threshold = float(argv[3]) if len(argv) > 3 else 10.0
+    return 1 if compare(load(argv[1]), load(argv[2]), threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
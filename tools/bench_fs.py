@@ -0,0 +1,97 @@
+# Directory listing cost of spotpear.fs_walk() against what fs_ls() used to
+# do, os.listdir() and two os.stat() per file. On the board:
+#
+#   mpremote run tools/bench_fs.py
+#
+# or on a Linux host:
+#
+#   python3 tools/bench_fs.py
+#
+# A tree of DIRS directories with FILES small files each is created under
+# ROOT and removed again afterwards. Prints one JSON line per case with the
+# entries seen, the milliseconds taken and, on the board, the bytes
+# allocated.
+
+import sys
+import gc
+import os
+import json
+
+ON_BOARD = sys.platform == "esp32"
+
+if not ON_BOARD:
+    import hostenv
+    hostenv.install()
+
+import time
+
+import spotpear
+
+ROOT = "/fsbench" if ON_BOARD else "/tmp/fsbench"
+DIRS = 8
+FILES = 16
+
+
+def make_tree():
+    os.mkdir(ROOT)
+    for d in range(DIRS):
+        os.mkdir("%s/d%d" % (ROOT, d))
+        for f in range(FILES):
+            with open("%s/d%d/f%d.py" % (ROOT, d, f), "w") as fh:
+                fh.write("#" * (f + 1))
+
+
+def remove_tree():
+    for d in range(DIRS):
+        for f in range(FILES):
+            os.remove("%s/d%d/f%d.py" % (ROOT, d, f))
+        os.rmdir("%s/d%d" % (ROOT, d))
+    os.rmdir(ROOT)
+
+
+# What fs_ls() did, applied to each directory of the tree
+def listdir_stat():
+    n = 0
+    for d in os.listdir(ROOT):
+        path = ROOT + "/" + d
+        for name in os.listdir(path):
+            if os.stat(path + "/" + name)[0] & 0x8000:
+                stat = os.stat(path + "/" + name)
+                n += stat[6] > 0 and stat[8] is not None
+    return n
+
+
+def walk():
+    return sum(1 for e in spotpear.fs_walk(ROOT) if not e[1])
+
+
+def walk_mtime():
+    return sum(1 for e in spotpear.fs_walk(ROOT, mtime=True) if not e[1])
+
+
+def run(name, fn):
+    gc.collect()
+    a0 = gc.mem_alloc() if ON_BOARD else 0
+    t0 = time.ticks_us()
+    n = fn()
+    t1 = time.ticks_us()
+    a1 = gc.mem_alloc() if ON_BOARD else 0
+    return {
+        "case": name,
+        "files": n,
+        "ms": time.ticks_diff(t1, t0) / 1000,
+        "alloc_bytes": a1 - a0 if ON_BOARD else None,
+        "target": "board" if ON_BOARD else "host",
+    }
+
+
+def main():
+    make_tree()
+    try:
+        for name, fn in (("listdir_stat", listdir_stat), ("fs_walk", walk), ("fs_walk_mtime", walk_mtime)):
+            print(json.dumps(run(name, fn)))
+    finally:
+        remove_tree()
+
+
+main()
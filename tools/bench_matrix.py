@@ -0,0 +1,98 @@
+# Scrolling-text frame rate of the LED-matrix helpers, run on the board:
+#
+#   mpremote run tools/bench_matrix.py
+#
+# Compares redrawing every frame with clear_screen() + draw_grid() against
+# updating a persistent spotpear.Matrix, for a 5x5 and a 16x16 matrix. Every
+# frame is rendered and flushed with lv.refr_now() so the numbers include the
+# SPI transfer.
+
+import time
+import gc
+
+import lvgl as lv
+import spotpear
+
+# 5 row font, just enough for the banner
+FONT = {
+    "S": ("111", "100", "111", "001", "111"),
+    "P": ("111", "101", "111", "100", "100"),
+    "O": ("111", "101", "101", "101", "111"),
+    "T": ("111", "010", "010", "010", "010"),
+    "E": ("111", "100", "111", "100", "111"),
+    "A": ("010", "101", "111", "101", "101"),
+    "R": ("110", "101", "110", "101", "101"),
+    " ": ("0", "0", "0", "0", "0"),
+}
+
+# Banner columns, each a list of 5 pixel values
+def banner(text):
+    cols = []
+    for ch in text:
+        glyph = FONT[ch]
+        for c in range(len(glyph[0])):
+            cols.append([int(glyph[r][c]) for r in range(5)])
+        cols.append([0] * 5)
+    return cols
+
+# NxN frames of the banner scrolling right to left; the font is scaled up to
+# fill bigger matrices
+def frames(text, n, count):
+    cols = banner(text)
+    scale = max(n // 5, 1)
+    pad = (n - 5 * scale) // 2
+    out = []
+    for f in range(count):
+        grid = [[0] * n for _ in range(n)]
+        for x in range(n):
+            col = cols[(f + x // scale) % len(cols)]
+            for r in range(5):
+                if col[r]:
+                    for dy in range(scale):
+                        grid[pad + r * scale + dy][x] = 9
+        out.append(grid)
+    return out
+
+def refresh():
+    lv.refr_now(lv.display_get_default())
+
+def run(n, count=40):
+    grids = frames("SPOTPEAR ", n, count)
+    border = 2 if n <= 8 else 1
+    results = {}
+
+    # Old path: wipe and recreate every lit cell
+    spotpear.clear_screen(0x000000)
+    gc.collect()
+    t0 = time.ticks_ms()
+    for grid in grids:
+        spotpear.clear_screen(0x000000)
+        spotpear.draw_grid([[1 if v else 0 for v in row] for row in grid], border, 0xff0000, 128, 128)
+        refresh()
+    dt = time.ticks_diff(time.ticks_ms(), t0)
+    results["draw_grid"] = count * 1000 / max(dt, 1)
+
+    # New path: one cell pool, only changed cells are touched
+    spotpear.clear_screen(0x000000)
+    gc.collect()
+    m = spotpear.Matrix(n, border=border, color=0xff0000)
+    refresh()
+    t0 = time.ticks_ms()
+    for grid in grids:
+        m.update(grid)
+        refresh()
+    dt = time.ticks_diff(time.ticks_ms(), t0)
+    results["matrix"] = count * 1000 / max(dt, 1)
+    results["changed_per_frame"] = m.changed / max(m.frames, 1)
+    m.delete()
+    return results
+
+def main():
+    if spotpear._display is None:
+        spotpear.board_setup()
+    for n in (5, 16):
+        r = run(n)
+        print("%dx%d: draw_grid %.1f fps, Matrix %.1f fps, %.1f cells changed per frame"
+              % (n, n, r["draw_grid"], r["matrix"], r["changed_per_frame"]))
+
+main()
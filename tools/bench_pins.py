@@ -0,0 +1,85 @@
+# Toggle rate of the spotpear outputs. On the board:
+#
+#   mpremote run tools/bench_pins.py
+#
+# or on a Linux host, with the stand-in machine module:
+#
+#   python3 tools/bench_pins.py
+#
+# Each case toggles for RUN_MS and prints one JSON line with the toggles per
+# second and the bytes allocated per toggle. "pin_per_call" is what
+# set_pin() used to do, a new machine.Pin on every call; "set_pins_4" changes
+# all four pins in each set_pins() call.
+
+import sys
+import gc
+import json
+
+ON_BOARD = sys.platform == "esp32"
+
+if not ON_BOARD:
+    import hostenv
+    hostenv.install()
+
+import time
+import machine
+
+import spotpear
+
+RUN_MS = 1000
+
+
+def pin_per_call(v):
+    pin = machine.Pin(1, machine.Pin.OUT)
+    if v == 1:
+        pin.off()
+    else:
+        pin.on()
+
+
+def set_pin(v):
+    spotpear.set_pin(1, v)
+
+
+def set_led(v):
+    spotpear.set_led(v)
+
+
+ALL_HIGH = {1: 0, 2: 0, 3: 0, 4: 0}
+ALL_LOW = {1: 1, 2: 1, 3: 1, 4: 1}
+
+
+def set_pins_4(v):
+    spotpear.set_pins(ALL_LOW if v else ALL_HIGH)
+
+
+def _alloc():
+    return gc.mem_alloc() if hasattr(gc, "mem_alloc") else 0
+
+
+def run(name, fn):
+    fn(0)
+    gc.collect()
+    a0 = _alloc()
+    n = 0
+    start = time.ticks_ms()
+    while time.ticks_diff(time.ticks_ms(), start) < RUN_MS:
+        for _ in range(100):
+            fn(n & 1)
+            n += 1
+    a1 = _alloc()
+    return {
+        "case": name,
+        "toggles_per_s": n * 1000 // RUN_MS,
+        "alloc_per_toggle": (a1 - a0) / n if ON_BOARD else None,
+        "target": "board" if ON_BOARD else "host",
+    }
+
+
+def main():
+    for name, fn in (("pin_per_call", pin_per_call), ("set_pin", set_pin),
+                     ("set_led", set_led), ("set_pins_4", set_pins_4)):
+        print(json.dumps(run(name, fn)))
+
+
+main()
@@ -0,0 +1,70 @@
+# How promptly spotpear scripts wake up from sleep_async() while another
+# script keeps the CPU busy, with 1, 10 and 50 sleeping scripts. On the board:
+#
+#   mpremote run tools/bench_scripts.py
+#
+# or on a Linux host, with the stand-in modules:
+#
+#   python3 tools/bench_scripts.py
+#
+# Every sleeping script wakes every PERIOD_MS and notes how late it woke, the
+# busy one counts loop rounds and calls checkpoint() in each. One JSON line
+# per script count gives the wake-ups and the mean, 95th percentile and
+# maximum lateness in microseconds, the share of the run the busy script got
+# and its longest step.
+
+import sys
+import json
+
+ON_BOARD = sys.platform == "esp32"
+
+if not ON_BOARD:
+    import hostenv
+    hostenv.install()
+
+import time
+
+import spotpear
+
+PERIOD_MS = 50
+RUN_MS = 3000
+
+
+def run(count):
+    late = []
+    start = time.ticks_ms()
+
+    def sleeper():
+        async def script():
+            while time.ticks_diff(time.ticks_ms(), start) < RUN_MS:
+                t = time.ticks_us()
+                await spotpear.sleep_async(PERIOD_MS)
+                late.append(time.ticks_diff(time.ticks_us(), t) - PERIOD_MS * 1000)
+        return script
+
+    async def busy():
+        while time.ticks_diff(time.ticks_ms(), start) < RUN_MS:
+            await spotpear.checkpoint()
+
+    spotpear.run_scripts(busy, *[sleeper() for _ in range(count)])
+    stats = spotpear.script_stats()[0]
+    late.sort()
+    n = len(late)
+    return {
+        "scripts": count,
+        "wakeups": n,
+        "mean_us": sum(late) // max(n, 1),
+        "p95_us": late[n * 95 // 100] if n else 0,
+        "max_us": late[-1] if n else 0,
+        "busy_share": round(stats["run_us"] / (RUN_MS * 1000), 3),
+        "busy_max_step_us": stats["max_us"],
+        "target": "board" if ON_BOARD else "host",
+    }
+
+
+def main():
+    for count in (1, 10, 50):
+        print(json.dumps(run(count)))
+
+
+main()
@@ -0,0 +1,88 @@
+# Time from reset to the first screen on the panel and the free heap after
+# board_setup(), for the LVGL and the framebuffer display. Run on the host
+# with the board attached:
+#
+#   python3 tools/bench_startup.py [port]
+#
+# For each display mode a main.py that calls board_setup(display=...) and
+# stores its numbers in startup.json is copied to the board, the board is
+# hard reset and the result read back with mpremote. An existing main.py is
+# kept as main.py.orig meanwhile and put back at the end. ticks_ms() starts
+# with the firmware, so the time spent in the bootloader is not included.
+
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+MODES = ("lvgl", "fb")
+
+MAIN_PY = """\
+import time
+t_start = time.ticks_ms()
+import gc
+import json
+import spotpear
+t_import = time.ticks_ms()
+spotpear.board_setup(display=%r)
+if %r == "lvgl":
+    import lvgl as lv
+    lv.refr_now(lv.display_get_default())
+t_pixel = time.ticks_ms()
+gc.collect()
+with open("startup.json", "w") as f:
+    f.write(json.dumps({
+        "display": %r,
+        "main_ms": t_start,
+        "import_ms": time.ticks_diff(t_import, t_start),
+        "first_pixel_ms": t_pixel,
+        "mem_free": gc.mem_free(),
+        "mem_alloc": gc.mem_alloc(),
+    }))
+"""
+
+# Seconds the board gets to boot and run main.py after the reset
+BOOT_WAIT = 5
+
+
+def mpremote(port, *args, check=True):
+    cmd = ["mpremote"]
+    if port:
+        cmd += ["connect", port]
+    cmd += list(args)
+    return subprocess.run(cmd, check=check, capture_output=True, text=True).stdout
+
+
+def run_mode(port, mode):
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(MAIN_PY % (mode, mode, mode))
+        path = f.name
+    mpremote(port, "fs", "rm", ":startup.json", check=False)
+    mpremote(port, "fs", "cp", path, ":main.py")
+    mpremote(port, "reset")
+    time.sleep(BOOT_WAIT)
+    return json.loads(mpremote(port, "fs", "cat", ":startup.json"))
+
+
+def main(argv):
+    port = argv[1] if len(argv) > 1 else None
+    had_main = "main.py" in mpremote(port, "fs", "ls", ":")
+    if had_main:
+        mpremote(port, "exec", "import os; os.rename('main.py', 'main.py.orig')")
+    try:
+        results = [run_mode(port, mode) for mode in MODES]
+    finally:
+        mpremote(port, "fs", "rm", ":main.py", check=False)
+        if had_main:
+            mpremote(port, "exec", "import os; os.rename('main.py.orig', 'main.py')")
+    for r in results:
+        print(json.dumps(r))
+    base, fb = results
+    print("first pixel: %d ms -> %d ms, free heap: %d -> %d bytes"
+          % (base["first_pixel_ms"], fb["first_pixel_ms"], base["mem_free"], fb["mem_free"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
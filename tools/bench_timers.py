@@ -0,0 +1,70 @@
+# Dispatch jitter of the spotpear timer wheel with 1, 10 and 100 periodic
+# timers running at once. On the board:
+#
+#   mpremote run tools/bench_timers.py
+#
+# or on a Linux host, where the machine.Timer stand-in runs on a thread:
+#
+#   python3 tools/bench_timers.py
+#
+# Every timer has the same period, their phases are spread over it. Each
+# callback notes how late it ran against its ideal time; one JSON line per
+# timer count gives the callbacks run and the mean, 95th percentile and
+# maximum lateness in microseconds.
+
+import sys
+import json
+
+ON_BOARD = sys.platform == "esp32"
+
+if not ON_BOARD:
+    import hostenv
+    hostenv.install()
+
+import time
+
+import spotpear
+
+PERIOD_MS = 100
+RUN_MS = 3000
+
+
+def run(count):
+    late = []
+    start = time.ticks_us()
+    # ideal time of the next firing of each timer, in microseconds from start
+    ideal = {}
+
+    def callback(timer):
+        now = time.ticks_diff(time.ticks_us(), start)
+        late.append(now - ideal[timer])
+        ideal[timer] += PERIOD_MS * 1000
+
+    # a one-shot per timer starts it at its phase; lateness is measured from
+    # there, so the start itself does not count
+    def starter(t):
+        ideal[t[1]] = time.ticks_diff(time.ticks_us(), start) + PERIOD_MS * 1000
+        spotpear.set_timer(t[1], PERIOD_MS, callback, True)
+
+    for i in range(count):
+        spotpear.set_timer(("start", i), PERIOD_MS * i // count, starter)
+    time.sleep_ms(RUN_MS)
+    spotpear.cancel_all_timers()
+    late.sort()
+    n = len(late)
+    return {
+        "timers": count,
+        "callbacks": n,
+        "mean_us": sum(late) // max(n, 1),
+        "p95_us": late[n * 95 // 100] if n else 0,
+        "max_us": late[-1] if n else 0,
+        "target": "board" if ON_BOARD else "host",
+    }
+
+
+def main():
+    for count in (1, 10, 100):
+        print(json.dumps(run(count)))
+
+
+main()
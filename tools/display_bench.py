@@ -0,0 +1,388 @@
+# Display pipeline benchmarks.
+#
+# On a Linux host the drivers run against the simulated bus from
+# st77xx_sim.py:
+#
+#   python3 tools/display_bench.py [scenario ...] > host.jsonl
+#
+# On the board the real panel is used; board_setup() is run if the display
+# is not up yet and the bus is counted by wrapping the SPI and CS/DC pins:
+#
+#   mpremote run tools/display_bench.py > board.jsonl
+#
+# Every scenario prints one JSON object per line with wall time, bytes on the
+# bus, SPI transactions (CS assertions), CS/DC toggles and, on MicroPython,
+# the bytes allocated on the heap while it ran. On the host "wire_us" is the
+# transfer time at the configured SPI clock, wall time there is mostly the
+# simulator itself. Scenarios that need LVGL are reported as skipped where it
+# is not available. Compare two result files with tools/bench_compare.py.
+
+import sys
+import gc
+import json
+
+try:
+    import lvgl  # noqa: F401
+    HAVE_LVGL = True
+except ImportError:
+    HAVE_LVGL = False
+
+ON_BOARD = sys.platform == "esp32"
+
+if not ON_BOARD:
+    import hostenv
+    hostenv.install()
+
+import time
+
+import st77xx
+
+
+class CountingSPI:
+    """Wraps the board SPI to count what the driver writes."""
+
+    def __init__(self, spi):
+        self.spi = spi
+        self.bytes = 0
+        self.writes = 0
+
+    def write(self, buf):
+        self.bytes += len(buf)
+        self.writes += 1
+        self.spi.write(buf)
+
+    def __getattr__(self, name):
+        return getattr(self.spi, name)
+
+
+class CountingPin:
+    """Wraps a driver output pin to count level changes and CS assertions."""
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.level = pin.value()
+        self.toggles = 0
+        self.lows = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self.pin.value()
+        if v != self.level:
+            self.level = v
+            self.toggles += 1
+            if not v:
+                self.lows += 1
+        self.pin.value(v)
+
+    __call__ = value
+
+    def __getattr__(self, name):
+        return getattr(self.pin, name)
+
+
+class WireProbe:
+    def __init__(self, disp):
+        disp.spi = self.spi = CountingSPI(disp.spi)
+        disp.cs = self.cs = CountingPin(disp.cs)
+        disp.dc = self.dc = CountingPin(disp.dc)
+        self.baudrate = 40_000_000
+
+    def snapshot(self):
+        return {
+            "bytes": self.spi.bytes,
+            "transactions": self.cs.lows,
+            "cs_toggles": self.cs.toggles,
+            "dc_toggles": self.dc.toggles,
+            "spi_writes": self.spi.writes,
+        }
+
+
+class SimProbe:
+    def __init__(self, bus):
+        self.bus = bus
+
+    def snapshot(self):
+        return self.bus.stats()
+
+
+class Context:
+    def __init__(self):
+        self.lvgl = HAVE_LVGL
+        if ON_BOARD:
+            import spotpear
+            if spotpear._display is None:
+                spotpear.board_setup()
+            self.disp = spotpear._display
+            self.probe = WireProbe(self.disp)
+        else:
+            import st77xx_sim
+            cls = st77xx.St7735 if HAVE_LVGL else st77xx.St7735_hw
+            self.disp, self.bus = st77xx_sim.make_display(cls)
+            self.probe = SimProbe(self.bus)
+        w, h = self.disp.width, self.disp.height
+        self.frame = bytearray(w * h * 2)
+        for i in range(0, len(self.frame), 2):
+            self.frame[i] = (i >> 3) & 0xFF
+
+
+def _heap_used():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return None
+
+
+def _refresh():
+    import lvgl as lv
+    lv.refr_now(lv.display_get_default())
+
+
+##############################################################################
+#
+# Scenarios, each takes the Context and returns the number of iterations run
+#
+
+def bench_clear(ctx):
+    for c in (0x0000, 0xF800, 0x07E0, 0x001F):
+        ctx.disp.clear(c)
+    return 4
+
+def bench_blit_full(ctx):
+    d = ctx.disp
+    for _ in range(4):
+        d.blit(0, 0, d.width, d.height, ctx.frame)
+    return 4
+
+def bench_fill_rect(ctx):
+    d = ctx.disp
+    for i in range(50):
+        d.fill_rect((i * 7) % 100, (i * 5) % 100, 24, 16, 0x07E0 if i & 1 else 0xF800)
+    return 50
+
+def bench_set_window(ctx):
+    d = ctx.disp
+    for i in range(100):
+        d.set_window(i % 64, i % 32, 16, 16)
+    return 100
+
+# Full screen redraw as LVGL would flush it with draw buffers of
+# height // factor lines
+def _bands(factor):
+    def bench(ctx):
+        d = ctx.disp
+        band = d.height // factor
+        view = memoryview(ctx.frame)
+        for _ in range(2):
+            for y in range(0, d.height, band):
+                h = min(band, d.height - y)
+                d.blit(0, y, d.width, h, view[:d.width * h * 2])
+        return 2
+    return bench
+
+# Many small partial flushes: 8x8 tiles of 16x16 pixels, then the same tile
+# over and over as a changing counter would flush it. Run with and without
+# the coalesced command pipeline of St77xx_hw.
+def _small_blits(coalesce):
+    def bench(ctx):
+        d = ctx.disp
+        old = d.coalesce
+        d.coalesce = coalesce
+        d._window = None
+        tile = memoryview(ctx.frame)[:16 * 16 * 2]
+        try:
+            for ty in range(8):
+                for tx in range(8):
+                    d.blit(tx * 16, ty * 16, 16, 16, tile)
+            for _ in range(64):
+                d.blit(32, 32, 16, 16, tile)
+        finally:
+            d.coalesce = old
+        return 128
+    return bench
+
+# Busy loop standing in for rendering. On the host it yields to other
+# threads on every pass, a spinning thread is otherwise only preempted at the
+# end of its OS time slice when there is a single CPU.
+def _spin(us):
+    t0 = time.ticks_us()
+    while time.ticks_diff(time.ticks_us(), t0) < us:
+        if not ON_BOARD:
+            time.sleep(0)
+
+# Full-screen animation as LVGL drives it with double buffering: render a
+# quarter-screen band into one buffer (a busy loop here), hand it to the
+# driver and render the next band into the other buffer. On the host the
+# simulated SPI takes real wire time for this, so that transfer and render
+# can overlap with an asynchronous transmit backend.
+def _pipeline(make_tx, render_us=1500, frames=8):
+    def bench(ctx):
+        d = ctx.disp
+        band = d.height // 4
+        size = d.width * band * 2
+        view = memoryview(ctx.frame)
+        bufs = (view[:size], view[size:2 * size])
+        old = d.tx
+        d.tx = make_tx()
+        if not ON_BOARD:
+            ctx.bus.spi.realtime = True
+            # hand the GIL over promptly while the main thread spins
+            if hasattr(sys, "setswitchinterval"):
+                sys.setswitchinterval(0.0001)
+        try:
+            i = 0
+            for _ in range(frames):
+                for y in range(0, d.height, band):
+                    _spin(render_us)
+                    d.blit(0, y, d.width, band, bufs[i & 1], is_blocking=False)
+                    i += 1
+            d.tx.wait()
+        finally:
+            if not ON_BOARD:
+                ctx.bus.spi.realtime = False
+            d.tx = old
+        return frames
+    return bench
+
+def _thread_tx():
+    if _thread_tx.tx is None:
+        _thread_tx.tx = st77xx.St77xx_thread_tx()
+    return _thread_tx.tx
+_thread_tx.tx = None
+
+def bench_lvgl_redraw(ctx):
+    import lvgl as lv
+    scr = lv.screen_active()
+    for _ in range(4):
+        scr.invalidate()
+        _refresh()
+    return 4
+
+# Full-screen redraw with LVGL rendering in RGB565 and swapping every
+# flushed area, against rendering in the panel byte order directly. Both run
+# the same when the LVGL build has no RGB565_SWAPPED.
+def _redraw_order(native):
+    def bench(ctx):
+        d = ctx.disp
+        old = d.native_order
+        d.set_native_order(native)
+        try:
+            return bench_lvgl_redraw(ctx)
+        finally:
+            d.set_native_order(old)
+    return bench
+
+def bench_text_update(ctx):
+    import spotpear
+    spotpear.clear_screen(0x000000)
+    _refresh()
+    for i in range(20):
+        spotpear.display_text_at_position("Score %d" % i, 10, 10, 0xffffff, 16, id="bench")
+        _refresh()
+    return 20
+
+def bench_text_recreate(ctx):
+    import spotpear
+    for i in range(20):
+        spotpear.clear_screen(0x000000)
+        spotpear.display_text_at_position("Score %d" % i, 10, 10, 0xffffff, 16)
+        _refresh()
+    return 20
+
+# Diagonal stripes moving one cell per frame
+def _grids(n, count=10):
+    return [[[9 if (r + c + f) % 4 == 0 else 0 for c in range(n)] for r in range(n)] for f in range(count)]
+
+def bench_grid_redraw(ctx):
+    import spotpear
+    grids = _grids(5)
+    for grid in grids:
+        spotpear.clear_screen(0x000000)
+        spotpear.draw_grid([[1 if v else 0 for v in row] for row in grid], 2, 0xff0000, 128, 128)
+        _refresh()
+    return len(grids)
+
+def bench_grid_matrix(ctx):
+    import spotpear
+    grids = _grids(5)
+    spotpear.clear_screen(0x000000)
+    m = spotpear.Matrix(5, border=2, color=0xff0000)
+    _refresh()
+    for grid in grids:
+        m.update(grid)
+        _refresh()
+    m.delete()
+    return len(grids)
+
+
+# (name, function, needs LVGL)
+SCENARIOS = [
+    ("clear", bench_clear, False),
+    ("blit_full", bench_blit_full, False),
+    ("fill_rect", bench_fill_rect, False),
+    ("set_window", bench_set_window, False),
+    ("redraw_factor1", _bands(1), False),
+    ("redraw_factor2", _bands(2), False),
+    ("redraw_factor4", _bands(4), False),
+    ("redraw_factor8", _bands(8), False),
+    ("small_blits", _small_blits(True), False),
+    ("small_blits_uncoalesced", _small_blits(False), False),
+    ("pipeline_blocking", _pipeline(st77xx.St77xx_tx), False),
+    ("pipeline_thread", _pipeline(_thread_tx), False),
+    ("lvgl_redraw", bench_lvgl_redraw, True),
+    ("lvgl_redraw_swap", _redraw_order(False), True),
+    ("lvgl_redraw_native", _redraw_order(True), True),
+    ("text_update", bench_text_update, True),
+    ("text_recreate", bench_text_recreate, True),
+    ("grid_redraw", bench_grid_redraw, True),
+    ("grid_matrix", bench_grid_matrix, True),
+]
+
+
+def run_scenario(ctx, name, func):
+    gc.collect()
+    before = ctx.probe.snapshot()
+    heap = _heap_used()
+    if heap is not None:
+        gc.disable()
+    t0 = time.ticks_us()
+    try:
+        n = func(ctx)
+    finally:
+        dt = time.ticks_diff(time.ticks_us(), t0)
+        heap_after = _heap_used()
+        gc.enable()
+    after = ctx.probe.snapshot()
+    res = {"scenario": name, "iterations": n, "us": dt, "us_per_iter": dt // max(n, 1)}
+    for k in after:
+        res[k] = after[k] - before.get(k, 0)
+    if heap is not None:
+        res["alloc_bytes"] = heap_after - heap
+    return res
+
+
+def _build():
+    try:
+        import os
+        u = os.uname()
+        return "%s %s" % (u.release, u.version)
+    except (ImportError, AttributeError):
+        return sys.version
+
+
+def main(names=None):
+    ctx = Context()
+    target = "board" if ON_BOARD else "host"
+    build = _build()
+    for name, func, needs_lvgl in SCENARIOS:
+        if names and name not in names:
+            continue
+        if needs_lvgl and not ctx.lvgl:
+            res = {"scenario": name, "skipped": "needs lvgl"}
+        else:
+            res = run_scenario(ctx, name, func)
+        res["target"] = target
+        res["build"] = build
+        print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] if len(sys.argv) > 1 else None)
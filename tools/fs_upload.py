@@ -0,0 +1,107 @@
+# Copies a file to the board with spotpear.fs_upload(), in binary and much
+# faster than typing it into fs_write() line by line:
+#
+#   python3 tools/fs_upload.py /dev/ttyACM0 main.py [dest] [--legacy]
+#
+# Needs pyserial. The board is put in the raw REPL, fs_upload(dest, size,
+# crc) is started there, and the file follows in chunks of CHUNK bytes, each
+# sent once the board has asked for it with an ACK (0x06). The board checks
+# the CRC32 and only then replaces dest. --legacy sends the file through
+# fs_write() instead, to compare. Prints the throughput in KB/s.
+
+import sys
+import time
+import zlib
+
+import serial
+
+# spotpear.FS_CHUNK
+CHUNK = 4096
+ACK = b"\x06"
+TIMEOUT = 10
+
+
+def read_until(ser, ending):
+    data = bytearray()
+    deadline = time.monotonic() + TIMEOUT
+    while not data.endswith(ending):
+        b = ser.read(1)
+        if b:
+            data += b
+            deadline = time.monotonic() + TIMEOUT
+        elif time.monotonic() > deadline:
+            raise TimeoutError("board did not answer, got %r" % bytes(data[-80:]))
+    return bytes(data[:-len(ending)])
+
+
+def enter_raw_repl(ser):
+    ser.write(b"\r\x03\x03")
+    time.sleep(0.1)
+    ser.reset_input_buffer()
+    ser.write(b"\r\x01")
+    read_until(ser, b"raw REPL; CTRL-B to exit\r\n>")
+
+
+def exec_start(ser, code):
+    ser.write(code.encode() + b"\x04")
+    if ser.read(2) != b"OK":
+        raise RuntimeError("raw REPL did not take the command")
+
+
+# Output and error text of the command started with exec_start()
+def exec_finish(ser):
+    out = read_until(ser, b"\x04")
+    err = read_until(ser, b"\x04>")
+    return out.decode(errors="replace"), err.decode(errors="replace")
+
+
+def upload(ser, data, dest):
+    exec_start(ser, "import spotpear;spotpear.fs_upload(%r,%d,%d)" % (dest, len(data), zlib.crc32(data)))
+    for pos in range(0, len(data), CHUNK):
+        b = ser.read(1)
+        if b != ACK:
+            # fs_upload() failed, the rest is its traceback
+            out, err = exec_finish(ser)
+            raise RuntimeError((b + out.encode()).decode(errors="replace") + err)
+        ser.write(data[pos:pos + CHUNK])
+    return exec_finish(ser)
+
+
+def upload_legacy(ser, data, dest):
+    exec_start(ser, "import spotpear;spotpear.fs_write(%r)" % dest)
+    for line in data.decode().splitlines():
+        ser.write(line.encode() + b"\r")
+        # input() echoes the line, wait for it so the board keeps up
+        read_until(ser, b"\r\n")
+    ser.write(b"\x04")
+    return exec_finish(ser)
+
+
+def main(argv):
+    args = [a for a in argv[1:] if not a.startswith("--")]
+    if len(args) < 2:
+        print("usage: fs_upload.py PORT FILE [DEST] [--legacy]")
+        return 2
+    port, path = args[0], args[1]
+    dest = args[2] if len(args) > 2 else path.rsplit("/", 1)[-1]
+    with open(path, "rb") as f:
+        data = f.read()
+    with serial.Serial(port, 115200, timeout=1) as ser:
+        enter_raw_repl(ser)
+        t0 = time.monotonic()
+        if "--legacy" in argv:
+            out, err = upload_legacy(ser, data, dest)
+        else:
+            out, err = upload(ser, data, dest)
+        dt = time.monotonic() - t0
+        ser.write(b"\x02")
+    if err:
+        print(err, end="")
+        return 1
+    print(out.strip().splitlines()[-1] if out.strip() else "")
+    print("%d bytes in %.2f s, %.1f KB/s" % (len(data), dt, len(data) / 1024 / dt))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,149 @@
+# Makes the frozen board modules importable on a Linux host, under CPython
+# or the unix MicroPython port:
+#
+#   import hostenv
+#   hostenv.install()
+#   import st77xx
+#
+# The board modules directory is put first on sys.path. tools/hoststubs is
+# appended last, so its stand-ins for machine, micropython, uctypes, ... are
+# only picked up when the interpreter has no module of that name. On CPython
+# the MicroPython-only functions of the time module, gc.mem_free() and
+# os.ilistdir() are added as well, select.poll() gets ipoll() and
+# sys.stdin.buffer is made unbuffered as on the board.
+
+import sys
+import time
+
+_here = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+
+MODULES_DIR = _here + "/../lv_micropython_board_port/ports/esp32/boards/SPOTPEARC3/modules"
+STUBS_DIR = _here + "/hoststubs"
+
+
+def _patch_time():
+    if hasattr(time, "ticks_us"):
+        return
+    _ns = time.perf_counter_ns
+
+    def ticks_ms():
+        return _ns() // 1_000_000
+
+    def ticks_us():
+        return _ns() // 1_000
+
+    def ticks_cpu():
+        return _ns()
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def ticks_add(a, b):
+        return a + b
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+    def sleep_us(us):
+        time.sleep(us / 1_000_000)
+
+    for f in (ticks_ms, ticks_us, ticks_cpu, ticks_diff, ticks_add, sleep_ms, sleep_us):
+        setattr(time, f.__name__, f)
+
+
+# Free heap reported to the board modules on CPython, about what an ESP32-C3
+# has left with LVGL running
+HOST_MEM_FREE = 150_000
+
+
+def _patch_gc():
+    import gc
+    if not hasattr(gc, "mem_free"):
+        gc.mem_free = lambda: HOST_MEM_FREE
+
+
+def _patch_os():
+    import os
+    if hasattr(os, "ilistdir"):
+        return
+
+    def ilistdir(path="."):
+        with os.scandir(path) as it:
+            for e in it:
+                st = e.stat()
+                yield (e.name, 0x4000 if e.is_dir() else 0x8000, st.st_ino, 0 if e.is_dir() else st.st_size)
+
+    os.ilistdir = ilistdir
+
+
+# MicroPython's sys.stdin.buffer reads straight from the input and its
+# readinto() waits until the buffer is full or the input ends. CPython's
+# reads ahead, which hides bytes from select.poll(), and its raw stream
+# returns whatever a single read got.
+class _RawStdinBuffer:
+    def __init__(self, raw):
+        self._raw = raw
+
+    def readinto(self, buf):
+        buf = memoryview(buf).cast("B")
+        got = 0
+        while got < len(buf):
+            n = self._raw.readinto(buf[got:])
+            if not n:
+                break
+            got += n
+        return got
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class _RawStdin:
+    def __init__(self, stdin):
+        self._stdin = stdin
+        self.buffer = _RawStdinBuffer(stdin.buffer.raw)
+
+    def __getattr__(self, name):
+        return getattr(self._stdin, name)
+
+
+def _patch_stdin():
+    raw = getattr(getattr(sys.stdin, "buffer", None), "raw", None)
+    if raw is not None and not isinstance(sys.stdin, _RawStdin):
+        sys.stdin = _RawStdin(sys.stdin)
+
+
+# select.poll().ipoll(), which CPython does not have
+class _Poll:
+    def __init__(self):
+        self._poll = _select_poll()
+
+    def ipoll(self, timeout=-1, flags=0):
+        return iter(self._poll.poll(timeout))
+
+    def __getattr__(self, name):
+        return getattr(self._poll, name)
+
+
+_select_poll = None
+
+
+def _patch_select():
+    global _select_poll
+    import select
+    if _select_poll is not None or hasattr(select.poll(), "ipoll"):
+        return
+    _select_poll = select.poll
+    select.poll = _Poll
+
+
+def install():
+    if MODULES_DIR not in sys.path:
+        sys.path.insert(0, MODULES_DIR)
+    if STUBS_DIR not in sys.path:
+        sys.path.append(STUBS_DIR)
+    _patch_time()
+    _patch_gc()
+    _patch_os()
+    _patch_stdin()
+    _patch_select()
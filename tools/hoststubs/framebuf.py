@@ -0,0 +1,126 @@
+# Host stand-in for the framebuf module, see tools/hostenv.py
+#
+# RGB565 (stored little endian, like the firmware) and MONO_HLSB buffers with
+# the drawing methods the board modules use. There is no font data, text()
+# draws every non-space character as a 6x7 box in the 8x8 cell, which is
+# enough to see where text went.
+
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, format, stride=None):
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = width if stride is None else stride
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        if self.format == RGB565:
+            i = (y * self.stride + x) * 2
+            if c is None:
+                return self.buf[i] | (self.buf[i + 1] << 8)
+            self.buf[i] = c & 0xFF
+            self.buf[i + 1] = (c >> 8) & 0xFF
+        elif self.format == MONO_HLSB:
+            i = (y * self.stride + x) >> 3
+            bit = 0x80 >> (x & 7)
+            if c is None:
+                return 1 if self.buf[i] & bit else 0
+            if c:
+                self.buf[i] |= bit
+            else:
+                self.buf[i] &= ~bit
+        else:
+            raise ValueError("format not supported by the host stand-in")
+
+    def fill_rect(self, x, y, w, h, c):
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, self.width), min(y + h, self.height)
+        if x1 >= x2 or y1 >= y2:
+            return
+        if self.format == RGB565:
+            row = bytes((c & 0xFF, (c >> 8) & 0xFF)) * (x2 - x1)
+            for yy in range(y1, y2):
+                i = (yy * self.stride + x1) * 2
+                self.buf[i:i + len(row)] = row
+            return
+        for yy in range(y1, y2):
+            for xx in range(x1, x2):
+                self.pixel(xx, yy, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def ellipse(self, x, y, xr, yr, c, f=False, m=0xF):
+        # m (quadrant mask) is ignored
+        ix, iy = max(xr - 1, 0), max(yr - 1, 0)
+        for yy in range(-yr, yr + 1):
+            for xx in range(-xr, xr + 1):
+                if xx * xx * yr * yr + yy * yy * xr * xr > xr * xr * yr * yr:
+                    continue
+                if f or xx * xx * iy * iy + yy * yy * ix * ix > ix * ix * iy * iy:
+                    self.pixel(x + xx, y + yy, c)
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            if ch != " ":
+                self.fill_rect(x + 1, y, 6, 7, c)
+            x += 8
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf.height):
+            for xx in range(fbuf.width):
+                v = fbuf.pixel(xx, yy)
+                if v != key:
+                    self.pixel(x + xx, y + yy, v)
+
+    # Moves the contents, what they leave behind keeps its pixels
+    def scroll(self, xstep, ystep):
+        w, h = self.width, self.height
+        old = [[self.pixel(x, y) for x in range(w)] for y in range(h)]
+        for y in range(max(ystep, 0), min(h + ystep, h)):
+            for x in range(max(xstep, 0), min(w + xstep, w)):
+                self.pixel(x, y, old[y - ystep][x - xstep])
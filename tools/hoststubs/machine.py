@@ -0,0 +1,188 @@
+# Host stand-in for the machine module, see tools/hostenv.py
+#
+# Only what the board modules touch is modelled: pins keep their value,
+# SPI writes go nowhere, timers run on threads.
+
+import threading
+import time
+
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+_reset_cause = PWRON_RESET
+
+
+def reset_cause():
+    return _reset_cause
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def soft_reset():
+    raise SystemExit("machine.soft_reset()")
+
+
+def freq(*args):
+    return 160_000_000
+
+
+def unique_id():
+    return b"\x00\x00\x00\x00\x00\x00"
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = 1 if pull == Pin.PULL_UP else 0
+        self._handler = None
+        self._trigger = 0
+        if value is not None:
+            self._value = 1 if value else 0
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self._value = 1 if value else 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        v = 1 if v else 0
+        old, self._value = self._value, v
+        if self._handler is not None and old != v:
+            if (v and self._trigger & Pin.IRQ_RISING) or (not v and self._trigger & Pin.IRQ_FALLING):
+                self._handler(self)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    # As on the esp32 port: there is no hard= argument
+    def irq(self, handler=None, trigger=IRQ_RISING | IRQ_FALLING, wake=None):
+        self._handler = handler
+        self._trigger = trigger
+
+    def __repr__(self):
+        return "Pin(%s)" % (self.id,)
+
+
+class PWM:
+    def __init__(self, pin, freq=5000, duty_u16=0):
+        self.pin = pin
+        self._freq = freq
+        self._duty = duty_u16
+
+    def freq(self, f=None):
+        if f is None:
+            return self._freq
+        self._freq = f
+
+    def duty_u16(self, d=None):
+        if d is None:
+            return self._duty
+        self._duty = d
+
+    def deinit(self):
+        self._duty = 0
+
+
+class SPI:
+    def __init__(self, id, baudrate=1_000_000, **kw):
+        self.id = id
+        self.baudrate = baudrate
+
+    def init(self, baudrate=None, **kw):
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        pass
+
+    def read(self, n, write=0):
+        return bytes(n)
+
+    def readinto(self, buf, write=0):
+        pass
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kw):
+        self.id = id
+        self._t = None
+        if kw:
+            self.init(**kw)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=None):
+        self.deinit()
+        if freq is not None:
+            period = 1000 // freq
+        self._mode = mode
+        self._period = period
+        self._callback = callback
+        self._arm()
+
+    def _arm(self):
+        self._t = threading.Timer(self._period / 1000, self._fire)
+        self._t.daemon = True
+        self._t.start()
+
+    def _fire(self):
+        if self._mode == Timer.PERIODIC:
+            self._arm()
+        if self._callback is not None:
+            self._callback(self)
+
+    def deinit(self):
+        if self._t is not None:
+            self._t.cancel()
+            self._t = None
+
+
+# RTC user memory outlives the instance, as it outlives a reset on the board
+_rtc_memory = b""
+
+
+class RTC:
+    MEMORY_MAX = 2048
+
+    def memory(self, data=None):
+        global _rtc_memory
+        if data is None:
+            return _rtc_memory
+        if len(data) > RTC.MEMORY_MAX:
+            raise ValueError("buffer too long")
+        _rtc_memory = bytes(data)
+
+
+def idle():
+    time.sleep(0)
@@ -0,0 +1,30 @@
+# Host stand-in for the micropython module, see tools/hostenv.py
+
+
+def const(x):
+    return x
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def schedule(func, arg):
+    # There is no VM scheduler on the host, run the callback right away
+    func(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def kbd_intr(chr):
+    pass
+
+
+def mem_info(*args):
+    pass
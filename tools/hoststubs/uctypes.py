@@ -0,0 +1,5 @@
+# Host stand-in for the uctypes module, see tools/hostenv.py
+
+
+def addressof(obj):
+    return id(obj)
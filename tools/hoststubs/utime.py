@@ -0,0 +1,3 @@
+# Host stand-in for the utime module, see tools/hostenv.py
+
+from time import *  # noqa: F401,F403  (hostenv adds the ticks_* functions)
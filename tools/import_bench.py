@@ -0,0 +1,80 @@
+# Import time and heap use of spotpear, and what a program that only drives
+# the LED pays before its first set_led().
+#
+# On a Linux host the board modules run against the stand-ins in
+# tools/hoststubs (machine, lvgl, ...), every run in a fresh interpreter:
+#
+#   python3 tools/import_bench.py [runs]
+#
+# On the board, right after a reset so that nothing is imported yet:
+#
+#   mpremote run tools/import_bench.py
+#
+# Prints one JSON line per run with the microseconds spent in the import, the
+# bytes it allocated, the time until the LED is set and which of the heavy
+# modules (lvgl, st77xx, framebuf) got loaded along the way.
+
+import sys
+import gc
+import json
+
+ON_BOARD = sys.platform == "esp32"
+
+if not ON_BOARD:
+    import hostenv
+    hostenv.install()
+
+import time
+
+HEAVY = ("lvgl", "st77xx", "framebuf")
+
+
+def _alloc_start():
+    gc.collect()
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    import tracemalloc
+    tracemalloc.start()
+    return 0
+
+
+def _alloc_now():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    import tracemalloc
+    return tracemalloc.get_traced_memory()[0]
+
+
+def measure():
+    if "spotpear" in sys.modules:
+        return {"skipped": "spotpear already imported, reset first"}
+    a0 = _alloc_start()
+    t0 = time.ticks_us()
+    import spotpear
+    t1 = time.ticks_us()
+    a1 = _alloc_now()
+    spotpear.set_led(1)
+    t2 = time.ticks_us()
+    return {
+        "import_us": time.ticks_diff(t1, t0),
+        "alloc_bytes": a1 - a0,
+        "led_us": time.ticks_diff(t2, t0),
+        "loaded": [m for m in HEAVY if m in sys.modules],
+        "target": "board" if ON_BOARD else "host",
+    }
+
+
+def main(argv):
+    if ON_BOARD or "--child" in argv:
+        print(json.dumps(measure()))
+        return 0
+    import subprocess
+    runs = int(argv[1]) if len(argv) > 1 else 5
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, __file__, "--child"], check=True, capture_output=True, text=True).stdout
+        sys.stdout.write(out)
+    return 0
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,351 @@
+# Host-side ST77xx bus simulator.
+#
+# Stand-in SPI and Pin objects that the st77xx drivers can be constructed
+# with on a Linux host (CPython or the unix MicroPython port). Everything
+# written on the bus is decoded the way the controller would: commands while
+# DC is low, parameters and pixel data while DC is high, and only while CS is
+# asserted. CASET/RASET/RAMWR/MADCTL drive an in-memory RGB565 framebuffer of
+# the visible panel, using the ST77XX_COL_ROW_MODEL_START_ROTMAP offsets of
+# the rotation selected by MADCTL, so a driver writing outside the glass
+# shows up in the "clipped" counter.
+#
+#   import hostenv; hostenv.install()
+#   import st77xx_sim
+#   disp, bus = st77xx_sim.make_display()   # St7735_hw, 128x128 redtab
+#   disp.clear(0xf800)
+#   print(bus.stats(), hex(bus.pixel(0, 0)))
+
+import st77xx
+
+try:
+    import utime as time
+except ImportError:
+    import time
+
+
+class VirtualClock:
+    """
+    Replacement for the time module inside st77xx, installed by make_display().
+    Sleeps return immediately and are added to a virtual offset, so a panel
+    bring-up costs no wall time while ticks_*() still see the delay.
+    """
+
+    def __init__(self):
+        self.offset_us = 0
+        self.slept_us = 0
+
+    def _advance(self, us):
+        if us > 0:
+            self.offset_us += us
+            self.slept_us += us
+
+    def sleep(self, s):
+        self._advance(int(s * 1_000_000))
+
+    def sleep_ms(self, ms):
+        self._advance(int(ms) * 1000)
+
+    def sleep_us(self, us):
+        self._advance(int(us))
+
+    def ticks_us(self):
+        return time.ticks_us() + self.offset_us
+
+    def ticks_ms(self):
+        return self.ticks_us() // 1000
+
+    def ticks_diff(self, a, b):
+        return time.ticks_diff(a, b)
+
+    def ticks_add(self, a, b):
+        return time.ticks_add(a, b)
+
+
+class SimPin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, bus, name, value=1):
+        self.bus = bus
+        self.name = name
+        self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        v = 1 if v else 0
+        if v != self._value:
+            self._value = v
+            self.bus._pin_changed(self, v)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def init(self, *args, **kw):
+        pass
+
+    def __repr__(self):
+        return "SimPin(%s)" % self.name
+
+
+class SimSPI:
+    def __init__(self, bus, baudrate):
+        self.bus = bus
+        self.baudrate = baudrate
+        # When set, write() also takes as long as the bytes need on the wire,
+        # sleeping so that other threads can run meanwhile
+        self.realtime = False
+
+    def init(self, baudrate=None, **kw):
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        self.bus._write(buf)
+        if self.realtime:
+            time.sleep_us(len(buf) * 8_000_000 // self.baudrate)
+
+    def read(self, n, write=0):
+        self.bus._write(bytes([write]) * n)
+        return bytes(n)
+
+    def readinto(self, buf, write=0):
+        self.bus._write(bytes([write]) * len(buf))
+        for i in range(len(buf)):
+            buf[i] = 0
+
+
+# Number of parameter bytes after which a command takes effect
+_PARAMS = {
+    st77xx.ST77XX_CASET: 4,
+    st77xx.ST77XX_RASET: 4,
+    st77xx.ST77XX_MADCTL: 1,
+    st77xx.ST77XX_COLMOD: 1,
+}
+
+
+class St77xxBus:
+    """
+    One simulated panel with its SPI bus and CS/DC/RST lines.
+
+    *res* and *model* are the values the driver is constructed with; they
+    select the row of ST77XX_COL_ROW_MODEL_START_ROTMAP used for the address
+    offsets. *baudrate* only feeds the wire time estimate.
+    """
+
+    def __init__(self, res=(128, 128), model="redtab", baudrate=40_000_000):
+        self.res = tuple(res)
+        self.model = model
+        self.offsets = st77xx.ST77XX_COL_ROW_MODEL_START_ROTMAP[self.res[0], self.res[1], model]
+        self.cs = SimPin(self, "cs")
+        self.dc = SimPin(self, "dc")
+        self.rst = SimPin(self, "rst")
+        self.spi = SimSPI(self, baudrate)
+        self.madctl = 0
+        self.rot = 0
+        self.width, self.height = self.res
+        self.fb = bytearray(self.width * self.height * 2)
+        self.reset_stats()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._cmd = None
+        self._params = bytearray()
+        self._pending = None
+        self.x0, self.x1, self.y0, self.y1 = 0, self.width - 1, 0, self.height - 1
+        self._cx, self._cy = self.x0, self.y0
+
+    def reset_stats(self):
+        self.bytes = 0
+        self.cmd_bytes = 0
+        self.data_bytes = 0
+        self.transactions = 0
+        self.cs_toggles = 0
+        self.dc_toggles = 0
+        self.writes = 0
+        self.pixels = 0
+        self.clipped = 0
+        self.stray_bytes = 0
+        self.resets = 0
+        self.commands = {}
+
+    def stats(self):
+        return {
+            "bytes": self.bytes,
+            "cmd_bytes": self.cmd_bytes,
+            "data_bytes": self.data_bytes,
+            "transactions": self.transactions,
+            "cs_toggles": self.cs_toggles,
+            "dc_toggles": self.dc_toggles,
+            "spi_writes": self.writes,
+            "pixels": self.pixels,
+            "clipped": self.clipped,
+            "stray_bytes": self.stray_bytes,
+            "resets": self.resets,
+            "wire_us": self.wire_us(),
+        }
+
+    # Time the bytes counted so far take on the wire at the configured clock
+    def wire_us(self):
+        return self.bytes * 8_000_000 // self.spi.baudrate
+
+    def command_count(self, cmd):
+        return self.commands.get(cmd, 0)
+
+    def _pin_changed(self, pin, v):
+        if pin is self.cs:
+            # Raising CS resets the serial interface but the controller keeps
+            # the last command, so data after CS is asserted again continues it
+            self.cs_toggles += 1
+            if not v:
+                self.transactions += 1
+        elif pin is self.dc:
+            self.dc_toggles += 1
+        elif pin is self.rst and not v:
+            self.resets += 1
+            self.madctl = 0
+            self._set_rotation(0)
+            self._reset_state()
+
+    def _write(self, buf):
+        n = len(buf)
+        self.writes += 1
+        self.bytes += n
+        if self.cs.value():
+            self.stray_bytes += n
+            return
+        if not self.dc.value():
+            self.cmd_bytes += n
+            for b in bytes(buf):
+                self._end_command()
+                self._cmd = b
+                self.commands[b] = self.commands.get(b, 0) + 1
+                if b == st77xx.ST77XX_RAMWR:
+                    self._cx, self._cy = self.x0, self.y0
+                elif b == st77xx.ST77XX_SWRESET:
+                    self._reset_state()
+            return
+        self.data_bytes += n
+        if self._cmd == st77xx.ST77XX_RAMWR:
+            self._pixels(buf)
+            return
+        self._params.extend(buf)
+        if len(self._params) == _PARAMS.get(self._cmd, -1):
+            self._apply()
+
+    def _end_command(self):
+        self._cmd = None
+        self._params = bytearray()
+        self._pending = None
+
+    def _apply(self):
+        p = self._params
+        if self._cmd == st77xx.ST77XX_CASET:
+            self.x0, self.x1 = (p[0] << 8) | p[1], (p[2] << 8) | p[3]
+        elif self._cmd == st77xx.ST77XX_RASET:
+            self.y0, self.y1 = (p[0] << 8) | p[1], (p[2] << 8) | p[3]
+        elif self._cmd == st77xx.ST77XX_MADCTL:
+            self.madctl = p[0]
+            rots = st77xx.ST77XX_MADCTL_ROTS
+            bits = p[0] & ~(st77xx.ST77XX_MADCTL_BGR | st77xx.ST77XX_MADCTL_ML | st77xx.ST77XX_MADCTL_RTL)
+            for i in range(4):
+                if rots[i] == bits:
+                    self._set_rotation(i)
+                    break
+
+    def _set_rotation(self, rot):
+        self.rot = rot
+        w, h = self.res if rot % 2 == 0 else (self.res[1], self.res[0])
+        if (w, h) != (self.width, self.height):
+            self.width, self.height = w, h
+            self.fb = bytearray(w * h * 2)
+
+    def _pixels(self, buf):
+        data = bytes(buf)
+        if self._pending is not None:
+            data = self._pending + data
+            self._pending = None
+        if len(data) & 1:
+            self._pending = data[-1:]
+            data = data[:-1]
+        c0, r0 = self.offsets[self.rot]
+        fb = self.fb
+        w, h = self.width, self.height
+        x0, x1, y1 = self.x0, self.x1, self.y1
+        cx, cy = self._cx, self._cy
+        npx = len(data) // 2
+        i = 0
+        while i < npx:
+            if cy > y1:
+                # the controller drops data beyond the window end
+                self.clipped += npx - i
+                break
+            # copy the rest of the current window row in one go
+            run = min(x1 - cx + 1, npx - i)
+            x = cx - c0
+            y = cy - r0
+            if 0 <= y < h:
+                a = max(x, 0)
+                b = min(x + run, w)
+                if a < b:
+                    off = (y * w + a) * 2
+                    src = (i + a - x) * 2
+                    fb[off:off + (b - a) * 2] = data[src:src + (b - a) * 2]
+                self.clipped += run - max(b - a, 0)
+            else:
+                self.clipped += run
+            self.pixels += run
+            i += run
+            cx += run
+            if cx > x1:
+                cx = x0
+                cy += 1
+        self._cx, self._cy = cx, cy
+
+    # RGB565 value of a visible pixel, as sent over the wire
+    def pixel(self, x, y):
+        i = (y * self.width + x) * 2
+        return (self.fb[i] << 8) | self.fb[i + 1]
+
+    # Writes the framebuffer as a binary PPM, handy to eyeball a test run
+    def save_ppm(self, path):
+        with open(path, "wb") as f:
+            f.write(("P6\n%d %d\n255\n" % (self.width, self.height)).encode())
+            row = bytearray(self.width * 3)
+            for y in range(self.height):
+                for x in range(self.width):
+                    c = self.pixel(x, y)
+                    row[x * 3] = (c >> 8) & 0xF8
+                    row[x * 3 + 1] = (c >> 3) & 0xFC
+                    row[x * 3 + 2] = (c << 3) & 0xF8
+                f.write(row)
+
+
+def make_display(cls=None, res=(128, 128), model="redtab", rot=st77xx.ST77XX_MIRROR_PORTRAIT, baudrate=40_000_000, **kw):
+    """
+    Constructs a driver wired to a new St77xxBus and returns (display, bus).
+
+    *cls* defaults to St7735_hw, or St7789_hw for the (240,320) resolution; the
+    LVGL classes St7735/St7789 work as well where lvgl is importable. The
+    reset and init sequence delays run on a VirtualClock, bus statistics are
+    cleared after the bring-up.
+    """
+    if cls is None:
+        cls = st77xx.St7789_hw if tuple(res) == (240, 320) else st77xx.St7735_hw
+    if not isinstance(st77xx.time, VirtualClock):
+        st77xx.time = VirtualClock()
+    bus = St77xxBus(res, None if cls in (st77xx.St7789_hw, st77xx.St7789) else model, baudrate)
+    if cls in (st77xx.St7789_hw, st77xx.St7789):
+        disp = cls(res=res, rot=rot, spi=bus.spi, cs=bus.cs, dc=bus.dc, rst=bus.rst, **kw)
+    else:
+        disp = cls(res=res, model=model, rot=rot, spi=bus.spi, cs=bus.cs, dc=bus.dc, rst=bus.rst, **kw)
+    bus.reset_stats()
+    return disp, bus